@@ -49,6 +49,11 @@ static struct gc_generation generations[NUM_GENERATIONS] = {
 
 PyGC_Head *_PyGC_generation0 = GEN_HEAD(0);
 
+/* OVM_MAIN patch: objects moved here by gc.freeze() are never examined by
+ * the collector, so it doesn't write to their pages after fork(). */
+static PyGC_Head permanent_generation = {{&permanent_generation,
+                                          &permanent_generation, 0}};
+
 static int enabled = 1; /* automatic collection enabled? */
 
 /* true if we are currently running the collector */
@@ -1132,6 +1137,50 @@ gc_collect(PyObject *self, PyObject *args, PyObject *kws)
     return PyInt_FromSsize_t(n);
 }
 
+PyDoc_STRVAR(gc_freeze__doc__,
+"freeze() -> None\n"
+"\n"
+"Move all tracked objects to a permanent generation that is ignored by\n"
+"collections.  Call it before fork() so that the child doesn't copy pages\n"
+"that the collector would otherwise write to.\n");
+
+static PyObject *
+gc_freeze(PyObject *self, PyObject *noargs)
+{
+    int i;
+    for (i = 0; i < NUM_GENERATIONS; ++i) {
+        gc_list_merge(GEN_HEAD(i), &permanent_generation);
+        generations[i].count = 0;
+    }
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+PyDoc_STRVAR(gc_unfreeze__doc__,
+"unfreeze() -> None\n"
+"\n"
+"Move the objects in the permanent generation back to the oldest\n"
+"generation, so that the next full collection examines them.\n");
+
+static PyObject *
+gc_unfreeze(PyObject *self, PyObject *noargs)
+{
+    gc_list_merge(&permanent_generation, GEN_HEAD(NUM_GENERATIONS-1));
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+PyDoc_STRVAR(gc_get_freeze_count__doc__,
+"get_freeze_count() -> n\n"
+"\n"
+"Return the number of objects in the permanent generation.\n");
+
+static PyObject *
+gc_get_freeze_count(PyObject *self, PyObject *noargs)
+{
+    return PyInt_FromSsize_t(gc_list_size(&permanent_generation));
+}
+
 PyDoc_STRVAR(gc_set_debug__doc__,
 "set_debug(flags) -> None\n"
 "\n"
@@ -1367,7 +1416,10 @@ PyDoc_STRVAR(gc__doc__,
 "get_objects() -- Return a list of all objects tracked by the collector.\n"
 "is_tracked() -- Returns true if a given object is tracked.\n"
 "get_referrers() -- Return the list of objects that refer to an object.\n"
-"get_referents() -- Return the list of objects that an object refers to.\n");
+"get_referents() -- Return the list of objects that an object refers to.\n"
+"freeze() -- Move all tracked objects to a permanent generation.\n"
+"unfreeze() -- Move the permanent generation back to the oldest one.\n"
+"get_freeze_count() -- Return the number of frozen objects.\n");
 
 #ifdef OVM_MAIN
 #include "Python-2.7.13/Modules/gcmodule.c/GcMethods.def"
@@ -1389,6 +1441,10 @@ static PyMethodDef GcMethods[] = {
         gc_get_referrers__doc__},
     {"get_referents",  gc_get_referents, METH_VARARGS,
         gc_get_referents__doc__},
+    {"freeze",         gc_freeze,     METH_NOARGS,  gc_freeze__doc__},
+    {"unfreeze",       gc_unfreeze,   METH_NOARGS,  gc_unfreeze__doc__},
+    {"get_freeze_count", gc_get_freeze_count, METH_NOARGS,
+        gc_get_freeze_count__doc__},
     {NULL,      NULL}           /* Sentinel */
 };
 #endif
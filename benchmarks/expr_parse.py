@@ -0,0 +1,109 @@
+#!/usr/bin/env python2
+"""
+expr_parse.py - Measure the throughput of the Oil expression parser.
+
+Usage:
+  benchmarks/expr_parse.py corpus NUM_LINES > _tmp/exprs.oil
+  benchmarks/expr_parse.py parse _tmp/exprs.oil [NUM_ITERS]
+
+Each line of the corpus is a 'var' or 'setvar' assignment, so most of the
+tokens go through pgen2's Parser.addtoken().
+"""
+from __future__ import print_function
+
+import random
+import sys
+import time
+
+from _devbuild.gen.syntax_asdl import source
+from core import alloc
+from core import main_loop
+from core import meta
+from core import pyutil
+from core import test_lib
+from frontend import reader
+
+# Leaves and templates for building expressions.  {} is another expression.
+ATOMS = [
+    'x', 'y_1', '42', '3.14', "'single'", '"double $x"', 'null', 'true',
+    '$(echo hi)', '@(a b c)',
+]
+
+TEMPLATES = [
+    '{} + {}', '{} - {} * {}', '{} div {} mod {}', '-{}', '{} ^ {}',
+    '{} < {} and {} >= {}', 'not {}', '{} if {} else {}',
+    '[{}, {}, {}]', '{{key: {}, other: {}}}', '({}, {})',
+    'f({})', 'g({}, {}, n={})', '{}[{}]', '{}[{}:{}]', 'a.b.c',
+    '[{} for x in {} if {}]', '{} ~ {}', '{} == {} or {} != {}',
+    '{} | {} & {} xor {}', '{} << {}', '{} -> method({})',
+]
+
+
+def _Expr(rand, depth, nested=False):
+  if depth == 0 or rand.random() < 0.2:
+    return rand.choice(ATOMS)
+  template = rand.choice(TEMPLATES)
+  n = template.count('{}')
+  s = template.format(*[_Expr(rand, depth - 1, True) for _ in xrange(n)])
+  # Wrap it in a list so that any template can be an operand.  (Parens would
+  # be better, but expr_to_ast doesn't handle them yet.)
+  return '[%s]' % s if nested else s
+
+
+def Corpus(num_lines, f):
+  rand = random.Random(42)  # deterministic so runs are comparable
+  for i in xrange(num_lines):
+    keyword = 'var' if i % 2 == 0 else 'setvar'
+    f.write('%s v%d = %s\n' % (keyword, i, _Expr(rand, 4)))
+
+
+def ParseOnce(parse_ctx, arena, code_str):
+  line_reader = reader.StringLineReader(code_str, arena)
+  c_parser = parse_ctx.MakeOshParser(line_reader)
+  main_loop.ParseWholeFile(c_parser)
+
+
+def main(argv):
+  action = argv[1]
+
+  if action == 'corpus':
+    Corpus(int(argv[2]), sys.stdout)
+
+  elif action == 'parse':
+    path = argv[2]
+    num_iters = int(argv[3]) if len(argv) > 3 else 5
+    with open(path) as f:
+      code_str = f.read()
+    num_lines = code_str.count('\n')
+
+    loader = pyutil.GetResourceLoader()
+    oil_grammar = meta.LoadOilGrammar(loader)
+    arena = alloc.Arena()
+    arena.PushSource(source.MainFile(path))
+    parse_ctx = test_lib.InitParseContext(arena=arena,
+                                          oil_grammar=oil_grammar)
+    parse_ctx.Init_OnePassParse(True)
+
+    ParseOnce(parse_ctx, arena, code_str)  # warm up
+
+    times = []
+    for _ in xrange(num_iters):
+      start = time.time()
+      ParseOnce(parse_ctx, arena, code_str)
+      times.append(time.time() - start)
+
+    best = min(times)
+    print('%d lines, %d bytes' % (num_lines, len(code_str)))
+    print('best of %d: %.3f s, %.0f lines/s, %.0f KB/s' % (
+        num_iters, best, num_lines / best, len(code_str) / best / 1024))
+
+  else:
+    raise RuntimeError('Invalid action %r' % action)
+
+
+if __name__ == '__main__':
+  try:
+    main(sys.argv)
+  except RuntimeError as e:
+    print('FATAL: %s' % e, file=sys.stderr)
+    sys.exit(1)
@@ -42,4 +42,96 @@ printf-loop-complex() {
   done | wc -l
 }
 
+# 'read' from a regular file reads a block and seeks back, instead of making
+# one read() syscall per byte.  From a pipe, it reads one byte at a time
+# unless 'shopt -s buffered_read' is on.
+#
+# Usage:
+#   benchmarks/micro.sh read-million-lines bin/osh
+
+readonly MILLION_LINES=_tmp/million-lines.txt
+
+_million-lines-file() {
+  mkdir -p _tmp
+  if ! test -f $MILLION_LINES; then
+    seq 1000000 | sed 's/$/ the quick brown fox/' > $MILLION_LINES
+  fi
+}
+
+read-million-lines() {
+  local sh=${1:-bin/osh}
+  _million-lines-file
+
+  echo "--- $sh: read < file"
+  time $sh -c 'while read line; do :; done < $1' dummy $MILLION_LINES
+
+  echo "--- $sh: pipe | read"
+  time $sh -c 'cat $1 | while read line; do :; done' dummy $MILLION_LINES
+
+  if test $sh != bash; then
+    echo "--- $sh: pipe | read, with shopt -s buffered_read"
+    time $sh -c '
+    shopt -s buffered_read
+    cat $1 | while read line; do :; done
+    ' dummy $MILLION_LINES
+  fi
+}
+
+# Reads globals and locals from 4 frames deep, plus FUNCNAME and BASH_SOURCE.
+# This exercises the dynamic scope lookup cache and the cached debug stack
+# arrays in core/state.py.
+#
+# Before: 6.1 s
+# After: 4.9 s
+#
+# Usage:
+#   benchmarks/micro.sh var-read-loop bin/osh 5000
+
+var-read-loop() {
+  local sh=${1:-bin/osh}
+  local n=${2:-5000}
+
+  time $sh -c '
+  n=$1 g1=a g2=b g3=c
+  f1() { local l1=1; f2; }
+  f2() { local l2=2; f3; }
+  f3() { local l3=3; f4; }
+  f4() {
+    local i=0
+    while test $i -lt $n; do
+      : $g1 $g2 $g3 $l1 $l2 $l3 $g1 $g2 $g3 $l1 $l2 $l3 ${FUNCNAME[1]} ${BASH_SOURCE[0]}
+      i=$((i+1))
+    done
+  }
+  f1
+  ' dummy $n
+}
+
+# Two brace tuples with many alternatives.  Finding the alternative for each
+# word is a binary search in osh/braces.py.  A linear scan made this quadratic.
+#
+# Before: 18.0 s (4.8 s before expansion was lazy)
+# After: 4.1 s
+#
+# Usage:
+#   benchmarks/micro.sh brace-tuple bin/osh 8000
+
+brace-tuple() {
+  local sh=${1:-bin/osh}
+  local n=${2:-8000}
+
+  local a b
+  a=$(seq -s , -f 'a%g' $n)
+  b=$(seq -s , -f 'b%g' $n)
+
+  # Too long for -c
+  mkdir -p _tmp
+  cat > _tmp/brace-tuple.sh <<EOF
+for w in {$a}; do :; done
+for w in {$b}; do :; done
+echo {$a} | wc -c
+EOF
+  time $sh _tmp/brace-tuple.sh
+}
+
 "$@"
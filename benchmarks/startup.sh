@@ -112,6 +112,24 @@ compare-strace() {
   compare strace-callback
 }
 
+# Time 100 runs of 'sh -c true', then show where OSH spends its startup time.
+#
+# Modules that only a few builtins and applets need are imported on first use,
+# and the Oil grammar is only unmarshalled when an expression is parsed.
+osh-true() {
+  local osh=${1:-bin/osh}
+
+  for sh in dash bash $osh; do
+    echo $sh
+    time for i in $(seq 100); do
+      $sh -c true
+    done
+    echo
+  done
+
+  OIL_TIMING=1 $osh -c true
+}
+
 compare-time() {
   compare time-callback
 }
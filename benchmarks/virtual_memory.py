@@ -5,12 +5,36 @@ virtual_memory.py
 
 import csv
 import os
+import subprocess
 import sys
 import re
 
 # VmSize, VmData might be interesting too.
 METRIC_RE = re.compile('^(VmPeak|VmRSS):\s*(\d+)')
 
+# Every iteration forks a child that runs a builtin, so the child's writes to
+# the heap it shares with the parent show up as minor faults.
+FORK_LOOP = """
+for i in $(seq %d); do
+  x=$(echo $i)
+done
+"""
+
+
+def ForkLoopMetrics(sh_path, n):
+  """Run a loop of n command subs, and return the memory use of the shell and
+  its children."""
+  p = subprocess.Popen([sh_path, '-c', FORK_LOOP % n])
+  # On Linux, this usage includes the descendants the shell waited for.
+  _, status, usage = os.wait4(p.pid, 0)
+  if status != 0:
+    raise RuntimeError('%s failed with status %d' % (sh_path, status))
+
+  return [
+      ('max_rss_KiB', usage.ru_maxrss),
+      ('minor_faults', usage.ru_minflt),
+  ]
+
 
 def main(argv):
   action = argv[1]
@@ -93,6 +117,28 @@ def main(argv):
                   value)
               out.writerow(row)
 
+  elif action == 'fork-loop':
+    # Compare shells, e.g. an OSH build before and after a change to fork().
+    # The first one is the baseline for the 'reduction' column.
+    #
+    #   benchmarks/virtual_memory.py fork-loop _tmp/osh-before bin/osh
+    sh_paths = argv[2:]
+    n = int(os.getenv('NUM_FORKS', '1000'))
+
+    out = csv.writer(sys.stdout)
+    out.writerow(('sh_path', 'num_forks', 'metric_name', 'metric_value',
+                  'reduction'))
+
+    baseline = None
+    for sh_path in sh_paths:
+      metrics = ForkLoopMetrics(sh_path, n)
+      if baseline is None:
+        baseline = dict(metrics)
+      for name, value in metrics:
+        base = baseline[name]
+        reduction = '%.1f%%' % (100.0 * (base - value) / base) if base else ''
+        out.writerow((sh_path, n, name, value, reduction))
+
   else:
     raise RuntimeError('Invalid action %r' % action)
 
@@ -118,13 +118,14 @@ parser-dump-demo() {
 
   # VmRSS: 46 MB for abuild, 200 MB for configure!  That is bad.  This
   # benchmark really is necessary.
-  local input=benchmarks/testdata/abuild
+  local input=${1:-benchmarks/testdata/abuild}
 
   bin/osh \
     --parser-mem-dump $out_dir/parser.txt -n --ast-format none \
     $input
 
-  grep '^Vm' $out_dir/parser.txt
+  # VmHWM is the peak RSS.  The Arena_ lines count what the parser stored.
+  grep '^Vm\|^Arena_' $out_dir/parser.txt
 }
 
 runtime-dump-demo() {
@@ -22,7 +22,9 @@ import time  # for perf measurement
 from typing import List, Dict, NoReturn, TYPE_CHECKING
 
 if TYPE_CHECKING:
+  from _devbuild.gen.option_asdl import builtin_t
   from _devbuild.gen.syntax_asdl import command__ShFunction
+  from core import completion
 
 _trace_path = posix.environ.get('_PY_TRACE')
 if _trace_path:
@@ -46,6 +48,14 @@ else:
 
 _tlog('before imports')
 
+# 'osh -c' can run in a child of 'osh --fork-server', which has already done
+# the work below.
+if posix.environ.get('OSH_FORK_SERVER') and not posix.environ.get('_OVM_DEPS'):
+  from core import fork_server
+  _status = fork_server.Forward(posix.environ['OSH_FORK_SERVER'], sys.argv)
+  if _status is not None:
+    sys.exit(_status)
+
 import atexit
 import errno
 
@@ -56,14 +66,15 @@ from _devbuild.gen.syntax_asdl import source
 from asdl import runtime
 
 from core import alloc
-from core import comp_ui
 from core import dev
 from core import error
 from core import executor
-from core import completion
+from core import fork_server
+from core import line_pager
 from core import main_loop
 from core import meta
 from core import optview
+from core import parse_cache
 from core import passwd
 from core import process
 from core import pyutil
@@ -84,18 +95,16 @@ from oil_lang import expr_eval
 from oil_lang import builtin_oil
 from oil_lang import builtin_funcs
 
+from osh import bool_stat
 from osh import builtin_assign
 from osh import builtin_bracket
-from osh import builtin_comp
 from osh import builtin_meta
 from osh import builtin_misc
 from osh import builtin_lib
-from osh import builtin_printf
 from osh import builtin_process
 from osh import builtin_pure
 from osh import cmd_eval
 from osh import glob_
-from osh import history
 from osh import prompt
 from osh import sh_expr_eval
 from osh import split
@@ -103,10 +112,6 @@ from osh import word_eval
 
 from pylib import os_path
 
-from tools import deps
-from tools import osh2oil
-from tools import readlink
-
 import libc
 
 try:
@@ -114,6 +119,20 @@ try:
 except ImportError:
   line_input = None
 
+# These modules are only used by the interactive shell, the completion and
+# printf builtins, and the oshc and readlink applets, so they're imported on
+# first use.  build/app_deps.py sets _OVM_DEPS to find the modules that go in
+# the app bundle, so import them up front in that case.
+if posix.environ.get('_OVM_DEPS'):
+  from core import comp_ui
+  from core import completion
+  from osh import builtin_comp
+  from osh import builtin_printf
+  from osh import history
+  from tools import deps
+  from tools import osh2oil
+  from tools import readlink
+
 
 _tlog('after imports')
 
@@ -148,6 +167,17 @@ OSH_SPEC.LongFlag('--print-status')  # TODO: Replace with a shell hook
 OSH_SPEC.LongFlag('--debug-file', args.String)
 OSH_SPEC.LongFlag('--xtrace-to-debug-file')
 
+# Fail if a command sub outputs more than this many bytes.
+OSH_SPEC.LongFlag('--max-capture', args.Int, default=0)
+
+# Fail if one brace expansion like {1..10}{1..10} gives more than this many
+# words.
+OSH_SPEC.LongFlag('--max-brace-words', args.Int, default=0)
+
+# Run at most this many background jobs at once.  Starting another one with &
+# waits for one to finish.
+OSH_SPEC.LongFlag('--jobs', args.Int, default=0)
+
 # For benchmarks/*.sh
 OSH_SPEC.LongFlag('--parser-mem-dump', args.String)
 OSH_SPEC.LongFlag('--runtime-mem-dump', args.String)
@@ -156,6 +186,10 @@ OSH_SPEC.LongFlag('--runtime-mem-dump', args.String)
 # it can simply by --rcfile /dev/null.
 OSH_SPEC.LongFlag('--rcfile', args.String)
 
+# Listen at a Unix socket, and run 'osh -c' for clients.  See
+# core/fork_server.py.
+OSH_SPEC.LongFlag('--fork-server', args.String)
+
 builtin_pure.AddOptionsToArgSpec(OSH_SPEC)
 
 
@@ -166,6 +200,8 @@ def _MakeBuiltinArgv(argv):
 
 
 def _InitDefaultCompletions(cmd_ev, complete_builtin, comp_lookup):
+  from core import completion
+
   # register builtins and words
   complete_builtin.Run(_MakeBuiltinArgv(['-E', '-A', 'command']))
   # register path completion
@@ -206,6 +242,7 @@ def _InitReadline(readline_mod, history_filename, root_comp, display, debug_f):
   # How does this map to C?
   # https://cnswww.cns.cwru.edu/php/chet/readline/readline.html#SEC45
 
+  from core import completion
   complete_cb = completion.ReadlineCallback(readline_mod, root_comp, debug_f)
   readline_mod.set_completer(complete_cb)
 
@@ -294,6 +331,73 @@ class ShellOptHook(state.OptHook):
     return True
 
 
+class _LazyBuiltin(vm._Builtin):
+  """Constructs a builtin the first time it's run.
+
+  So shells that never run it don't import its module.
+  """
+  def __init__(self, make_builtin, *args):
+    self.make_builtin = make_builtin
+    self.args = args
+    self.builtin = None  # type: vm._Builtin
+
+  def Run(self, cmd_val):
+    if self.builtin is None:
+      self.builtin = self.make_builtin(*self.args)
+    return self.builtin.Run(cmd_val)
+
+
+def _MakePrintf(mem, parse_ctx, errfmt):
+  from osh import builtin_printf
+  return builtin_printf.Printf(mem, parse_ctx, errfmt)
+
+
+class _Completion(object):
+  """State shared by the completion builtins and the interactive shell.
+
+  It's created on first use, so batch shells don't import core/completion.py.
+  """
+  def __init__(self, mem, cmd_ev, parse_ctx, word_ev, splitter, search_path,
+               errfmt):
+    self.mem = mem
+    self.cmd_ev = cmd_ev
+    self.parse_ctx = parse_ctx
+    self.word_ev = word_ev
+    self.splitter = splitter
+    self.search_path = search_path
+    self.errfmt = errfmt
+
+    self.lookup = None  # type: completion.Lookup
+    self.opt_state = None  # type: completion.OptionState
+    self.builtins = {}  # type: Dict[builtin_t, vm._Builtin]
+
+  def Init(self):
+    # type: () -> None
+    if self.lookup is not None:
+      return
+
+    from core import completion
+    from osh import builtin_comp
+
+    self.lookup = completion.Lookup()
+    self.opt_state = completion.OptionState()
+
+    spec_builder = builtin_comp.SpecBuilder(self.cmd_ev, self.parse_ctx,
+                                            self.word_ev, self.splitter,
+                                            self.lookup, self.search_path)
+    self.builtins[builtin_i.complete] = builtin_comp.Complete(spec_builder,
+                                                              self.lookup)
+    self.builtins[builtin_i.compgen] = builtin_comp.CompGen(spec_builder)
+    self.builtins[builtin_i.compopt] = builtin_comp.CompOpt(self.opt_state,
+                                                            self.errfmt)
+    self.builtins[builtin_i.compadjust] = builtin_comp.CompAdjust(self.mem)
+
+  def Builtin(self, builtin_id):
+    # type: (builtin_t) -> vm._Builtin
+    self.Init()
+    return self.builtins[builtin_id]
+
+
 def ShellMain(lang, argv0, argv, login_shell):
   # type: (str, str, List[str], bool) -> int
   """Used by bin/osh and bin/oil.
@@ -333,6 +437,13 @@ def ShellMain(lang, argv0, argv, login_shell):
     _ShowVersion(version_str)
     return 0
 
+  if opts.fork_server is not None:
+    # Import and load what a shell may need, once.  Each child builds its own
+    # shell state from its argv and environment.
+    from osh import builtin_printf
+    meta.LoadOilGrammar(loader).Load()
+    return fork_server.Serve(opts.fork_server, main)
+
   no_str = None  # type: str
 
   debug_stack = []
@@ -360,6 +471,7 @@ def ShellMain(lang, argv0, argv, login_shell):
 
   job_state = process.JobState()
   fd_state = process.FdState(errfmt, job_state, mem)
+  stat_cache = bool_stat.StatCache(mem, job_state)
 
   opt_hook = ShellOptHook(line_input)
   parse_opts, exec_opts, mutable_opts = state.MakeOpts(mem, opt_hook)
@@ -384,25 +496,6 @@ def ShellMain(lang, argv0, argv, login_shell):
   parse_ctx = parse_lib.ParseContext(arena, parse_opts, aliases, oil_grammar)
   parse_ctx.Init_OnePassParse(opts.one_pass_parse)
 
-  # Three ParseContext instances SHARE aliases.
-  comp_arena = alloc.Arena()
-  comp_arena.PushSource(source.Unused('completion'))
-  trail1 = parse_lib.Trail()
-  # one_pass_parse needs to be turned on to complete inside backticks.  TODO:
-  # fix the issue where ` gets erased because it's not part of
-  # set_completer_delims().
-  comp_ctx = parse_lib.ParseContext(comp_arena, parse_opts, aliases,
-                                    oil_grammar)
-  comp_ctx.Init_Trail(trail1)
-  comp_ctx.Init_OnePassParse(True)
-
-  hist_arena = alloc.Arena()
-  hist_arena.PushSource(source.Unused('history'))
-  trail2 = parse_lib.Trail()
-  hist_ctx = parse_lib.ParseContext(hist_arena, parse_opts, aliases,
-                                    oil_grammar)
-  hist_ctx.Init_Trail(trail2)
-
   # Deps helps manages dependencies.  These dependencies are circular:
   # - cmd_ev and word_ev, arith_ev -- for command sub, arith sub
   # - arith_ev and word_ev -- for $(( ${a} )) and $x$(( 1 )) 
@@ -468,6 +561,14 @@ def ShellMain(lang, argv0, argv, login_shell):
   builtin_funcs.SetGlobalFunc(
       mem, 'glob', lambda s: globber.OilFuncCall(s))
 
+  # stat_table() and stat_cache_stats() builtins
+  builtin_funcs.SetGlobalFunc(
+      mem, 'stat_table',
+      lambda paths: bool_stat.StatTable(
+          paths, stat_cache if exec_opts.stat_cache() else None))
+  builtin_funcs.SetGlobalFunc(
+      mem, 'stat_cache_stats', lambda: stat_cache.Stats())
+
   # This could just be OSH_DEBUG_STREAMS='debug crash' ?  That might be
   # stuffing too much into one, since a .json crash dump isn't a stream.
   crash_dump_dir = posix.environ.get('OSH_CRASH_DUMP_DIR', '')
@@ -478,13 +579,6 @@ def ShellMain(lang, argv0, argv, login_shell):
   else:
     trace_f = util.DebugFile(sys.stderr)
 
-  comp_lookup = completion.Lookup()
-
-  # Various Global State objects to work around readline interfaces
-  compopt_state = completion.OptionState()
-  comp_ui_state = comp_ui.State()
-  prompt_state = comp_ui.PromptState()
-
   dir_stack = state.DirStack()
 
   new_var = builtin_assign.NewVar(mem, procs, errfmt)
@@ -502,7 +596,7 @@ def ShellMain(lang, argv0, argv, login_shell):
 
   builtins = {
       builtin_i.echo: builtin_pure.Echo(exec_opts),
-      builtin_i.printf: builtin_printf.Printf(mem, parse_ctx, errfmt),
+      builtin_i.printf: _LazyBuiltin(_MakePrintf, mem, parse_ctx, errfmt),
 
       builtin_i.pushd: builtin_misc.Pushd(mem, dir_stack, errfmt),
       builtin_i.popd: builtin_misc.Popd(mem, dir_stack, errfmt),
@@ -510,22 +604,20 @@ def ShellMain(lang, argv0, argv, login_shell):
       builtin_i.pwd: builtin_misc.Pwd(mem, errfmt),
 
       builtin_i.times: builtin_misc.Times(),
-      builtin_i.read: builtin_misc.Read(splitter, mem),
+      builtin_i.read: builtin_misc.Read(splitter, mem, exec_opts),
       builtin_i.help: builtin_misc.Help(loader, errfmt),
       builtin_i.history: builtin_misc.History(line_input),
 
       builtin_i.cat: builtin_misc.Cat(),  # for $(<file)
 
-      # Completion (more added below)
-      builtin_i.compopt: builtin_comp.CompOpt(compopt_state, errfmt),
-      builtin_i.compadjust: builtin_comp.CompAdjust(mem),
-
       # interactive
       builtin_i.bind: builtin_lib.Bind(line_input, errfmt),
 
       # test / [ differ by need_right_bracket
-      builtin_i.test: builtin_bracket.Test(False, exec_opts, mem, errfmt),
-      builtin_i.bracket: builtin_bracket.Test(True, exec_opts, mem, errfmt),
+      builtin_i.test: builtin_bracket.Test(False, exec_opts, mem, errfmt,
+                                           stat_cache=stat_cache),
+      builtin_i.bracket: builtin_bracket.Test(True, exec_opts, mem, errfmt,
+                                              stat_cache=stat_cache),
 
       builtin_i.shift: builtin_assign.Shift(mem),
 
@@ -560,7 +652,7 @@ def ShellMain(lang, argv0, argv, login_shell):
       builtin_i.append: builtin_oil.Append(mem, errfmt),
 
       builtin_i.write: builtin_oil.Write(mem, errfmt),
-      builtin_i.getline: builtin_oil.Getline(mem, errfmt),
+      builtin_i.getline: builtin_oil.Getline(mem, exec_opts, errfmt),
 
       builtin_i.repr: builtin_oil.Repr(mem, errfmt),
       builtin_i.use: builtin_oil.Use(mem, errfmt),
@@ -568,15 +660,19 @@ def ShellMain(lang, argv0, argv, login_shell):
   }
 
   arith_ev = sh_expr_eval.ArithEvaluator(mem, exec_opts, parse_ctx, errfmt)
-  bool_ev = sh_expr_eval.BoolEvaluator(mem, exec_opts, parse_ctx, errfmt)
+  bool_ev = sh_expr_eval.BoolEvaluator(mem, exec_opts, parse_ctx, errfmt,
+                                       stat_cache=stat_cache)
   expr_ev = expr_eval.OilEvaluator(mem, procs, errfmt)
-  word_ev = word_eval.NormalWordEvaluator(mem, exec_opts, splitter, errfmt)
+  word_ev = word_eval.NormalWordEvaluator(
+      mem, exec_opts, splitter, errfmt, max_brace_words=opts.max_brace_words,
+      stat_cache=stat_cache)
   cmd_ev = cmd_eval.CommandEvaluator(mem, exec_opts, errfmt, procs,
                                      assign_builtins, arena, cmd_deps)
 
   shell_ex = executor.ShellExecutor(
       mem, exec_opts, mutable_opts, procs, builtins, search_path,
-      ext_prog, waiter, job_state, fd_state, errfmt)
+      ext_prog, waiter, job_state, fd_state, errfmt,
+      max_capture=opts.max_capture, max_jobs=opts.jobs, stat_cache=stat_cache)
 
   # PromptEvaluator rendering is needed in non-interactive shells for @P.
   prompt_ev = prompt.Evaluator(lang, parse_ctx, mem)
@@ -594,8 +690,11 @@ def ShellMain(lang, argv0, argv, login_shell):
                                                    parse_ctx, arith_ev, errfmt)
   builtins[builtin_i.eval] = builtin_meta.Eval(parse_ctx, exec_opts, cmd_ev)
 
+  lst_cache = parse_cache.ParseCache(mem, parse_ctx, version_str)
+  pagers = line_pager.FilePagers(exec_opts)
   source_builtin = builtin_meta.Source(
-      parse_ctx, search_path, cmd_ev, fd_state, errfmt)
+      parse_ctx, search_path, cmd_ev, fd_state, errfmt, parse_cache=lst_cache,
+      pagers=pagers)
   builtins[builtin_i.source] = source_builtin
   builtins[builtin_i.dot] = source_builtin
 
@@ -603,15 +702,19 @@ def ShellMain(lang, argv0, argv, login_shell):
   builtins[builtin_i.command] = builtin_meta.Command(shell_ex, procs, aliases,
                                                       search_path)
 
-  spec_builder = builtin_comp.SpecBuilder(cmd_ev, parse_ctx, word_ev, splitter,
-                                          comp_lookup)
-  complete_builtin = builtin_comp.Complete(spec_builder, comp_lookup)
-  builtins[builtin_i.complete] = complete_builtin
-  builtins[builtin_i.compgen] = builtin_comp.CompGen(spec_builder)
+  mapfile_builtin = builtin_misc.MapFile(mem, shell_ex, errfmt)
+  builtins[builtin_i.mapfile] = mapfile_builtin
+  builtins[builtin_i.readarray] = mapfile_builtin
+
+  comp = _Completion(mem, cmd_ev, parse_ctx, word_ev, splitter, search_path,
+                     errfmt)
+  for builtin_id in (builtin_i.complete, builtin_i.compgen, builtin_i.compopt,
+                     builtin_i.compadjust):
+    builtins[builtin_id] = _LazyBuiltin(comp.Builtin, builtin_id)
 
   # These builtins take blocks, and thus need cmd_ev.
   builtins[builtin_i.cd] = builtin_misc.Cd(mem, dir_stack, cmd_ev, errfmt)
-  builtins[builtin_i.json] = builtin_oil.Json(mem, cmd_ev, errfmt)
+  builtins[builtin_i.json] = builtin_oil.Json(mem, exec_opts, cmd_ev, errfmt)
 
   sig_state = process.SignalState()
   sig_state.InitShell()
@@ -620,9 +723,7 @@ def ShellMain(lang, argv0, argv, login_shell):
                                                   cmd_deps.trap_nodes,
                                                   parse_ctx, errfmt)
 
-  # History evaluation is a no-op if line_input is None.
-  hist_ev = history.Evaluator(line_input, hist_ctx, debug_f)
-
+  script_fd = -1  # for the parse cache
   if opts.c is not None:
     arena.PushSource(source.CFlag())
     line_reader = reader.StringLineReader(opts.c, arena)
@@ -631,8 +732,7 @@ def ShellMain(lang, argv0, argv, login_shell):
 
   elif opts.i:  # force interactive
     arena.PushSource(source.Stdin(' -i'))
-    line_reader = py_reader.InteractiveLineReader(
-        arena, prompt_ev, hist_ev, line_input, prompt_state)
+    line_reader = None  # created below
     mutable_opts.set_interactive()
 
   else:
@@ -640,27 +740,51 @@ def ShellMain(lang, argv0, argv, login_shell):
     if script_name is None:
       if sys.stdin.isatty():
         arena.PushSource(source.Interactive())
-        line_reader = py_reader.InteractiveLineReader(
-            arena, prompt_ev, hist_ev, line_input, prompt_state)
+        line_reader = None  # created below
         mutable_opts.set_interactive()
       else:
         arena.PushSource(source.Stdin(''))
         line_reader = reader.FileLineReader(sys.stdin, arena)
     else:
-      arena.PushSource(source.MainFile(script_name))
+      script_src = source.MainFile(script_name)
+      arena.PushSource(script_src)
       try:
-        f = fd_state.Open(script_name)
+        f, script_fd = fd_state.OpenWithFd(script_name)
       except OSError as e:
         ui.Stderr("osh: Couldn't open %r: %s", script_name,
                   posix.strerror(e.errno))
         return 1
-      line_reader = reader.FileLineReader(f, arena)
-
-  # TODO: assert arena.NumSourcePaths() == 1
-  # TODO: .rc file needs its own arena.
-  c_parser = parse_ctx.MakeOshParser(line_reader)
+      line_reader = reader.FileLineReader(f, arena,
+                                          pager=pagers.ForFile(script_name, script_fd))
 
   if exec_opts.interactive():
+    # Only the interactive shell uses these modules.
+    from core import comp_ui
+    from core import completion
+    from osh import history
+
+    # Three ParseContext instances SHARE aliases.
+    hist_arena = alloc.Arena()
+    hist_arena.PushSource(source.Unused('history'))
+    trail2 = parse_lib.Trail()
+    hist_ctx = parse_lib.ParseContext(hist_arena, parse_opts, aliases,
+                                      oil_grammar)
+    hist_ctx.Init_Trail(trail2)
+
+    # History evaluation is a no-op if line_input is None.
+    hist_ev = history.Evaluator(line_input, hist_ctx, debug_f)
+
+    # Various Global State objects to work around readline interfaces
+    comp_ui_state = comp_ui.State()
+    prompt_state = comp_ui.PromptState()
+
+    if line_reader is None:  # not -c
+      line_reader = py_reader.InteractiveLineReader(
+          arena, prompt_ev, hist_ev, line_input, prompt_state)
+
+    # TODO: .rc file needs its own arena.
+    c_parser = parse_ctx.MakeOshParser(line_reader)
+
     # bash: 'set -o emacs' is the default only in the interactive shell
     mutable_opts.set_emacs()
 
@@ -676,6 +800,17 @@ def ShellMain(lang, argv0, argv, login_shell):
     history_filename = os_path.join(home_dir, '.config/oil', 'history_' + lang)
 
     if line_input:
+      comp_arena = alloc.Arena()
+      comp_arena.PushSource(source.Unused('completion'))
+      trail1 = parse_lib.Trail()
+      # one_pass_parse needs to be turned on to complete inside backticks.
+      # TODO: fix the issue where ` gets erased because it's not part of
+      # set_completer_delims().
+      comp_ctx = parse_lib.ParseContext(comp_arena, parse_opts, aliases,
+                                        oil_grammar)
+      comp_ctx.Init_Trail(trail1)
+      comp_ctx.Init_OnePassParse(True)
+
       # NOTE: We're using a different WordEvaluator here.
       ev = word_eval.CompletionWordEvaluator(mem, exec_opts, splitter, errfmt)
 
@@ -684,7 +819,8 @@ def ShellMain(lang, argv0, argv, login_shell):
       ev.prompt_ev = prompt_ev
       ev.CheckCircularDeps()
 
-      root_comp = completion.RootCompleter(ev, mem, comp_lookup, compopt_state,
+      comp.Init()
+      root_comp = completion.RootCompleter(ev, mem, comp.lookup, comp.opt_state,
                                            comp_ui_state, comp_ctx, debug_f)
 
       term_width = 0
@@ -701,7 +837,8 @@ def ShellMain(lang, argv0, argv, login_shell):
         display = comp_ui.MinimalDisplay(comp_ui_state, prompt_state, debug_f)
 
       _InitReadline(line_input, history_filename, root_comp, display, debug_f)
-      _InitDefaultCompletions(cmd_ev, complete_builtin, comp_lookup)
+      _InitDefaultCompletions(cmd_ev, comp.Builtin(builtin_i.complete),
+                              comp.lookup)
 
     else:  # Without readline module
       display = comp_ui.MinimalDisplay(comp_ui_state, prompt_state, debug_f)
@@ -726,6 +863,9 @@ def ShellMain(lang, argv0, argv, login_shell):
       status = e.status
     return status
 
+  # TODO: assert arena.NumSourcePaths() == 1
+  c_parser = parse_ctx.MakeOshParser(line_reader)
+
   if exec_opts.noexec():
     status = 0
     try:
@@ -744,6 +884,9 @@ def ShellMain(lang, argv0, argv, login_shell):
         with open(input_path) as f, open(opts.parser_mem_dump, 'w') as f2:
           contents = f.read()
           f2.write(contents)
+          # Not in /proc, but in the same format
+          for name, n in sorted(arena.Stats().items()):
+            f2.write('Arena_%s:\t%d\n' % (name, n))
           log('Wrote %s to %s (--parser-mem-dump)', input_path,
               opts.parser_mem_dump)
 
@@ -753,8 +896,20 @@ def ShellMain(lang, argv0, argv, login_shell):
       raise error.Usage('--parser-mem-dump can only be used with -n')
 
     _tlog('Execute(node)')
+
+    cached = None
+    recorder = None
+    if script_fd != -1 and exec_opts.lst_cache():
+      cached = lst_cache.Load(script_name, script_fd)
+      if cached is None:
+        recorder = lst_cache.MakeRecorder(script_name, script_fd, script_src)
     try:
-      status = main_loop.Batch(cmd_ev, c_parser, arena, is_main=True)
+      if cached is None:
+        status = main_loop.Batch(cmd_ev, c_parser, arena, is_main=True,
+                                 recorder=recorder)
+      else:
+        status = main_loop.BatchNodes(cmd_ev, c_parser, arena, cached,
+                                      is_main=True)
       if cmd_ev.MaybeRunExitTrap():
         status = cmd_ev.LastStatus()
     except util.UserExit as e:
@@ -806,6 +961,9 @@ def OshCommandMain(argv):
   if action not in SUBCOMMANDS:
     raise error.Usage('Invalid subcommand %r.' % action)
 
+  from tools import deps
+  from tools import osh2oil
+
   arena = alloc.Arena()
   try:
     script_name = argv[1]
@@ -942,6 +1100,7 @@ def AppBundleMain(argv):
   elif main_name == 'false':
     return 1
   elif main_name == 'readlink':
+    from tools import readlink
     return readlink.main(main_argv)
   else:
     raise error.Usage('Invalid applet name %r.' % main_name)
@@ -98,8 +98,10 @@ def FilterModules(modules):
 def main(argv):
   """Returns an exit code."""
 
-  # Set an environment variable so dependencies in debug mode can be excluded.
+  # Set an environment variable so dependencies in debug mode can be excluded,
+  # and modules that are imported on first use are included.
   posix.environ['_OVM_DEPS'] = '1'
+  posix.putenv('_OVM_DEPS', '1')  # for posix_.environ, which is a copy
 
   action = argv[1]
   main_module = argv[2]
@@ -17,7 +17,28 @@ from _devbuild.gen.syntax_asdl import (
 from asdl import runtime
 from core.util import log
 
-from typing import List, Dict, cast
+from typing import List, Dict, Optional, cast
+
+
+class LinePager(object):
+  """Reads back the lines of a file that an Arena doesn't keep in memory.
+
+  See core/line_pager.py.
+  """
+
+  def Append(self, line):
+    # type: (str) -> None
+    """Called with each line as it's read from the file."""
+    raise NotImplementedError()
+
+  def GetLine(self, line_num):
+    # type: (int) -> str
+    raise NotImplementedError()
+
+  def Release(self):
+    # type: () -> None
+    """Called when the parser is done with the lines before the current one."""
+    raise NotImplementedError()
 
 
 class Arena(object):
@@ -26,29 +47,46 @@ class Arena(object):
   Use Cases:
   1. Error reporting
   2. osh-to-oil Translation
+
+  There's one of these per token, so spans are stored in parallel lists of
+  integers rather than as line_span objects.  (In C++ they're List<int>.)
+  GetLineSpan() creates a line_span on demand.
   """
   def __init__(self):
     # type: () -> None
 
-    # Three parallel arrays indexed by line_id.
-    self.line_vals = []  # type: List[str]
+    # Three parallel arrays indexed by line_id.  The value is None if the
+    # line is paged.
+    self.line_vals = []  # type: List[Optional[str]]
     self.line_nums = []  # type: List[int]
-    self.line_srcs = []  # type: List[source_t]
+    self.line_src_ids = []  # type: List[int]  # index into self.sources
     self.line_num_strs = {}  # type: Dict[int, str]  # an INTERN table
 
-    # indexed by span_id
-    self.spans = []  # type: List[line_span]
+    # For paged lines: the pager for each source
+    self.pagers = {}  # type: Dict[int, LinePager]
+
+    # Three parallel arrays indexed by span_id
+    self.span_line_ids = []  # type: List[int]
+    self.span_cols = []  # type: List[int]
+    self.span_lengths = []  # type: List[int]
 
-    # reuse these instances in many line_span instances
-    self.source_instances = []  # type: List[source_t]
+    # Every source that has been pushed.  Lines refer to them by index, and
+    # pushing the same instance twice in a row reuses its index.
+    self.sources = []  # type: List[source_t]
+    self.source_stack = []  # type: List[int]
 
   def PushSource(self, src):
     # type: (source_t) -> None
-    self.source_instances.append(src)
+    if len(self.sources) and self.sources[-1] is src:
+      src_id = len(self.sources) - 1
+    else:
+      src_id = len(self.sources)
+      self.sources.append(src)
+    self.source_stack.append(src_id)
 
   def PopSource(self):
     # type: () -> None
-    self.source_instances.pop()
+    self.source_stack.pop()
 
   def AddLine(self, line, line_num):
     # type: (str, int) -> int
@@ -59,20 +97,36 @@ class Arena(object):
     line_id = len(self.line_vals)
     self.line_vals.append(line)
     self.line_nums.append(line_num)
-    self.line_srcs.append(self.source_instances[-1])
+    self.line_src_ids.append(self.source_stack[-1])
+    return line_id
+
+  def AddPagedLine(self, line, line_num, pager):
+    # type: (str, int, LinePager) -> int
+    """Like AddLine(), but only the pager keeps the text."""
+    line_id = len(self.line_vals)
+    self.line_vals.append(None)
+    self.line_nums.append(line_num)
+    src_id = self.source_stack[-1]
+    self.line_src_ids.append(src_id)
+
+    pager.Append(line)
+    self.pagers[src_id] = pager
     return line_id
 
   def GetLine(self, line_id):
     # type: (int) -> str
     """Return the text of a line.
 
-    TODO: This should be hidden behind an interface like Python's line cache?
-    It should store offsets (and maybe checkums).  It will have two
-    implementions: in-memory for interactive, and on-disk for batch and
-    'sourced' files.
+    Lines are kept in memory, except those added with AddPagedLine().  The
+    LinePager has those.
     """
     assert line_id >= 0, line_id
-    return self.line_vals[line_id]
+    line = self.line_vals[line_id]
+    if line is not None:
+      return line
+
+    pager = self.pagers[self.line_src_ids[line_id]]
+    return pager.GetLine(self.line_nums[line_id])
 
   def GetLineNumber(self, line_id):
     # type: (int) -> int
@@ -95,12 +149,12 @@ class Arena(object):
 
   def GetLineSource(self, line_id):
     # type: (int) -> source_t
-    return self.line_srcs[line_id]
+    return self.sources[self.line_src_ids[line_id]]
 
   def GetLineSourceString(self, line_id):
     # type: (int) -> str
     """Returns a human-readable string for dev tools."""
-    src = self.line_srcs[line_id]
+    src = self.GetLineSource(line_id)
     UP_src = src
 
     # TODO: Make it look nicer, like core/ui.py.
@@ -118,22 +172,42 @@ class Arena(object):
   def AddLineSpan(self, line_id, col, length):
     # type: (int, int, int) -> int
     """Save a line_span and return a new span ID for later retrieval."""
-    span_id = len(self.spans)  # spids are just array indices
-    span = line_span(line_id, col, length)
-    self.spans.append(span)
+    span_id = len(self.span_line_ids)  # spids are just array indices
+    self.span_line_ids.append(line_id)
+    self.span_cols.append(col)
+    self.span_lengths.append(length)
     return span_id
 
   def GetLineSpan(self, span_id):
     # type: (int) -> line_span
     assert span_id != runtime.NO_SPID, span_id
     try:
-      return self.spans[span_id]
+      return line_span(self.span_line_ids[span_id], self.span_cols[span_id],
+                       self.span_lengths[span_id])
     except IndexError:
       log('Span ID out of range: %d is greater than %d', span_id,
-          len(self.spans))
+          len(self.span_line_ids))
       raise
 
   def LastSpanId(self):
     # type: () -> int
     """Return one past the last span ID."""
-    return len(self.spans)
+    return len(self.span_line_ids)
+
+  def Stats(self):
+    # type: () -> Dict[str, int]
+    """Return counts for --parser-mem-dump."""
+    num_bytes = 0
+    num_paged = 0
+    for line in self.line_vals:
+      if line is None:
+        num_paged += 1
+      else:
+        num_bytes += len(line)
+    return {
+        'lines': len(self.line_vals),
+        'paged_lines': num_paged,
+        'line_bytes': num_bytes,
+        'spans': len(self.span_line_ids),
+        'sources': len(self.sources),
+    }
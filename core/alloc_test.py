@@ -55,6 +55,35 @@ class AllocTest(unittest.TestCase):
     self.assertEqual('one.oil', arena.GetLineSource(id3).path)
     self.assertEqual(3, arena.GetLineNumber(id3))
 
+    # The same instance pushed twice in a row is stored once
+    src = source.MainFile('three.oil')
+    for i in xrange(3):
+      arena.PushSource(src)
+      arena.AddLine('echo 3', i + 1)
+      arena.PopSource()
+    self.assertEqual(3, arena.Stats()['sources'])
+
+  def testLineSpan(self):
+    arena = self.arena
+    arena.PushSource(source.MainFile('one.oil'))
+    line_id = arena.AddLine('echo hi\n', 1)
+    arena.PopSource()
+
+    self.assertEqual(0, arena.AddLineSpan(line_id, 0, 4))
+    self.assertEqual(1, arena.AddLineSpan(line_id, 5, 2))
+    self.assertEqual(2, arena.LastSpanId())
+
+    span = arena.GetLineSpan(1)
+    self.assertEqual(line_id, span.line_id)
+    self.assertEqual(5, span.col)
+    self.assertEqual(2, span.length)
+    self.assertRaises(IndexError, arena.GetLineSpan, 2)
+
+    stats = arena.Stats()
+    self.assertEqual(1, stats['lines'])
+    self.assertEqual(8, stats['line_bytes'])
+    self.assertEqual(2, stats['spans'])
+
 
 if __name__ == '__main__':
   unittest.main()
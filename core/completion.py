@@ -474,74 +474,20 @@ class ExternalCommandAction(CompletionAction):
 
   This is PART of compge -A command.
   """
-  def __init__(self, mem):
+  def __init__(self, path_index):
+    # type: (state.PathIndex) -> None
     """
     Args:
-      mem: for looking up Path
+      path_index: shared with SearchPath, so directory listings are cached
+        across completions and invalidated by directory mtime.
     """
-    self.mem = mem
-    # Should we list everything executable in $PATH here?  And then whenever
-    # $PATH is changed, regenerated it?
-    # Or we can cache directory listings?  What if the contents of the dir
-    # changed?
-    # Can we look at the dir timestamp?
-    #
-    # (dir, timestamp) -> list of entries perhaps?  And then every time you hit
-    # tab, do you have to check the timestamp?  It should be cached by the
-    # kernel, so yes.
-    self.ext = []
-
-    # (dir, timestamp) -> list
-    # NOTE: This cache assumes that listing a directory is slower than statting
-    # it to get the mtime.  That may not be true on all systems?  Either way
-    # you are reading blocks of metadata.  But I guess /bin on many systems is
-    # huge, and will require lots of sys calls.
-    self.cache = {}
+    self.path_index = path_index
 
   def Matches(self, comp):
-    """
-    TODO: Cache is never cleared.
-
-    - When we get a newer timestamp, we should clear the old one.
-    - When PATH is changed, we can remove old entries.
-    """
-    val = self.mem.GetVar('PATH')
-    if val.tag != value_e.Str:
-      # No matches if not a string
-      return
-    path_dirs = val.s.split(':')
-    #log('path: %s', path_dirs)
-
-    executables = []
-    for d in path_dirs:
-      try:
-        st = posix.stat(d)
-      except OSError as e:
-        # There could be a directory that doesn't exist in the $PATH.
-        continue
-      key = (d, st.st_mtime)
-
-      dir_exes = self.cache.get(key)
-      if dir_exes is None:
-        entries = posix.listdir(d)
-        dir_exes = []
-        for name in entries:
-          path = os_path.join(d, name)
-          # TODO: Handle exception if file gets deleted in between listing and
-          # check?
-          if not posix.access(path, posix.X_OK_):
-            continue
-          dir_exes.append(name)  # append the name, not the path
-
-        self.cache[key] = dir_exes
-
-      executables.extend(dir_exes)
-
     # TODO: Shouldn't do the prefix / space thing ourselves.  readline does
     # that at the END of the line.
-    for word in executables:
-      if word.startswith(comp.to_complete):
-        yield word
+    for word in self.path_index.PrefixLookup(comp.to_complete):
+      yield word
 
 
 class GlobPredicate(object):
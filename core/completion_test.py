@@ -120,7 +120,7 @@ class CompletionTest(unittest.TestCase):
 
   def testExternalCommandAction(self):
     mem = state.Mem('dummy', [], None, [])
-    a = completion.ExternalCommandAction(mem)
+    a = completion.ExternalCommandAction(state.PathIndex(mem))
     comp = self._CompApi([], 0, 'f')
     print(list(a.Matches(comp)))
 
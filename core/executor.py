@@ -8,10 +8,13 @@ import sys
 
 #from _devbuild.gen.option_asdl import builtin_i
 from _devbuild.gen.id_kind_asdl import Id
-from _devbuild.gen.runtime_asdl import (value_e, value__Obj, redirect)
+from _devbuild.gen.runtime_asdl import (
+    value_e, value__Obj, redirect, redirect_arg_e
+)
 from _devbuild.gen.syntax_asdl import (
     command_e, command__Simple, command__Pipeline, command__ControlFlow,
-    command_str, Token, compound_word,
+    command_str, Token, compound_word, redir, redir_loc_e, redir_loc__Fd,
+    redir_param_e,
 )
 from asdl import runtime
 from core import error
@@ -20,12 +23,13 @@ from core.util import log, e_die
 from core.vm import _Executor
 from frontend import consts
 from oil_lang import objects
+from osh import word_
 from mycpp import mylib
 from mycpp.mylib import NewStr
 
 import posix_ as posix
 
-from typing import cast, Dict, List, TYPE_CHECKING
+from typing import cast, Dict, List, Optional, Tuple, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.id_kind_asdl import Id_t
   from _devbuild.gen.runtime_asdl import cmd_value__Argv
@@ -37,6 +41,7 @@ if TYPE_CHECKING:
   from core import ui
   from core.vm import _Builtin
   from osh import cmd_eval
+  from osh.bool_stat import StatCache
 
 
 class ShellExecutor(_Executor):
@@ -55,7 +60,10 @@ class ShellExecutor(_Executor):
       waiter,  # type: process.Waiter
       job_state,  # type: process.JobState
       fd_state,  # type: process.FdState
-      errfmt  # type: ui.ErrorFormatter
+      errfmt,  # type: ui.ErrorFormatter
+      max_capture=0,  # type: int
+      max_jobs=0,  # type: int
+      stat_cache=None,  # type: Optional[StatCache]
     ):
     # type: (...) -> None
     self.cmd_ev = None  # type: cmd_eval.CommandEvaluator
@@ -73,11 +81,24 @@ class ShellExecutor(_Executor):
     self.job_state = job_state
     self.fd_state = fd_state
     self.errfmt = errfmt
+    # osh --max-capture: the most bytes $(...) may return.  0 means no limit.
+    self.max_capture = max_capture
+    # osh --jobs: the most background jobs that may run at once.  0 means no
+    # limit.
+    self.max_jobs = max_jobs
+    # For shopt -s stat_cache.  Cleared whenever the file system may change.
+    self.stat_cache = stat_cache
 
   def CheckCircularDeps(self):
     # type: () -> None
     assert self.cmd_ev is not None
 
+  def _FilesMayChange(self):
+    # type: () -> None
+    """Called before we start a process or create a file."""
+    if self.stat_cache:
+      self.stat_cache.Clear()
+
   def _MakeProcess(self, node, parent_pipeline=None, inherit_errexit=True):
     # type: (command_t, process.Pipeline, bool) -> process.Process
     """
@@ -103,6 +124,7 @@ class ShellExecutor(_Executor):
     # interleaved.
     # - We could turn the `exit` builtin into a FatalRuntimeError exception and
     # get this check for "free".
+    self._FilesMayChange()
     thunk = process.SubProgramThunk(self.cmd_ev, node,
                                     inherit_errexit=inherit_errexit)
     p = process.Process(thunk, self.job_state, parent_pipeline=parent_pipeline)
@@ -246,7 +268,9 @@ class ShellExecutor(_Executor):
       return 127
 
     # Normal case: ls /
+    # Process.Start() uses posix_spawn() here, and only forks if that fails.
     if do_fork:
+      self._FilesMayChange()
       thunk = process.ExternalThunk(self.ext_prog, argv0_path, cmd_val, environ)
       p = process.Process(thunk, self.job_state)
       status = p.Run(self.waiter)
@@ -272,6 +296,13 @@ class ShellExecutor(_Executor):
     #  makes bookkeeping somewhat simpler."
     UP_node = node
 
+    # Wait for a job slot.  WaitForOne() blocks in waitpid(), so we're woken up
+    # when any child exits.
+    if self.max_jobs:
+      while self.job_state.NumRunning() >= self.max_jobs:
+        if not self.waiter.WaitForOne():
+          break  # nothing to wait for
+
     if UP_node.tag_() == command_e.Pipeline:
       node = cast(command__Pipeline, UP_node)
       pi = process.Pipeline()
@@ -332,16 +363,70 @@ class ShellExecutor(_Executor):
     p = self._MakeProcess(node.child)
     return p.Run(self.waiter)
 
+  def _CatFile(self, r):
+    # type: (redir) -> Tuple[Optional[str], int]
+    """Read the file for $(< file) without forking.
+
+    Errors are printed like the ones from the forked __cat < file.
+    """
+    # note: needed for redirect like $(< x$LINENO)
+    self.mem.SetCurrentSpanId(r.op.span_id)
+    try:
+      val = self.cmd_ev.word_ev.EvalWordToString(cast(compound_word, r.arg))
+    except error.FatalRuntime as e:  # e.g. set -u; it would exit the subshell
+      self.errfmt.PrettyPrintError(e, prefix='fatal: ')
+      return '', 1
+
+    filename = val.s
+    if not filename:
+      self.errfmt.Print("Redirect filename can't be empty",
+                        span_id=r.op.span_id)
+      return '', 1
+
+    try:
+      fd = posix.open(filename, posix.O_RDONLY, 0o666)
+    except OSError as e:
+      self.errfmt.Print(
+          "Can't open %r: %s", filename, posix.strerror(e.errno),
+          span_id=r.op.span_id)
+      return '', 1
+
+    try:
+      # read_all() makes one read of the file's size
+      s = posix.read_all(fd, self.max_capture, True)
+    except OSError as e:  # e.g. EISDIR
+      self.errfmt.Print(
+          "Can't read %r: %s", filename, posix.strerror(e.errno),
+          span_id=r.op.span_id)
+      return '', 1
+    finally:
+      posix.close(fd)
+
+    return s, 0
+
   def RunCommandSub(self, node):
     # type: (command_t) -> str
 
     # Hack for weird $(<file) construct
+    cat_redir = None  # type: redir
     if node.tag_() == command_e.Simple:
       simple = cast(command__Simple, node)
       # Detect '< file'
       if (len(simple.words) == 0 and
           len(simple.redirects) == 1 and
           simple.redirects[0].op.id == Id.Redir_Less):
+        cat_redir = simple.redirects[0]
+
+    if (cat_redir and cat_redir.loc.tag_() == redir_loc_e.Fd and
+        cast(redir_loc__Fd, cat_redir.loc).fd == 0 and
+        cat_redir.arg.tag_() == redir_param_e.Word and
+        word_.HasNoSideEffects(cast(compound_word, cat_redir.arg))):
+      # Read the file in this process.  Since the word can't assign
+      # variables, the result is the same as in a subshell.
+      s, status = self._CatFile(cat_redir)
+
+    else:
+      if cat_redir:
         # change it to __cat < file
         tok = Token(Id.Lit_Chars, runtime.NO_SPID, '__cat')
         cat_word = compound_word([tok])
@@ -349,24 +434,26 @@ class ShellExecutor(_Executor):
         # time in the parent process.
         simple.words.append(cat_word)
 
-    p = self._MakeProcess(node,
-                          inherit_errexit=self.exec_opts.inherit_errexit())
+      p = self._MakeProcess(node,
+                            inherit_errexit=self.exec_opts.inherit_errexit())
 
-    r, w = posix.pipe()
-    p.AddStateChange(process.StdoutToPipe(r, w))
-    _ = p.Start()
-    #log('Command sub started %d', pid)
-
-    chunks = []  # type: List[str]
-    posix.close(w)  # not going to write
-    while True:
-      byte_str = posix.read(r, 4096)
-      if len(byte_str) == 0:
-        break
-      chunks.append(byte_str)
-    posix.close(r)
+      r, w = posix.pipe()
+      p.AddStateChange(process.StdoutToPipe(r, w))
+      _ = p.Start()
+      #log('Command sub started %d', pid)
+
+      posix.close(w)  # not going to write
+      # Read into one buffer that grows geometrically, and trim trailing
+      # newlines in place.  Why trim?
+      # https://unix.stackexchange.com/questions/17747/why-does-shell-command-substitution-gobble-up-a-trailing-newline-char
+      s = posix.read_all(r, self.max_capture, True)
+      posix.close(r)  # if we stopped early, the child gets SIGPIPE
 
-    status = p.Wait(self.waiter)
+      status = p.Wait(self.waiter)
+
+    if s is None:
+      e_die('Command sub output is more than %d bytes (--max-capture)',
+            self.max_capture)
 
     # OSH has the concept of aborting in the middle of a WORD.  We're not
     # waiting until the command is over!
@@ -388,9 +475,7 @@ class ShellExecutor(_Executor):
       self.mem.SetLastStatus(status)
 
     # Runtime errors test case: # $("echo foo > $@")
-    # Why rstrip()?
-    # https://unix.stackexchange.com/questions/17747/why-does-shell-command-substitution-gobble-up-a-trailing-newline-char
-    return ''.join(chunks).rstrip('\n')
+    return s
 
   def RunProcessSub(self, node, op_id):
     # type: (command_t, Id_t) -> str
@@ -465,6 +550,11 @@ class ShellExecutor(_Executor):
 
   def PushRedirects(self, redirects):
     # type: (List[redirect]) -> bool
+    for r in redirects:
+      # Only < opens a file without creating or truncating it.
+      if r.arg.tag_() == redirect_arg_e.Path and r.op_id != Id.Redir_Less:
+        self._FilesMayChange()
+        break
     return self.fd_state.Push(redirects, self.waiter)
 
   def PopRedirects(self):
@@ -0,0 +1,425 @@
+#!/usr/bin/env python2
+"""
+fork_server.py - Run 'osh -c' in a child of a resident shell.
+
+Build systems run 'osh -c' many thousands of times, and most of each run is
+spent importing modules and loading the grammar.  A fork server does that once:
+
+    osh --fork-server $XDG_RUNTIME_DIR/osh.sock &
+    export OSH_FORK_SERVER=$XDG_RUNTIME_DIR/osh.sock
+    osh -c 'echo hi'   # runs in a child of the server
+
+The socket should be in a directory only you can write to.
+
+The client sends its argv, environment, cwd and umask over a Unix socket, along
+with fds 0, 1 and 2.  Before that, the client and server each check that the
+other is running as the same user, with getpeereid().  For each request, the server forks a session process,
+which forks the shell and tells the client how it exited.  The client forwards
+SIGINT, SIGTERM, SIGHUP and SIGQUIT to the shell's process group.
+
+If OSH_FORK_SERVER is unset, or nothing is listening there, or the server is
+another user's, or the shell isn't 'osh -c' / 'sh -c', the client runs the
+shell itself as usual.
+
+Differences from running the shell directly:
+
+- The shell is a session leader with no controlling terminal, so interactive
+  shells aren't forwarded.
+- $PPID is the session process, not the client.
+- Only fds 0, 1 and 2 are passed.
+- Signals other than the ones above have the server's dispositions, and rlimits
+  are the server's.
+"""
+from __future__ import print_function
+
+import errno
+import gc
+import signal
+import sys
+
+from pylib import os_path
+
+import posix_ as posix
+
+from typing import List, Dict, Optional, Callable, Tuple
+
+# Forwarded to the shell, and passed along if they're ignored
+_SIGNALS = [signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGQUIT]
+
+_MAX_REQUEST = 65536  # bytes per read
+
+
+class _Request(object):
+
+  def __init__(self, argv, environ, cwd, umask, ignored):
+    # type: (List[str], Dict[str, str], str, int, List[int]) -> None
+    self.argv = argv
+    self.environ = environ
+    self.cwd = cwd
+    self.umask = umask
+    self.ignored = ignored  # signal numbers
+
+
+def _EncodeRequest(req):
+  # type: (_Request) -> str
+  """NUL-separated fields, which can't appear in argv or the environment."""
+  parts = [
+      req.cwd, str(req.umask), ','.join(str(sig) for sig in req.ignored),
+      str(len(req.argv))
+  ]
+  parts.extend(req.argv)
+  for name, value in req.environ.iteritems():
+    parts.append('%s=%s' % (name, value))
+  return '\0'.join(parts)
+
+
+def _DecodeRequest(payload):
+  # type: (str) -> _Request
+  parts = payload.split('\0')
+  cwd = parts[0]
+  umask = int(parts[1])
+  ignored = [int(sig) for sig in parts[2].split(',') if sig]
+  argc = int(parts[3])
+  argv = parts[4:4 + argc]
+  environ = {}  # type: Dict[str, str]
+  for pair in parts[4 + argc:]:
+    name, value = pair.split('=', 1)
+    environ[name] = value
+  return _Request(argv, environ, cwd, umask, ignored)
+
+
+def _WriteAll(fd, s):
+  # type: (int, str) -> None
+  while s:
+    n = posix.write(fd, s)
+    s = s[n:]
+
+
+class _LineReader(object):
+  """Reads lines from a socket as they arrive."""
+
+  def __init__(self, fd):
+    # type: (int) -> None
+    self.fd = fd
+    self.buf = ''
+
+  def ReadLine(self):
+    # type: () -> Optional[str]
+    """Returns a line without the newline, or None at EOF."""
+    while '\n' not in self.buf:
+      chunk = posix.read(self.fd, 4096)
+      if not chunk:
+        return None
+      self.buf += chunk
+    line, self.buf = self.buf.split('\n', 1)
+    return line
+
+
+def _Stderr(msg, *args):
+  # type: (str, *str) -> None
+  posix.write(2, 'osh: ' + (msg % args) + '\n')
+
+
+def _SameUser(conn):
+  # type: (int) -> bool
+  """Is the process at the other end of the socket running as this user?"""
+  try:
+    uid, _ = posix.getpeereid(conn)
+  except OSError:
+    return False
+  return uid == posix.geteuid()
+
+
+#
+# Client
+#
+
+def ShouldForward(argv):
+  # type: (List[str]) -> bool
+  """Is this 'osh -c' or 'sh -c', with the same argv AppBundleMain gets?"""
+  if not argv:
+    return False
+  b = os_path.basename(argv[0])
+  main_name, ext = os_path.splitext(b)
+  shell_args = argv[1:]
+  if main_name == 'oil' and ext:  # oil.py or oil.ovm
+    if not shell_args:
+      return False
+    main_name = shell_args[0]
+    shell_args = shell_args[1:]
+  if main_name.startswith('-'):  # login shell
+    main_name = main_name[1:]
+  if main_name not in ('osh', 'sh'):
+    return False
+
+  i = 0
+  while i < len(shell_args):
+    arg = shell_args[i]
+    if arg in ('-o', '+o', '-O', '+O'):
+      i += 2
+      continue
+    if arg.startswith('--') or not arg.startswith(('-', '+')) or len(arg) < 2:
+      return False  # a script, or a flag we don't know about
+    flags = arg[1:]
+    if 'i' in flags:
+      return False
+    if 'c' in flags:
+      return True
+    i += 1
+  return False
+
+
+def Forward(path, argv):
+  # type: (str, List[str]) -> Optional[int]
+  """Run 'osh -c' in the fork server listening at path.
+
+  Returns:
+    The shell's exit status, or None if it should run in this process.
+  """
+  if not ShouldForward(argv):
+    return None
+  try:
+    conn = posix.unix_connect(path)
+  except OSError:
+    return None  # no server
+
+  # Don't send our environment and descriptors to another user's process
+  if not _SameUser(conn):
+    posix.close(conn)
+    _Stderr("fork server at %r isn't running as this user", path)
+    return None
+
+  try:
+    cwd = posix.getcwd()
+  except OSError:  # it was removed
+    posix.close(conn)
+    return None
+  umask = posix.umask(0)
+  posix.umask(umask)
+  ignored = [sig for sig in _SIGNALS if signal.getsignal(sig) == signal.SIG_IGN]
+
+  payload = _EncodeRequest(_Request(argv, posix.environ, cwd, umask, ignored))
+  msg = '%d\n%s' % (len(payload), payload)
+  try:
+    n = posix.send_fds(conn, msg, [0, 1, 2])
+    _WriteAll(conn, msg[n:])
+  except OSError:  # the server went away before it got the whole request
+    posix.close(conn)
+    return None
+
+  reader = _LineReader(conn)
+  line = reader.ReadLine()
+  if line is None:  # the server couldn't fork
+    posix.close(conn)
+    return None
+  pid = int(line.split()[1])
+
+  def _Relay(sig_num, unused_frame):
+    # type: (int, object) -> None
+    try:
+      posix.killpg(pid, sig_num)
+    except OSError:  # already exited
+      pass
+
+  for sig in _SIGNALS:
+    if sig not in ignored:
+      signal.signal(sig, _Relay)
+
+  line = reader.ReadLine()
+  posix.close(conn)
+  if line is None:
+    _Stderr("lost connection to fork server at %r", path)
+    return 2
+
+  how, num = line.split()
+  if how == 'signal':
+    # Die the same way, so the caller sees a signal
+    sig = int(num)
+    signal.signal(sig, signal.SIG_DFL)
+    posix.kill(posix.getpid(), sig)
+    return 128 + sig  # not reached if the signal is fatal
+  return int(num)
+
+
+#
+# Server
+#
+
+def _ReadRequest(conn):
+  # type: (int) -> Tuple[List[int], Optional[_Request]]
+  """Returns None if the client hung up without sending anything."""
+  data, fds = posix.recv_fds(conn, _MAX_REQUEST)
+  if not data:  # e.g. Serve() checking for another server
+    return fds, None
+  while '\n' not in data:
+    chunk = posix.read(conn, _MAX_REQUEST)
+    if not chunk:
+      raise ValueError('truncated request')
+    data += chunk
+  header, payload = data.split('\n', 1)
+  length = int(header)
+
+  chunks = [payload]
+  n = len(payload)
+  while n < length:
+    chunk = posix.read(conn, min(length - n, _MAX_REQUEST))
+    if not chunk:
+      raise ValueError('truncated request')
+    chunks.append(chunk)
+    n += len(chunk)
+
+  if len(fds) != 3:
+    raise ValueError('expected 3 descriptors, got %d' % len(fds))
+  return fds, _DecodeRequest(''.join(chunks))
+
+
+def _SetEnviron(environ):
+  # type: (Dict[str, str]) -> None
+  """Replace the environment, for the shell and the processes it starts."""
+  for name in posix.environ.keys():
+    if name not in environ:
+      posix.unsetenv(name)
+  for name, value in environ.iteritems():
+    posix.putenv(name, value)
+  posix.environ.clear()
+  posix.environ.update(environ)
+
+
+def _RunShell(conn, fds, req, main_func):
+  # type: (int, List[int], _Request, Callable[[List[str]], int]) -> None
+  """In the shell process.  Never returns."""
+  status = 1
+  try:
+    posix.setsid()  # the client's signals go to our process group
+    for i, fd in enumerate(fds):
+      posix.dup2(fd, i)
+    for fd in fds + [conn]:
+      if fd > 2:
+        posix.close(fd)
+
+    posix.chdir(req.cwd)
+    posix.umask(req.umask)
+    _SetEnviron(req.environ)
+    for sig in _SIGNALS:
+      if sig in req.ignored:
+        signal.signal(sig, signal.SIG_IGN)
+      elif sig == signal.SIGINT:
+        signal.signal(sig, signal.default_int_handler)  # as Python starts
+      else:
+        signal.signal(sig, signal.SIG_DFL)
+
+    sys.argv = req.argv
+    status = main_func(req.argv)
+  except SystemExit as e:
+    status = e.code if isinstance(e.code, int) else 1
+  except BaseException as e:
+    _Stderr('fork server: %s', str(e))
+  finally:
+    # Don't unwind into the server's loop
+    try:
+      sys.stdout.flush()
+      sys.stderr.flush()
+    finally:
+      posix._exit(status)
+
+
+def _RunSession(conn, main_func):
+  # type: (int, Callable[[List[str]], int]) -> None
+  """In the session process: fork the shell and report how it exited.
+
+  Never returns.
+  """
+  try:
+    fds, req = _ReadRequest(conn)
+    if req is None:
+      return
+    pid = posix.fork()
+    if pid == 0:
+      _RunShell(conn, fds, req, main_func)
+    for fd in fds:
+      posix.close(fd)
+
+    _WriteAll(conn, 'pid %d\n' % pid)
+    while True:
+      try:
+        _, status = posix.waitpid(pid, 0)
+        break
+      except OSError as e:
+        if e.errno != errno.EINTR:
+          raise
+    if posix.WIFSIGNALED(status):
+      _WriteAll(conn, 'signal %d\n' % posix.WTERMSIG(status))
+    else:
+      _WriteAll(conn, 'status %d\n' % posix.WEXITSTATUS(status))
+  except BaseException as e:  # a bad request, or the client went away
+    _Stderr('fork server: %s', str(e))
+  finally:
+    posix._exit(0)
+
+
+def _Reap():
+  # type: () -> None
+  """Wait for session processes that have exited."""
+  while True:
+    try:
+      pid, _ = posix.waitpid(-1, posix.WNOHANG)
+    except OSError:  # ECHILD
+      return
+    if pid == 0:
+      return
+
+
+def Serve(path, main_func):
+  # type: (str, Callable[[List[str]], int]) -> int
+  """Listen at path, and run main_func(argv) in a child for each client.
+
+  Returns an exit status if the server can't start; otherwise runs until it's
+  killed.
+  """
+  try:
+    fd = posix.unix_connect(path)
+  except OSError:
+    pass
+  else:
+    posix.close(fd)
+    _Stderr('a fork server is already listening at %r', path)
+    return 1
+
+  try:
+    posix.unlink(path)  # left over from a server that was killed
+  except OSError as e:
+    if e.errno != errno.ENOENT:
+      _Stderr("can't remove %r: %s", path, posix.strerror(e.errno))
+      return 1
+
+  old_umask = posix.umask(0o177)  # only this user can connect
+  try:
+    listen_fd = posix.unix_listen(path, 128)
+  except OSError as e:
+    _Stderr("can't listen at %r: %s", path, posix.strerror(e.errno))
+    return 1
+  finally:
+    posix.umask(old_umask)
+
+  # Objects that exist now are shared by every child.  Don't make the garbage
+  # collector touch their pages.
+  gc.collect()
+  if hasattr(gc, 'freeze'):
+    gc.freeze()
+
+  try:
+    while True:
+      conn = posix.accept(listen_fd)
+      _Reap()
+      if not _SameUser(conn):  # it would run a shell as us
+        posix.close(conn)
+        continue
+      sys.stdout.flush()
+      sys.stderr.flush()
+      pid = posix.fork()
+      if pid == 0:
+        posix.close(listen_fd)
+        _RunSession(conn, main_func)
+      posix.close(conn)
+  finally:
+    posix.unlink(path)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python2
+"""
+fork_server_test.py: Tests for fork_server.py
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+from core import fork_server  # module under test
+
+import posix_ as posix
+
+
+class RequestTest(unittest.TestCase):
+
+  def testRoundTrip(self):
+    req = fork_server._Request(['osh', '-c', 'echo "$@"', 'x', ''],
+                               {'A': '1', 'B': 'x=y', 'EMPTY': ''}, '/tmp',
+                               0o22, [signal.SIGINT])
+    out = fork_server._DecodeRequest(fork_server._EncodeRequest(req))
+    self.assertEqual(req.argv, out.argv)
+    self.assertEqual(req.environ, out.environ)
+    self.assertEqual('/tmp', out.cwd)
+    self.assertEqual(0o22, out.umask)
+    self.assertEqual([signal.SIGINT], out.ignored)
+
+    req = fork_server._Request(['sh'], {}, '/', 0, [])
+    out = fork_server._DecodeRequest(fork_server._EncodeRequest(req))
+    self.assertEqual(['sh'], out.argv)
+    self.assertEqual({}, out.environ)
+    self.assertEqual([], out.ignored)
+
+  def testShouldForward(self):
+    CASES = [
+        (['osh', '-c', 'echo hi'], True),
+        (['/usr/bin/osh', '-e', '-c', 'echo hi'], True),
+        (['sh', '-ec', 'echo hi'], True),
+        (['-osh', '-c', 'echo hi'], True),
+        (['osh', '-o', 'errexit', '-c', 'echo hi'], True),
+        (['osh', '+o', 'errexit', '-c', 'echo hi'], True),
+        (['oil.ovm', 'osh', '-c', 'echo hi'], True),
+        (['bin/oil.py', 'sh', '-c', 'echo hi'], True),
+
+        (['osh'], False),
+        (['osh', 'script.sh'], False),
+        (['osh', '-i', '-c', 'echo hi'], False),
+        (['osh', '--rcfile', 'x', '-c', 'echo hi'], False),
+        (['osh', '--fork-server', '/tmp/osh.sock'], False),
+        (['oil', '-c', 'echo hi'], False),
+        (['oil.ovm', 'oil', '-c', 'echo hi'], False),
+        (['oil.ovm'], False),
+        ([], False),
+    ]
+    for argv, expected in CASES:
+      self.assertEqual(expected, fork_server.ShouldForward(argv), argv)
+
+
+def _FakeMain(argv):
+  """Write what the shell would see to the file named after -c."""
+  with open(argv[2], 'w') as f:
+    f.write('%s|%s|%s|%d' % (' '.join(argv), posix.environ.get('X'),
+                             os.getcwd(), os.getppid() != 1))
+  return int(argv[3])
+
+
+class ServerTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.sock_path = os.path.join(self.tmp_dir, 'osh.sock')
+
+    self.server_pid = os.fork()
+    if self.server_pid == 0:
+      os._exit(fork_server.Serve(self.sock_path, _FakeMain))
+    for _ in xrange(100):
+      if os.path.exists(self.sock_path):
+        break
+      time.sleep(0.01)
+
+    self.old_handlers = [(sig, signal.getsignal(sig))
+                         for sig in fork_server._SIGNALS]
+
+  def tearDown(self):
+    for sig, handler in self.old_handlers:
+      signal.signal(sig, handler)
+    os.kill(self.server_pid, signal.SIGKILL)
+    os.waitpid(self.server_pid, 0)
+    shutil.rmtree(self.tmp_dir)
+
+  def testForward(self):
+    out_path = os.path.join(self.tmp_dir, 'out')
+    posix.environ['X'] = 'from client'
+    try:
+      status = fork_server.Forward(self.sock_path,
+                                   ['osh', '-c', out_path, '42'])
+    finally:
+      del posix.environ['X']
+    self.assertEqual(42, status)
+
+    with open(out_path) as f:
+      contents = f.read()
+    self.assertEqual(
+        'osh -c %s 42|from client|%s|1' % (out_path, os.getcwd()), contents)
+
+    # A second server isn't started
+    self.assertEqual(1, fork_server.Serve(self.sock_path, _FakeMain))
+
+  def testNotForwarded(self):
+    self.assertEqual(None, fork_server.Forward(self.sock_path,
+                                               ['osh', 'script.sh']))
+    self.assertEqual(None, fork_server.Forward(
+        os.path.join(self.tmp_dir, 'nonexistent.sock'), ['osh', '-c', 'x']))
+
+  def testOtherUser(self):
+    if os.geteuid() != 0:
+      return  # can't start a server as another user
+
+    # A server running as 'nobody', which root can connect to
+    os.chmod(self.tmp_dir, 0o777)
+    sock_path = os.path.join(self.tmp_dir, 'nobody.sock')
+    pid = os.fork()
+    if pid == 0:
+      os.setgid(65534)
+      os.setuid(65534)
+      os._exit(fork_server.Serve(sock_path, _FakeMain))
+    try:
+      for _ in xrange(100):
+        if os.path.exists(sock_path):
+          break
+        time.sleep(0.01)
+
+      out_path = os.path.join(self.tmp_dir, 'out')
+      self.assertEqual(None, fork_server.Forward(sock_path,
+                                                 ['osh', '-c', out_path, '0']))
+      self.assertEqual(False, os.path.exists(out_path))
+    finally:
+      os.kill(pid, signal.SIGKILL)
+      os.waitpid(pid, 0)
+
+
+if __name__ == '__main__':
+  unittest.main()
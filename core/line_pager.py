@@ -0,0 +1,144 @@
+#!/usr/bin/env python2
+"""
+line_pager.py - Read the lines of batch scripts and sourced files on demand.
+
+The Arena would otherwise keep the text of every line of every file for the
+life of the shell.  Most of it is never looked at again, since $LINENO and
+${BASH_LINENO[@]} only need line numbers.
+
+With 'shopt -s page_lines', FilePager records the absolute path of the file,
+its size, and a checksum of its lines.  It keeps the lines of the command
+being parsed in memory, since the parser slices them for a[i]=x and aliases.
+After that, the text is read back from the file when a line is needed, e.g.
+for an error message or 'shopt -s lst_cache'.  If the file changed after it
+was parsed, the checksum won't match and paged lines are empty, with a
+warning.
+"""
+from __future__ import print_function
+
+import stat
+
+from core import alloc
+from core import pyutil
+from pylib import os_path
+
+import posix_ as posix
+
+from typing import List, Optional, TYPE_CHECKING
+if TYPE_CHECKING:
+  from core import optview
+
+
+def _Checksum(checksum, line):
+  # type: (int, str) -> int
+  return hash((checksum, line))
+
+
+def _SplitLines(contents):
+  # type: (str) -> List[str]
+  """Split like readline() does, keeping the newlines."""
+  parts = contents.split('\n')
+  lines = [part + '\n' for part in parts[:-1]]
+  if parts[-1]:
+    lines.append(parts[-1])  # no newline at EOF
+  return lines
+
+
+class FilePager(alloc.LinePager):
+
+  def __init__(self, path):
+    # type: (str) -> None
+    self.path = path  # absolute, since the shell may cd
+    self.num_bytes = 0
+    self.checksum = 0
+
+    # Lines the parser may still need, starting at line number pending_start
+    self.pending = []  # type: List[str]
+    self.pending_start = 1
+
+    # The lines read back so far.  More may be parsed after that, so this is
+    # re-read when a later line is needed.
+    self.lines = None  # type: Optional[List[str]]
+    self.changed = False
+
+  def Append(self, line):
+    # type: (str) -> None
+    self.num_bytes += len(line)
+    self.checksum = _Checksum(self.checksum, line)
+    self.pending.append(line)
+
+  def Release(self):
+    # type: () -> None
+    """Keep only the current line, which the lexer may still be on."""
+    n = len(self.pending)
+    if n > 1:
+      self.pending = [self.pending[-1]]
+      self.pending_start += n - 1
+
+  def _Load(self):
+    # type: () -> None
+    try:
+      fd = posix.open(self.path, posix.O_RDONLY, 0)
+      try:
+        contents = posix.read_all(fd, 0, False)
+      finally:
+        posix.close(fd)
+    except OSError as e:
+      self._Changed(posix.strerror(e.errno))
+      return
+
+    # The file may have grown since we stopped reading it
+    lines = _SplitLines(contents[:self.num_bytes])
+    checksum = 0
+    for line in lines:
+      checksum = _Checksum(checksum, line)
+
+    if len(contents) < self.num_bytes or checksum != self.checksum:
+      self._Changed('it changed after it was parsed')
+      return
+
+    self.lines = lines
+
+  def _Changed(self, reason):
+    # type: (str) -> None
+    pyutil.stderr_line("osh warning: Can't show lines of %r: %s", self.path,
+                       reason)
+    self.changed = True
+
+  def GetLine(self, line_num):
+    # type: (int) -> str
+    i = line_num - self.pending_start
+    if i >= 0:
+      return self.pending[i]
+
+    if self.changed:
+      return ''
+    if self.lines is None or line_num > len(self.lines):
+      self._Load()
+      if self.changed:
+        return ''
+    return self.lines[line_num - 1]
+
+
+class FilePagers(object):
+  """Makes a FilePager for each file that can be read back later.
+
+  Used for the main script and the 'source' builtin.
+  """
+
+  def __init__(self, exec_opts):
+    # type: (optview.Exec) -> None
+    self.exec_opts = exec_opts
+
+  def ForFile(self, path, fd):
+    # type: (str, int) -> Optional[FilePager]
+    """Returns None unless 'shopt -s page_lines', and for pipes, etc."""
+    if not self.exec_opts.page_lines():
+      return None
+    try:
+      st = posix.fstat(fd)
+    except OSError:
+      return None
+    if not stat.S_ISREG(st.st_mode):
+      return None
+    return FilePager(os_path.abspath(path))
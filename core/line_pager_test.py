@@ -0,0 +1,160 @@
+#!/usr/bin/env python2
+"""
+line_pager_test.py: Tests for line_pager.py
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from _devbuild.gen.syntax_asdl import source
+from core import alloc
+from core import line_pager  # module under test
+from core import main_loop
+from core import state
+from core import test_lib
+from frontend import reader
+
+
+class LinePagerTest(unittest.TestCase):
+
+  def setUp(self):
+    mem = state.Mem('', [], alloc.Arena(), [])
+    _, exec_opts, self.mutable_opts = state.MakeOpts(mem, None)
+    self.mutable_opts.SetShoptOption('page_lines', True)
+    self.pagers = line_pager.FilePagers(exec_opts)
+
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, 'lib.sh')
+    with open(self.path, 'w') as f:
+      f.write('echo one\n\necho two')  # no newline at EOF
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def _MakeReader(self, f, arena):
+    return reader.FileLineReader(f, arena,
+                                 pager=self.pagers.ForFile(self.path, f.fileno()))
+
+  def _ReadLines(self, arena):
+    arena.PushSource(source.MainFile(self.path))
+    with open(self.path) as f:
+      r = self._MakeReader(f, arena)
+      line_ids = []
+      while True:
+        line_id, line, _ = r.GetLine()
+        if line is None:
+          break
+        line_ids.append(line_id)
+      r.ReleaseLines()  # the parser is done with them
+    arena.PopSource()
+    return line_ids
+
+  def testReadBack(self):
+    arena = alloc.Arena()
+    line_ids = self._ReadLines(arena)
+    self.assertEqual(3, len(line_ids))
+    self.assertEqual(3, arena.Stats()['paged_lines'])
+    self.assertEqual(0, arena.Stats()['line_bytes'])
+
+    # Appending doesn't matter, since we only check what we read
+    with open(self.path, 'a') as f:
+      f.write('\necho three\n')
+
+    self.assertEqual('echo one\n', arena.GetLine(line_ids[0]))
+    self.assertEqual('\n', arena.GetLine(line_ids[1]))
+    self.assertEqual('echo two', arena.GetLine(line_ids[2]))
+    self.assertEqual(3, arena.GetLineNumber(line_ids[2]))
+
+  def testLaterLines(self):
+    # A line is read back before the rest of the file has been parsed
+    with open(self.path, 'w') as f:
+      f.write('echo one\necho two\necho three\necho four\n')
+
+    arena = alloc.Arena()
+    arena.PushSource(source.MainFile(self.path))
+    with open(self.path) as f:
+      r = self._MakeReader(f, arena)
+      line_ids = []
+      for _ in xrange(2):
+        line_id, _, _ = r.GetLine()
+        line_ids.append(line_id)
+      r.ReleaseLines()
+      self.assertEqual('echo one\n', arena.GetLine(line_ids[0]))
+
+      for _ in xrange(2):
+        line_id, _, _ = r.GetLine()
+        line_ids.append(line_id)
+      r.ReleaseLines()
+    arena.PopSource()
+
+    self.assertEqual('echo three\n', arena.GetLine(line_ids[2]))
+    self.assertEqual('echo four\n', arena.GetLine(line_ids[3]))
+
+  def testParseMultiLineWords(self):
+    # The parser re-reads lines for a[i]=x and aliases
+    with open(self.path, 'w') as f:
+      f.write('a[1+1]=x \\\n  b=2\ne a[2]=y \\\n  c=3\n')
+
+    arena = alloc.Arena()
+    parse_ctx = test_lib.InitParseContext(arena=arena, aliases={'e': 'echo'})
+    arena.PushSource(source.MainFile(self.path))
+    with open(self.path) as f:
+      c_parser = parse_ctx.MakeOshParser(self._MakeReader(f, arena))
+      node = main_loop.ParseWholeFile(c_parser)
+    arena.PopSource()
+
+    self.assertEqual(2, len(node.children))
+    self.assertEqual(4, arena.Stats()['paged_lines'])
+
+  def testChangedWhileParsing(self):
+    # The lines of the command being parsed don't depend on the file, e.g. if
+    # a script runs sed -i on itself.
+    arena = alloc.Arena()
+    arena.PushSource(source.MainFile(self.path))
+    with open(self.path) as f:
+      r = self._MakeReader(f, arena)
+      line_ids = []
+      for _ in xrange(2):
+        line_id, _, _ = r.GetLine()
+        line_ids.append(line_id)
+
+      with open(self.path, 'w') as f2:
+        f2.write('echo ONE\n')
+
+      self.assertEqual('echo one\n', arena.GetLine(line_ids[0]))
+      self.assertEqual('\n', arena.GetLine(line_ids[1]))
+
+      # The current line is still kept
+      r.ReleaseLines()
+      self.assertEqual('\n', arena.GetLine(line_ids[1]))
+      self.assertEqual('', arena.GetLine(line_ids[0]))
+    arena.PopSource()
+
+  def testChanged(self):
+    arena = alloc.Arena()
+    line_ids = self._ReadLines(arena)
+
+    with open(self.path, 'w') as f:
+      f.write('echo ONE\n\necho two')
+
+    # The last line is kept in memory for the parser
+    self.assertEqual('echo two', arena.GetLine(line_ids[2]))
+    self.assertEqual('', arena.GetLine(line_ids[0]))
+
+  def testOptIn(self):
+    self.mutable_opts.SetShoptOption('page_lines', False)
+    with open(self.path) as f:
+      self.assertEqual(None, self.pagers.ForFile(self.path, f.fileno()))
+
+  def testNotRegularFile(self):
+    r, w = os.pipe()
+    self.assertEqual(None, self.pagers.ForFile('/dev/stdin', r))
+    os.close(r)
+    os.close(w)
+
+
+if __name__ == '__main__':
+  unittest.main()
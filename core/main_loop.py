@@ -24,9 +24,10 @@ from core import util
 from core.util import log
 from mycpp import mylib
 
-from typing import Any, List, TYPE_CHECKING
+from typing import Any, List, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
   from core.alloc import Arena
+  from core.parse_cache import CachedFile, _Recorder
   from core.comp_ui import _IDisplay
   from core.ui import ErrorFormatter
   from osh.cmd_parse import CommandParser
@@ -123,10 +124,14 @@ if mylib.PYTHON:
     return status
 
 
-def Batch(cmd_ev, c_parser, arena, is_main=False):
-  # type: (CommandEvaluator, CommandParser, Arena, bool) -> int
+def Batch(cmd_ev, c_parser, arena, is_main=False, recorder=None):
+  # type: (CommandEvaluator, CommandParser, Arena, bool, Optional[_Recorder]) -> int
   """Loop for batch execution.
 
+  Args:
+    recorder: if passed, gets each node before it's executed, and is told when
+      the whole file has been parsed and run.  For core/parse_cache.py.
+
   Returns:
     int status, e.g. 2 on parse error
 
@@ -152,14 +157,22 @@ def Batch(cmd_ev, c_parser, arena, is_main=False):
       node = c_parser.ParseLogicalLine()  # can raise ParseError
       if node is None:  # EOF
         c_parser.CheckForPendingHereDocs()  # can raise ParseError
+        if recorder:
+          recorder.Finish()
         break
     except error.Parse as e:
       ui.PrettyPrintError(e, arena)
       status = 2
       break
+    c_parser.line_reader.ReleaseLines()
+
+    if recorder:
+      recorder.AddNode(node, c_parser.line_reader.line_num)
 
-    # Only optimize if we're on the last line like -c "echo hi" etc.
-    optimize = is_main and c_parser.line_reader.LastLineHint()
+    # Only optimize if we're on the last line like -c "echo hi" etc.  Not
+    # when recording, since exec() would skip recorder.Finish().
+    optimize = (is_main and recorder is None and
+                c_parser.line_reader.LastLineHint())
 
     # can't optimize this because we haven't seen the end yet
     is_return, is_fatal = cmd_ev.ExecuteAndCatch(node, optimize=optimize)
@@ -171,6 +184,29 @@ def Batch(cmd_ev, c_parser, arena, is_main=False):
   return status
 
 
+def BatchNodes(cmd_ev, c_parser, arena, cached, is_main=False):
+  # type: (CommandEvaluator, CommandParser, Arena, CachedFile, bool) -> int
+  """Like Batch(), but for nodes that were already parsed.
+
+  Used for files loaded from core/parse_cache.py.  If a node changes aliases
+  or parse options, the rest of the file is parsed with c_parser, like
+  Batch() would have.
+  """
+  status = 0
+  n = len(cached.nodes)
+  for i, node in enumerate(cached.nodes):
+    optimize = is_main and i == n - 1
+    is_return, is_fatal = cmd_ev.ExecuteAndCatch(node, optimize=optimize)
+    status = cmd_ev.LastStatus()
+    if is_return or is_fatal:
+      break
+
+    if i != n - 1 and cached.ParseStateChanged():
+      c_parser.line_reader.SkipTo(cached.next_lines[i])
+      return Batch(cmd_ev, c_parser, arena, is_main=is_main)
+  return status
+
+
 def ParseWholeFile(c_parser):
   # type: (CommandParser) -> command_t
   """Parse an entire shell script.
@@ -186,6 +222,7 @@ def ParseWholeFile(c_parser):
     if node is None:  # EOF
       c_parser.CheckForPendingHereDocs()  # can raise ParseError
       break
+    c_parser.line_reader.ReleaseLines()
     children.append(node)
 
   if len(children) == 1:
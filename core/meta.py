@@ -6,16 +6,53 @@ TODO: Move to core/pyutil.py
 
 from pgen2 import grammar
 
-from typing import TYPE_CHECKING
+from typing import Any, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
   from core.pyutil import _ResourceLoader
 
 
+class _LazyGrammar(grammar.Grammar):
+  """A Grammar whose tables are unmarshalled the first time they're used.
+
+  Most shells, e.g. osh -c 'true' or a configure script, never parse an Oil
+  expression.
+  """
+
+  def __init__(self, loader):
+    # type: (_ResourceLoader) -> None
+    # Don't call grammar.Grammar.__init__(), because its empty tables would
+    # hide __getattr__().
+    self.loader = loader  # type: Optional[_ResourceLoader]
+
+  def Load(self):
+    # type: () -> None
+    """Load the tables now, e.g. before osh --fork-server forks."""
+    if self.loader is None:  # already loaded
+      return
+
+    f = self.loader.open('_devbuild/gen/grammar.marshal')
+    contents = f.read()
+    f.close()
+    self.loader = None
+    self.loads(contents)
+
+  def __getattr__(self, name):
+    # type: (str) -> Any
+    """Only called for attributes that aren't set yet."""
+    if self.loader is None:  # already loaded
+      raise AttributeError(name)
+
+    self.Load()
+    return getattr(self, name)
+
+
+_oil_grammar = None  # type: Optional[_LazyGrammar]
+
+
 def LoadOilGrammar(loader):
-  # type: (_ResourceLoader) -> grammar.Grammar
-  oil_grammar = grammar.Grammar()
-  f = loader.open('_devbuild/gen/grammar.marshal')
-  contents = f.read()
-  f.close()
-  oil_grammar.loads(contents)
-  return oil_grammar
+  # type: (_ResourceLoader) -> _LazyGrammar
+  """Returns the Oil grammar, which is shared by all callers."""
+  global _oil_grammar
+  if _oil_grammar is None:
+    _oil_grammar = _LazyGrammar(loader)
+  return _oil_grammar
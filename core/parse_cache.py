@@ -0,0 +1,339 @@
+#!/usr/bin/env python2
+"""
+parse_cache.py - An on-disk cache of the LST for scripts and sourced files.
+
+With 'shopt -s lst_cache' (or 'osh -O lst_cache foo.sh'), the nodes parsed
+from a file are saved under $XDG_CACHE_HOME/oil/lst, and loaded instead of
+reparsing the file next time.
+
+An entry is keyed by:
+
+- the absolute path, mtime, and size of the file
+- the OSH version
+- the aliases and parse options in effect, which change how the file is parsed
+
+Span IDs in the LST are indices into the Arena, so each entry also stores the
+lines and spans the nodes refer to.  When it's loaded, they're appended to the
+current Arena and the span IDs are rewritten.
+
+A file is NOT cached if:
+
+- it has a parse error, or execution stops before EOF (return, exit, fatal
+  error).  We only save complete parses.
+- aliases or parse options change while it's running, since the rest of the
+  file would then be parsed differently.
+- it was modified in the last few seconds, since a second write within the
+  mtime granularity wouldn't be noticed.
+
+Whether the state changes can depend on the environment, e.g. an alias
+defined in an 'if'.  So when cached nodes are run, the state is checked after
+each one too.  If it changed, the rest of the file is parsed as usual,
+starting at the line after that node.  See main_loop.BatchNodes().
+"""
+from __future__ import print_function
+
+import time
+
+from _devbuild.gen.runtime_asdl import value_e
+from _devbuild.gen.syntax_asdl import source_e
+from frontend import consts
+from pylib import os_path
+
+import posix_ as posix
+
+from typing import Dict, List, Optional, Tuple, Any, TYPE_CHECKING
+if TYPE_CHECKING:
+  from _devbuild.gen.syntax_asdl import command_t, source_t
+  from core.state import Mem
+  from frontend.parse_lib import ParseContext
+
+# NOTE: cPickle is imported where it's used, since most shells never turn on
+# lst_cache.
+
+# Bump this when the file format changes.  Changes to the LST schema are
+# covered by the OSH version.
+_FORMAT = 2
+
+_SUFFIX = '.oshc'
+
+# Don't save files modified this recently.  See module docstring.
+_RACY_SECONDS = 2
+
+
+def _IsSpidField(name):
+  # type: (str) -> bool
+  return (name in ('spid', 'spids', 'span_id') or
+          name.endswith('_spid') or name.endswith('_span_id'))
+
+
+def _VisitSpids(obj, f, seen):
+  # type: (Any, Any, Dict[int, bool]) -> None
+  """Call f(spid) on each span ID in an ASDL tree, and store the result.
+
+  Objects can be shared, so 'seen' has the id() of the ones already visited.
+  """
+  if isinstance(obj, list):
+    for child in obj:
+      _VisitSpids(child, f, seen)
+    return
+
+  slots = getattr(obj, '__slots__', None)
+  if slots is None:  # str, int, bool, None, Id
+    return
+
+  if id(obj) in seen:
+    return
+  seen[id(obj)] = True
+
+  for name in slots:
+    val = getattr(obj, name)
+    if val is None:
+      continue
+    if _IsSpidField(name):
+      if isinstance(val, list):
+        setattr(obj, name, [f(spid) for spid in val])
+      else:
+        setattr(obj, name, f(val))
+    else:
+      _VisitSpids(val, f, seen)
+
+
+class _Recorder(object):
+  """Saves nodes as they're parsed by main_loop.Batch()."""
+
+  def __init__(self, cache, cache_path, key, file_src):
+    # type: (ParseCache, str, Tuple, source_t) -> None
+    self.cache = cache
+    self.cache_path = cache_path
+    self.key = key
+    self.file_src = file_src
+
+    self.spids = {}  # type: Dict[int, bool]
+    self.todo = []  # type: List[int]  # spids whose spans aren't saved yet
+    self.blobs = []  # type: List[str]
+    self.next_lines = []  # type: List[int]  # where parsing resumes after each
+    self.valid = True
+
+  def _CollectSpid(self, spid):
+    # type: (int) -> int
+    if spid >= 0 and spid not in self.spids:
+      self.spids[spid] = True
+      self.todo.append(spid)
+    return spid
+
+  def AddNode(self, node, next_line):
+    # type: (command_t, int) -> None
+    """Save a node, and the number of the line the parser reads next."""
+    if not self.valid:
+      return
+    # The previous node was executed, so check that it didn't change how the
+    # rest of the file is parsed.
+    if self.cache.ParseStateKey() != self.key[-2:]:
+      self.valid = False
+      self.blobs = []
+      return
+
+    import cPickle
+
+    _VisitSpids(node, self._CollectSpid, {})
+    # Serialize now, before execution can mutate anything.
+    self.blobs.append(cPickle.dumps(node, cPickle.HIGHEST_PROTOCOL))
+    self.next_lines.append(next_line)
+
+  def Finish(self):
+    # type: () -> None
+    """Called when the whole file was parsed and run."""
+    if not self.valid:
+      return
+    arena = self.cache.arena
+
+    line_index = {}  # type: Dict[int, int]
+    lines = []  # type: List[Tuple[str, int, Optional[source_t]]]
+    spans = []  # type: List[Tuple[int, int, int, int]]
+
+    while self.todo:
+      spid = self.todo.pop()
+      span = arena.GetLineSpan(spid)
+      i = line_index.get(span.line_id)
+      if i is None:
+        i = len(lines)
+        line_index[span.line_id] = i
+        src = arena.GetLineSource(span.line_id)
+        if src is self.file_src:
+          src = None  # replaced with the source being loaded
+        elif src.tag_() in (source_e.MainFile, source_e.SourcedFile):
+          return  # another file; shouldn't happen
+        else:
+          # source.Backticks, source.Alias, etc. refer to spans that may not be
+          # in the tree.  This adds them to the worklist.
+          _VisitSpids(src, self._CollectSpid, {})
+        lines.append((arena.GetLine(span.line_id),
+                      arena.GetLineNumber(span.line_id), src))
+      spans.append((spid, i, span.col, span.length))
+
+    entry = (self.key, lines, spans, self.blobs, self.next_lines)
+    self.cache.Write(self.cache_path, entry)
+
+
+class CachedFile(object):
+  """The nodes of a file loaded from the cache."""
+
+  def __init__(self, cache, key, nodes, next_lines):
+    # type: (ParseCache, Tuple, List[command_t], List[int]) -> None
+    self.cache = cache
+    self.key = key
+    self.nodes = nodes
+    self.next_lines = next_lines  # where the parser resumes after each node
+
+  def ParseStateChanged(self):
+    # type: () -> bool
+    """Did running the nodes so far change how the rest is parsed?"""
+    return self.cache.ParseStateKey() != self.key[-2:]
+
+
+class ParseCache(object):
+  """Load and save the LST of files, keyed by their stat() and parse state."""
+
+  def __init__(self, mem, parse_ctx, version_str):
+    # type: (Mem, ParseContext, str) -> None
+    self.mem = mem
+    self.parse_ctx = parse_ctx
+    self.arena = parse_ctx.arena
+    self.version_str = version_str
+
+  def _CacheDir(self):
+    # type: () -> Optional[str]
+    val = self.mem.GetVar('XDG_CACHE_HOME')
+    if val.tag_() == value_e.Str and val.s:
+      base = val.s
+    else:
+      val = self.mem.GetVar('HOME')
+      if val.tag_() != value_e.Str or not val.s:
+        return None
+      base = os_path.join(val.s, '.cache')
+    return os_path.join(base, 'oil/lst')
+
+  def ParseStateKey(self):
+    # type: () -> Tuple[Tuple[Tuple[str, str], ...], str]
+    """The state outside the file that affects how it's parsed."""
+    aliases = tuple(sorted(self.parse_ctx.aliases.items()))
+    opt_array = self.parse_ctx.parse_opts.opt_array
+    opts = ''.join('1' if opt_array[i] else '0'
+                   for i in consts.PARSE_OPTION_NUMS)
+    return aliases, opts
+
+  def _KeyAndPath(self, path, fd):
+    # type: (str, int) -> Tuple[Optional[Tuple], Optional[str], float]
+    """Returns the entry key, the cache file path, and the mtime."""
+    cache_dir = self._CacheDir()
+    if cache_dir is None:
+      return None, None, 0.0
+
+    try:
+      st = posix.fstat(fd)
+      abs_path = path if path.startswith('/') else os_path.join(
+          posix.getcwd(), path)
+    except OSError:
+      return None, None, 0.0
+    abs_path = os_path.normpath(abs_path)
+
+    key = ((_FORMAT, self.version_str, abs_path, st.st_mtime, st.st_size) +
+           self.ParseStateKey())
+    # Like vim's undodir: /home/andy/lib.sh -> %home%andy%lib.sh.oshc
+    cache_path = os_path.join(cache_dir, abs_path.replace('/', '%') + _SUFFIX)
+    return key, cache_path, st.st_mtime
+
+  def Load(self, path, fd):
+    # type: (str, int) -> Optional[CachedFile]
+    """Return the cached nodes for a file, or None on a miss.
+
+    On a hit, the lines and spans are added to the arena, with the source
+    that's on top of its stack.
+    """
+    key, cache_path, _ = self._KeyAndPath(path, fd)
+    if key is None:
+      return None
+
+    import cPickle
+    try:
+      with open(cache_path, 'rb') as f:
+        entry = cPickle.load(f)
+      entry_key, lines, spans, blobs, next_lines = entry
+    except Exception:  # missing, or corrupt: unpickling can raise anything
+      return None
+
+    if entry_key != key:
+      return None  # stale; it's overwritten when the file is recorded
+
+    arena = self.arena
+    line_ids = []  # type: List[int]
+    for line, line_num, src in lines:
+      if src is None:
+        line_ids.append(arena.AddLine(line, line_num))  # file_src is on top
+      else:
+        arena.PushSource(src)
+        line_ids.append(arena.AddLine(line, line_num))
+        arena.PopSource()
+
+    spid_map = {}  # type: Dict[int, int]
+    for old_spid, i, col, length in spans:
+      spid_map[old_spid] = arena.AddLineSpan(line_ids[i], col, length)
+
+    def _Remap(spid):
+      # type: (int) -> int
+      return spid_map.get(spid, spid)  # e.g. runtime.NO_SPID
+
+    # Sources like source.Alias refer to spans too.  Lines share them.
+    seen = {}  # type: Dict[int, bool]
+    for line, line_num, src in lines:
+      if src is not None:
+        _VisitSpids(src, _Remap, seen)
+
+    nodes = []  # type: List[command_t]
+    for blob in blobs:
+      node = cPickle.loads(blob)
+      _VisitSpids(node, _Remap, {})
+      nodes.append(node)
+    return CachedFile(self, key, nodes, next_lines)
+
+  def MakeRecorder(self, path, fd, file_src):
+    # type: (str, int, source_t) -> Optional[_Recorder]
+    """Return an object that saves the nodes of a file, or None."""
+    key, cache_path, mtime = self._KeyAndPath(path, fd)
+    if key is None:
+      return None
+    if mtime > time.time() - _RACY_SECONDS:
+      return None
+    return _Recorder(self, cache_path, key, file_src)
+
+  def Write(self, cache_path, entry):
+    # type: (str, Any) -> None
+    """Atomically write a cache entry.  Errors are ignored."""
+    import cPickle
+
+    cache_dir = os_path.dirname(cache_path)
+    try:
+      _MakeDirs(cache_dir)
+      tmp_path = '%s.%d' % (cache_path, posix.getpid())
+      with open(tmp_path, 'wb') as f:
+        cPickle.dump(entry, f, cPickle.HIGHEST_PROTOCOL)
+      posix.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+      pass
+
+
+def _MakeDirs(path):
+  # type: (str) -> None
+  """Like mkdir -p, with mode 0700 since the cache is loaded with pickle."""
+  if not path or path == '/':
+    return
+  try:
+    posix.stat(path)
+    return
+  except OSError:
+    pass
+  _MakeDirs(os_path.dirname(path))
+  try:
+    posix.mkdir(path, 0o700)
+  except OSError:
+    pass  # lost a race, or the final open() will fail
@@ -0,0 +1,169 @@
+#!/usr/bin/env python2
+"""
+parse_cache_test.py: Tests for parse_cache.py
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from _devbuild.gen.runtime_asdl import lvalue, value, scope_e
+from _devbuild.gen.syntax_asdl import source, command_e
+from core import main_loop
+from core import parse_cache  # module under test
+from core import state
+from core import test_lib
+from frontend import reader
+
+
+def _ParseFile(parse_ctx, path, recorder):
+  arena = parse_ctx.arena
+  with open(path) as f:
+    c_parser = parse_ctx.MakeOshParser(reader.FileLineReader(f, arena))
+    nodes = []
+    while True:
+      node = c_parser.ParseLogicalLine()
+      if node is None:
+        break
+      if recorder:
+        recorder.AddNode(node, c_parser.line_reader.line_num)
+      nodes.append(node)
+  if recorder:
+    recorder.Finish()
+  return nodes
+
+
+class ParseCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp, 'lib.sh')
+    with open(self.path, 'w') as f:
+      f.write('f() {\n  echo `echo hi` $x\n}\nls /\n')
+    os.utime(self.path, (1000000, 1000000))  # not racy
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp)
+
+  def _MakeCache(self, aliases=None):
+    arena = test_lib.MakeArena('<parse_cache_test.py>')
+    parse_ctx = test_lib.InitParseContext(arena=arena, aliases=aliases)
+    mem = state.Mem('', [], arena, [])
+    mem.SetVar(lvalue.Named('XDG_CACHE_HOME'), value.Str(self.tmp),
+               scope_e.GlobalOnly)
+    return parse_ctx, parse_cache.ParseCache(mem, parse_ctx, '0.0.test')
+
+  def _Spans(self, arena, nodes):
+    # The text of every span, to compare trees from different arenas.
+    result = []
+    def Collect(spid):
+      span = arena.GetLineSpan(spid)
+      line = arena.GetLine(span.line_id)
+      result.append(line[span.col : span.col + span.length])
+      return spid
+    for node in nodes:
+      parse_cache._VisitSpids(node, Collect, {})
+    return result
+
+  def testRoundTrip(self):
+    parse_ctx, cache = self._MakeCache()
+    src = source.SourcedFile(self.path, -1)
+    parse_ctx.arena.PushSource(src)
+    with open(self.path) as f:
+      self.assertEqual(None, cache.Load(self.path, f.fileno()))
+      recorder = cache.MakeRecorder(self.path, f.fileno(), src)
+    expected = _ParseFile(parse_ctx, self.path, recorder)
+    expected_spans = self._Spans(parse_ctx.arena, expected)
+
+    # A new process, with a different arena
+    parse_ctx2, cache2 = self._MakeCache()
+    arena2 = parse_ctx2.arena
+    arena2.AddLine('padding', 1)  # so span IDs differ
+    arena2.AddLineSpan(0, 0, 1)
+    src2 = source.SourcedFile(self.path, -1)
+    arena2.PushSource(src2)
+    with open(self.path) as f:
+      nodes = cache2.Load(self.path, f.fileno()).nodes
+    self.assertEqual(2, len(nodes))
+    self.assertEqual(expected_spans, self._Spans(arena2, nodes))
+
+    # Lines of the file get the new source
+    span = arena2.GetLineSpan(nodes[1].words[0].parts[0].span_id)  # ls
+    self.assertIs(src2, arena2.GetLineSource(span.line_id))
+
+    # Changing the file invalidates it
+    with open(self.path, 'a') as f:
+      f.write('echo more\n')
+    os.utime(self.path, (1000000, 1000000))
+    with open(self.path) as f:
+      self.assertEqual(None, cache2.Load(self.path, f.fileno()))
+
+  def testAliasesAreInKey(self):
+    parse_ctx, cache = self._MakeCache()
+    src = source.SourcedFile(self.path, -1)
+    parse_ctx.arena.PushSource(src)
+    with open(self.path) as f:
+      recorder = cache.MakeRecorder(self.path, f.fileno(), src)
+    _ParseFile(parse_ctx, self.path, recorder)
+
+    parse_ctx2, cache2 = self._MakeCache(aliases={'ls': 'ls -l'})
+    parse_ctx2.arena.PushSource(src)
+    with open(self.path) as f:
+      self.assertEqual(None, cache2.Load(self.path, f.fileno()))
+
+  def testNotSavedIfStateChanges(self):
+    aliases = {}
+    parse_ctx, cache = self._MakeCache(aliases=aliases)
+    src = source.SourcedFile(self.path, -1)
+    parse_ctx.arena.PushSource(src)
+    with open(self.path) as f:
+      recorder = cache.MakeRecorder(self.path, f.fileno(), src)
+
+    recorder.AddNode(main_loop.ParseWholeFile(
+        test_lib.InitCommandParser('echo hi', arena=parse_ctx.arena)), 2)
+    aliases['ls'] = 'ls -l'  # like executing an 'alias' command
+    recorder.AddNode(main_loop.ParseWholeFile(
+        test_lib.InitCommandParser('ls', arena=parse_ctx.arena)), 3)
+    recorder.Finish()
+
+    self.assertFalse(os.path.exists(os.path.join(self.tmp, 'oil/lst')))
+
+  def testStateChangesWhileRunning(self):
+    # Recorded when the first node doesn't define an alias
+    aliases = {}
+    parse_ctx, cache = self._MakeCache(aliases=aliases)
+    src = source.SourcedFile(self.path, -1)
+    parse_ctx.arena.PushSource(src)
+    with open(self.path) as f:
+      recorder = cache.MakeRecorder(self.path, f.fileno(), src)
+    _ParseFile(parse_ctx, self.path, recorder)
+
+    with open(self.path) as f:
+      cached = cache.Load(self.path, f.fileno())
+    self.assertEqual([4, 5], cached.next_lines)
+    self.assertEqual(False, cached.ParseStateChanged())
+
+    # But it does this time, so the rest is parsed again
+    aliases['ls'] = 'echo'
+    self.assertEqual(True, cached.ParseStateChanged())
+    with open(self.path) as f:
+      r = reader.FileLineReader(f, parse_ctx.arena)
+      r.SkipTo(cached.next_lines[0])
+      c_parser = parse_ctx.MakeOshParser(r)
+      node = c_parser.ParseLogicalLine()
+    self.assertEqual(command_e.ExpandedAlias, node.tag_())
+    words = node.child.children[0].words
+    self.assertEqual(['echo', '/'], [w.parts[0].val for w in words])
+
+  def testRacy(self):
+    parse_ctx, cache = self._MakeCache()
+    src = source.SourcedFile(self.path, -1)
+    os.utime(self.path, None)  # now
+    with open(self.path) as f:
+      self.assertEqual(None, cache.MakeRecorder(self.path, f.fileno(), src))
+
+
+if __name__ == '__main__':
+  unittest.main()
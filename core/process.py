@@ -11,6 +11,7 @@ from __future__ import print_function
 
 import errno
 import fcntl
+import gc
 import signal
 import sys
 
@@ -34,7 +35,7 @@ from mycpp.mylib import tagswitch
 
 import posix_ as posix
 
-from typing import List, Tuple, Dict, Any, cast, TYPE_CHECKING
+from typing import List, Tuple, Dict, Optional, Any, cast, TYPE_CHECKING
 
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import cmd_value__Argv
@@ -59,20 +60,86 @@ NO_FD = -1
 _SHELL_MIN_FD = 100
 
 
+# Signals that a child process resets to SIG_DFL.
+_CHILD_DEFAULT_SIGNALS = [
+    # Respond to Ctrl-\ (core dump)
+    signal.SIGQUIT,
+
+    # Python sets SIGPIPE handler to SIG_IGN by default.  Child processes
+    # shouldn't have this.
+    # https://docs.python.org/2/library/signal.html
+    # See Python/pythonrun.c.
+    signal.SIGPIPE,
+
+    # Child processes should get Ctrl-Z.
+    signal.SIGTSTP,
+]
+
+
+# gc.freeze() is an OVM patch to Python-2.7.13/Modules/gcmodule.c.  Under a
+# stock CPython 2 interpreter, we only disable automatic collection.
+_HAVE_GC_FREEZE = hasattr(gc, 'freeze')
+
+# Freezing resets the collector's counts, so when children are forked back to
+# back, e.g. $(...) in a loop, automatic collection may never run.  So collect
+# after this many forks anyway.
+_FORKS_PER_COLLECTION = 100
+
+
+class ForkGc(object):
+  """Keep the garbage collector from dirtying pages shared with children.
+
+  After fork(), the parent and child share memory until one of them writes to
+  a page.  A collection walks every tracked object and writes to its header,
+  which copies most of the heap.  So just before forking, we disable automatic
+  collection and freeze the heap.  The child leaves it frozen, so its
+  collections only look at objects it allocated itself.  The parent unfreezes
+  and re-enables the collector as soon as fork() returns.
+
+  A full collection is deferred to a quiet point: after a child is reaped,
+  once enough forks have happened since the last one.
+  """
+
+  def __init__(self):
+    # type: () -> None
+    self.num_forks = 0  # forks since the last collection
+    self.was_enabled = False
+
+  def BeforeFork(self):
+    # type: () -> None
+    self.was_enabled = gc.isenabled()
+    gc.disable()
+    if _HAVE_GC_FREEZE:
+      getattr(gc, 'freeze')()  # not in the typeshed stubs
+
+  def AfterForkParent(self):
+    # type: () -> None
+    if _HAVE_GC_FREEZE:
+      getattr(gc, 'unfreeze')()
+    if self.was_enabled:
+      gc.enable()
+    self.num_forks += 1
+
+  def AfterForkChild(self):
+    # type: () -> None
+    """The child collects its own objects, but leaves the parent's frozen."""
+    self.num_forks = 0
+    if self.was_enabled:
+      gc.enable()
+
+  def ChildDone(self):
+    # type: () -> None
+    """Called when a forked child is reaped by waitpid()."""
+    if self.num_forks >= _FORKS_PER_COLLECTION and gc.isenabled():
+      gc.collect()
+      self.num_forks = 0
+
+
 def SignalState_AfterForkingChild():
   # type: () -> None
   """Not a member of SignalState since we didn't do dependency injection."""
-  # Respond to Ctrl-\ (core dump)
-  signal.signal(signal.SIGQUIT, signal.SIG_DFL)
-
-  # Python sets SIGPIPE handler to SIG_IGN by default.  Child processes
-  # shouldn't have this.
-  # https://docs.python.org/2/library/signal.html
-  # See Python/pythonrun.c.
-  signal.signal(signal.SIGPIPE, signal.SIG_DFL)
-
-  # Child processes should get Ctrl-Z.
-  signal.signal(signal.SIGTSTP, signal.SIG_DFL)
+  for sig in _CHILD_DEFAULT_SIGNALS:
+    signal.signal(sig, signal.SIG_DFL)
 
 
 class SignalState(object):
@@ -163,6 +230,12 @@ class FdState(object):
     Raises:
       OSError if the path can't be found.
     """
+    f, _ = self.OpenWithFd(path, mode)
+    return f
+
+  def OpenWithFd(self, path, mode='r'):
+    # type: (str, str) -> Tuple[mylib.LineReader, int]
+    """Like Open(), but also returns the descriptor, e.g. to fstat() it."""
     if mode == 'r':
       fd_mode = posix.O_RDONLY
     elif mode == 'w':
@@ -181,7 +254,7 @@ class FdState(object):
       f = posix.fdopen(new_fd, mode)  # Might raise IOError
     except IOError as e:
       raise OSError(*e.args)  # Consistently raise OSError
-    return f
+    return f, new_fd
 
   def _WriteFdToMem(self, fd_name, fd):
     # type: (str, int) -> None
@@ -578,6 +651,25 @@ class ExternalProgram(object):
     self._Exec(argv0_path, cmd_val.argv, cmd_val.arg_spids[0], environ, True)
     assert False, "This line should never execute" # NO RETURN
 
+  def Spawn(self, argv0_path, cmd_val, environ):
+    # type: (str, cmd_value__Argv, Dict[str, str]) -> int
+    """Start a program with posix_spawn(), without forking the shell.
+
+    fork() copies the page tables of the whole interpreter, so it gets slower
+    as the heap grows.  posix_spawn() doesn't.
+
+    Returns:
+      The PID, or -1 if the caller should fork and call Exec() instead.  That
+      path handles hijacking, ENOEXEC, and error messages.
+    """
+    if self.hijack_shebang:
+      return -1
+    try:
+      return posix.spawn(argv0_path, cmd_val.argv, environ,
+                         _CHILD_DEFAULT_SIGNALS)
+    except OSError:
+      return -1
+
   def _Exec(self, argv0_path, argv, argv0_spid, environ, should_retry):
     # type: (str, List[str], int, Dict[str, str], bool) -> None
     if self.hijack_shebang:
@@ -648,6 +740,15 @@ class Thunk(object):
     """Returns a status code."""
     raise NotImplementedError()
 
+  def Spawn(self):
+    # type: () -> int
+    """Start the thunk without forking, if possible.
+
+    Returns:
+      The PID, or -1 if it has to be run in a forked process.
+    """
+    return -1
+
   def DisplayLine(self):
     # type: () -> str
     """Display for the 'jobs' list."""
@@ -686,6 +787,10 @@ class ExternalThunk(Thunk):
     """
     self.ext_prog.Exec(self.argv0_path, self.cmd_val, self.environ)
 
+  def Spawn(self):
+    # type: () -> int
+    return self.ext_prog.Spawn(self.argv0_path, self.cmd_val, self.environ)
+
 
 class SubProgramThunk(Thunk):
   """A subprogram that can be executed in another process."""
@@ -784,6 +889,8 @@ class Job(object):
     # type: () -> None
     # Initial state with & or Ctrl-Z is Running.
     self.state = job_state_e.Running
+    self.status = -1  # set when the job is Done
+    self.job_id = -1  # set by JobState.AddJob()
 
   def State(self):
     # type: () -> job_state_t
@@ -802,6 +909,11 @@ class Job(object):
     """Wait for this process/pipeline to be stopped or finished."""
     raise NotImplementedError()
 
+  def Pids(self):
+    # type: () -> List[int]
+    """The PIDs of the processes in this job."""
+    raise NotImplementedError()
+
 
 class Process(Job):
   """A process to run.
@@ -831,7 +943,7 @@ class Process(Job):
     self.close_w = -1
 
     self.pid = -1
-    self.status = -1
+    self.forked = False  # as opposed to started with posix_spawn()
 
   def __repr__(self):
     # type: () -> str
@@ -854,7 +966,7 @@ class Process(Job):
 
   def Start(self):
     # type: () -> int
-    """Start this process with fork(), handling redirects."""
+    """Start this process with posix_spawn() or fork(), handling redirects."""
     # TODO: If OSH were a job control shell, we might need to call some of
     # these here.  They control the distribution of signals, some of which
     # originate from a terminal.  All the processes in a pipeline should be in
@@ -869,13 +981,37 @@ class Process(Job):
     #
     # The whole job control mechanism is complicated and hacky.
 
+    # A simple command like 'ls /' has no state changes, since its redirects
+    # were applied in the shell process.  It can be spawned without forking.
+    pid = -1
+    if len(self.state_changes) == 0:
+      pid = self.thunk.Spawn()
+    if pid == -1:
+      pid = self._Fork()
+
+    #log('STARTED process %s, pid = %d', self, pid)
+
+    # Class invariant: after the process is started, it stores its PID.
+    self.pid = pid
+    # Program invariant: We keep track of every child process!
+    self.job_state.AddChildProcess(pid, self)
+
+    return pid
+
+  def _Fork(self):
+    # type: () -> int
+    fork_gc = self.job_state.fork_gc
+    fork_gc.BeforeFork()
+
     pid = posix.fork()
     if pid < 0:
       # When does this happen?
       raise RuntimeError('Fatal error in posix.fork()')
 
     elif pid == 0:  # child
+      fork_gc.AfterForkChild()
       SignalState_AfterForkingChild()
+      self.job_state.AfterForkChild()
 
       for st in self.state_changes:
         st.Apply()
@@ -883,13 +1019,8 @@ class Process(Job):
       self.thunk.Run()
       # Never returns
 
-    #log('STARTED process %s, pid = %d', self, pid)
-
-    # Class invariant: after the process is started, it stores its PID.
-    self.pid = pid
-    # Program invariant: We keep track of every child process!
-    self.job_state.AddChildProcess(pid, self)
-
+    fork_gc.AfterForkParent()
+    self.forked = True
     return pid
 
   def Wait(self, waiter):
@@ -908,6 +1039,10 @@ class Process(Job):
     exit_code = self.Wait(waiter)
     return job_status.Proc(exit_code)
 
+  def Pids(self):
+    # type: () -> List[int]
+    return [self.pid]
+
   def WhenStopped(self):
     # type: () -> None
     self.state = job_state_e.Stopped
@@ -920,8 +1055,17 @@ class Process(Job):
     assert pid == self.pid, 'Expected %d, got %d' % (self.pid, pid)
     self.status = status
     self.state = job_state_e.Done
+    if self.forked:
+      self.job_state.fork_gc.ChildDone()
+    self.job_state.WhenProcessDone()
+
     if self.parent_pipeline:
       self.parent_pipeline.WhenDone(pid, status)
+      job = self.parent_pipeline  # type: Job
+    else:
+      job = self
+    if job.job_id != -1 and job.state == job_state_e.Done:
+      self.job_state.WhenJobDone(job)
 
   def Run(self, waiter):
     # type: (Waiter) -> int
@@ -952,7 +1096,6 @@ class Pipeline(Job):
     self.procs = []  # type: List[Process]
     self.pids = []  # type: List[int]  # pids in order
     self.pipe_status = []  # type: List[int]  # status in order
-    self.status = -1  # for 'wait' jobs
 
     # Optional for foregroud
     self.last_thunk = None  # type: Tuple[CommandEvaluator, command_t]
@@ -1028,6 +1171,10 @@ class Pipeline(Job):
     """
     return self.pids[-1]
 
+  def Pids(self):
+    # type: () -> List[int]
+    return self.pids
+
   def Wait(self, waiter):
     # type: (Waiter) -> List[int]
     """Wait for this pipeline to finish.
@@ -1129,6 +1276,17 @@ class JobState(object):
     self.last_stopped_pid = None  # type: int  # for basic 'fg' implementation
     self.job_id = 1  # Strictly increasing
 
+    # Jobs that haven't finished, for osh --jobs.  Stopped jobs count too.
+    self.num_running = 0
+    # Child processes that haven't finished, including pipeline stages and
+    # process subs, for the stat cache.
+    self.num_procs = 0
+    # IDs of jobs that finished, in order, for 'wait -n'.  A job is removed
+    # from self.jobs once its status is reported.
+    self.done_ids = []  # type: List[int]
+
+    self.fork_gc = ForkGc()
+
   # TODO: This isn't a PID.  This is a process group ID?
   #
   # What should the table look like?
@@ -1175,8 +1333,73 @@ class JobState(object):
     job_id = self.job_id
     self.jobs[job_id] = job
     self.job_id += 1  # For now, the ID is ever-increasing.
+
+    job.job_id = job_id
+    self.num_running += 1
     return job_id
 
+  def AfterForkChild(self):
+    # type: () -> None
+    """A subshell doesn't wait for the parent's jobs, which aren't its children.
+
+    They stay in the list for 'jobs'.
+    """
+    self.num_running = 0
+    self.num_procs = 0
+    del self.done_ids[:]
+
+  def WhenJobDone(self, job):
+    # type: (Job) -> None
+    """Called when a job in the list finishes."""
+    self.num_running -= 1
+    self.done_ids.append(job.job_id)
+
+  def NumRunning(self):
+    # type: () -> int
+    return self.num_running
+
+  def NumProcsRunning(self):
+    # type: () -> int
+    return self.num_procs
+
+  def PopDoneJob(self):
+    # type: () -> Optional[Job]
+    """For 'wait -n': remove and return the job that finished first.
+
+    Returns None if every finished job was already reported.
+    """
+    while len(self.done_ids):
+      job_id = self.done_ids.pop(0)
+      job = self._RemoveJob(job_id)
+      if job is not None:  # not reported by 'wait $!'
+        return job
+    return None
+
+  def WhenReported(self, job):
+    # type: (Job) -> None
+    """For 'wait $!': a finished job's status doesn't need to be kept."""
+    if job.job_id != -1 and job.state == job_state_e.Done:
+      self._RemoveJob(job.job_id)
+
+  def RemoveDoneJobs(self):
+    # type: () -> None
+    """For 'wait' with no arguments, which reports every job."""
+    for job_id in self.done_ids:
+      self._RemoveJob(job_id)
+    del self.done_ids[:]
+
+  def _RemoveJob(self, job_id):
+    # type: (int) -> Optional[Job]
+    """Forget a finished job and its processes, so 'jobs' doesn't list them.
+
+    Returns None if it was already removed.
+    """
+    job = self.jobs.pop(job_id, None)
+    if job is not None:
+      for pid in job.Pids():
+        self.child_procs.pop(pid, None)
+    return job
+
   def AddChildProcess(self, pid, proc):
     # type: (int, Process) -> None
     """Every child process should be added here as soon as we know its PID.
@@ -1185,6 +1408,12 @@ class JobState(object):
     about it so 'jobs' can work.
     """
     self.child_procs[pid] = proc
+    self.num_procs += 1
+
+  def WhenProcessDone(self):
+    # type: () -> None
+    """Called when any child process finishes."""
+    self.num_procs -= 1
 
   def JobFromPid(self, pid):
     # type: (int) -> Process
@@ -1291,7 +1520,6 @@ class Waiter(object):
     # type: (JobState, optview.Exec) -> None
     self.job_state = job_state
     self.exec_opts = exec_opts
-    self.last_status = 127  # wait -n error code
 
   def WaitForOne(self):
     # type: () -> bool
@@ -1367,6 +1595,4 @@ class Waiter(object):
       self.job_state.NotifyStopped(pid)  # show in 'jobs' list, enable 'fg'
       proc.WhenStopped()
 
-    self.last_status = status  # for wait -n
-
     return True  # caller should keep waiting
@@ -3,6 +3,7 @@
 process_test.py: Tests for process.py
 """
 
+import gc
 import os
 import unittest
 
@@ -114,6 +115,82 @@ class ProcessTest(unittest.TestCase):
     # 12 file descriptors open!
     print('FDS AFTER', os.listdir('/dev/fd'))
 
+  def testSpawn(self):
+    p = _ExtProc(['false'])
+    pid = p.thunk.Spawn()
+    self.assertNotEqual(-1, pid)
+    _, status = os.waitpid(pid, 0)
+    self.assertEqual(1, os.WEXITSTATUS(status))
+
+    # The caller has to fork, and then exec prints the error
+    p = _ExtProc(['does-not-exist'])
+    self.assertEqual(-1, p.thunk.Spawn())
+
+  def testForkGc(self):
+    # A pipe has to be set up in the child, so this is forked rather than
+    # spawned.  Automatic collection is back on as soon as fork() returns,
+    # even while the child is running.
+    self.assertEqual(True, gc.isenabled())
+    p = _ExtProc(['true'])
+    r, w = os.pipe()
+    p.AddStateChange(process.StdinFromPipe(r, w))
+    p.AddPipeToClose(r, w)
+    p.Start()
+    p.MaybeClosePipe()
+    self.assertEqual(True, p.forked)
+    self.assertEqual(True, gc.isenabled())
+    self.assertEqual(0, p.Wait(_WAITER))
+    self.assertEqual(True, gc.isenabled())
+
+    fork_gc = process.ForkGc()
+    fork_gc.BeforeFork()
+    self.assertEqual(False, gc.isenabled())
+    fork_gc.AfterForkParent()
+    self.assertEqual(True, gc.isenabled())
+    if hasattr(gc, 'freeze'):  # OVM
+      self.assertEqual(0, gc.get_freeze_count())
+
+    # Collection is deferred until a child is reaped
+    for _ in xrange(process._FORKS_PER_COLLECTION - 1):
+      fork_gc.BeforeFork()
+      fork_gc.AfterForkParent()
+    self.assertEqual(process._FORKS_PER_COLLECTION, fork_gc.num_forks)
+    fork_gc.ChildDone()
+    self.assertEqual(0, fork_gc.num_forks)
+
+  def testJobState(self):
+    job_state = process.JobState()
+    waiter = process.Waiter(job_state, _EXEC_OPTS)
+
+    def _Job(argv):
+      p = _ExtProc(argv)
+      p.job_state = job_state
+      p.Start()
+      job_state.AddJob(p)
+      return p
+
+    fast = _Job(['false'])
+    slow = _Job(['sleep', '0.1'])
+    self.assertEqual(2, job_state.NumRunning())
+    self.assertEqual(None, job_state.PopDoneJob())
+
+    # Jobs are reported in the order they finish
+    while job_state.NumRunning():
+      self.assertEqual(True, waiter.WaitForOne())
+    self.assertEqual(fast, job_state.PopDoneJob())
+    self.assertEqual(1, fast.status)
+    self.assertEqual(slow, job_state.PopDoneJob())
+    self.assertEqual(None, job_state.PopDoneJob())
+    self.assertEqual({}, job_state.jobs)
+    self.assertEqual({}, job_state.child_procs)
+
+    # A job reported by 'wait $!' isn't reported again
+    p = _Job(['true'])
+    p.Wait(waiter)
+    job_state.WhenReported(p)
+    self.assertEqual(None, job_state.PopDoneJob())
+    self.assertEqual({}, job_state.child_procs)
+
   def testPipeline(self):
     node = _CommandNode('uniq -c', _ARENA)
     cmd_ev = test_lib.InitCommandEvaluator(arena=_ARENA, ext_prog=_EXT_PROG)
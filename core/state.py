@@ -37,6 +37,7 @@ from pylib import path_stat
 
 import libc
 import posix_ as posix
+import time
 
 from typing import Tuple, List, Dict, Optional, Any, cast, TYPE_CHECKING
 
@@ -54,6 +55,27 @@ _READLINE_DELIMS = ' \t\n"\'><=;|&(:'
 
 LINE_ZERO = -2  # special value that's not runtime.NO_SPID
 
+# Variables computed by Mem.GetVar() rather than stored in a cell.  Normal
+# names are dispatched with a single hash lookup.
+_ARGV = 1
+_PIPESTATUS = 2
+_FUNCNAME = 3
+_BASH_SOURCE = 4
+_BASH_LINENO = 5
+_LINENO = 6
+_BASHPID = 7
+_CALL_SOURCE = 8  # not in the table; see Mem._GetComputedVar()
+
+_COMPUTED_VARS = {
+    'ARGV': _ARGV,
+    'PIPESTATUS': _PIPESTATUS,
+    'FUNCNAME': _FUNCNAME,
+    'BASH_SOURCE': _BASH_SOURCE,
+    'BASH_LINENO': _BASH_LINENO,
+    'LINENO': _LINENO,
+    'BASHPID': _BASHPID,
+}  # type: Dict[str, int]
+
 
 # flags for SetVar
 SetReadOnly   = 1 << 0
@@ -64,36 +86,122 @@ SetNameref    = 1 << 4
 ClearNameref  = 1 << 5
 
 
-class SearchPath(object):
-  """For looking up files in $PATH."""
+class _DirListing(object):
+  """The names in one $PATH directory, as of a given mtime."""
+
+  def __init__(self, mtime, racy, readable, names):
+    # type: (float, bool, bool, Dict[str, bool]) -> None
+    self.mtime = mtime
+    # True if the directory was modified in the same second we listed it.  A
+    # file created later in that second wouldn't change the mtime, so we list
+    # it again next time.  (git calls this "racily clean".)
+    self.racy = racy
+    # False if the directory couldn't be listed, e.g. because it's execute-only.
+    # Then names is empty, and Lookup() checks the file with access().
+    self.readable = readable
+    self.names = names
+    self.executables = None  # type: Optional[List[str]]
+
+
+class PathIndex(object):
+  """An index of the files in $PATH, shared by execution and completion.
+
+  - $PATH is only split when its value changes.
+  - Each directory is listed once, and listed again when its mtime changes.
+    Directories that are no longer in $PATH are evicted.
+  - Relative entries like '' and '.' depend on the working directory, so
+    they're never listed.  We fall back on access() for them, and for
+    directories we can't read.
+
+  Listing a directory is slower than statting it, but it's done once, and a
+  lookup then costs one stat() per $PATH entry instead of one access() per
+  entry.
+  """
 
   def __init__(self, mem):
     # type: (Mem) -> None
     self.mem = mem
-    self.cache = {}  # type: Dict[str, str]
+    self.path_str = None  # type: Optional[str]
+    self.path_dirs = []  # type: List[str]
+    self.listings = {}  # type: Dict[str, _DirListing]
 
-  def Lookup(self, name, exec_required=True):
-    # type: (str, bool) -> Optional[str]
-    """
-    Returns the path itself (for relative path), the resolve path, or None.
-    """
-    if '/' in name:
-      if path_stat.exists(name):
-        return name
-      else:
-        return None
+    # Sorted, unique executable names for prefix lookups.  Rebuilt when any
+    # listing changes.
+    self.sorted_exes = []  # type: List[str]
+    self.sorted_valid = False
 
-    # TODO: Could cache this computation to avoid allocating every time for all
-    # the splitting.
+  def _PathDirs(self):
+    # type: () -> List[str]
     val = self.mem.GetVar('PATH')
     UP_val = val
     if val.tag_() == value_e.Str:
       val = cast(value__Str, UP_val)
-      path_list = val.s.split(':')
+      path_str = val.s  # type: Optional[str]
     else:
-      path_list = []  # treat as empty path
+      path_str = None  # treat as empty path
+
+    if path_str == self.path_str:
+      return self.path_dirs
+
+    self.path_str = path_str
+    self.path_dirs = path_str.split(':') if path_str is not None else []
+
+    # Evict directories that are no longer in $PATH
+    for d in self.listings.keys():
+      if d not in self.path_dirs:
+        del self.listings[d]
+    self.sorted_valid = False
+    return self.path_dirs
+
+  def _GetListing(self, d):
+    # type: (str) -> Optional[_DirListing]
+    """Return an up-to-date listing of directory d, or None."""
+    try:
+      st = posix.stat(d)
+    except OSError as e:
+      # There could be a directory that doesn't exist in the $PATH.
+      if d in self.listings:
+        del self.listings[d]
+        self.sorted_valid = False
+      return None
+
+    listing = self.listings.get(d)
+    if listing and listing.mtime == st.st_mtime and not listing.racy:
+      return listing
+
+    readable = True
+    try:
+      entries = posix.listdir(d)
+    except OSError as e:  # e.g. not a directory, or no read permission
+      entries = []
+      readable = False
+
+    names = {}  # type: Dict[str, bool]
+    for name in entries:
+      names[name] = True
+    racy = int(st.st_mtime) >= int(time.time())
+
+    listing = _DirListing(st.st_mtime, racy, readable, names)
+    self.listings[d] = listing
+    self.sorted_valid = False
+    return listing
+
+  def Lookup(self, name, exec_required=True):
+    # type: (str, bool) -> Optional[str]
+    """Return the full path of the first file in $PATH named 'name', or None.
+
+    The index only says which directories contain the name.  We still check
+    the file itself, since its permissions can change without changing the
+    directory mtime.
+    """
+    for path_dir in self._PathDirs():
+      if path_dir.startswith('/'):
+        listing = self._GetListing(path_dir)
+        if listing is None:
+          continue
+        if listing.readable and name not in listing.names:
+          continue
 
-    for path_dir in path_list:
       full_path = os_path.join(path_dir, name)
 
       # NOTE: dash and bash only check for EXISTENCE in 'command -v' (and 'type
@@ -109,6 +217,82 @@ class SearchPath(object):
 
     return None
 
+  def _Executables(self, path_dir, listing):
+    # type: (str, _DirListing) -> List[str]
+    if listing.executables is None:
+      exes = []  # type: List[str]
+      for name in listing.names:
+        # The file may have been removed since we listed the directory, in
+        # which case access() just fails.
+        if posix.access(os_path.join(path_dir, name), posix.X_OK_):
+          exes.append(name)
+      listing.executables = exes
+    return listing.executables
+
+  def PrefixLookup(self, prefix):
+    # type: (str) -> List[str]
+    """Return the sorted names of executables in $PATH that start with prefix.
+
+    Unlike Lookup(), this trusts the permissions at the time the directory was
+    listed, and skips directories that can't be listed.
+    """
+    path_dirs = self._PathDirs()
+    for path_dir in path_dirs:
+      if path_dir.startswith('/'):
+        self._GetListing(path_dir)  # may invalidate sorted_exes
+
+    if not self.sorted_valid:
+      uniq = {}  # type: Dict[str, bool]
+      for path_dir in path_dirs:
+        listing = self.listings.get(path_dir)
+        if listing:
+          for name in self._Executables(path_dir, listing):
+            uniq[name] = True
+      self.sorted_exes = sorted(uniq)
+      self.sorted_valid = True
+
+    a = self.sorted_exes
+
+    # Binary search for the first name >= prefix
+    lo = 0
+    hi = len(a)
+    while lo < hi:
+      mid = (lo + hi) / 2
+      if a[mid] < prefix:
+        lo = mid + 1
+      else:
+        hi = mid
+
+    result = []  # type: List[str]
+    i = lo
+    while i < len(a) and a[i].startswith(prefix):
+      result.append(a[i])
+      i += 1
+    return result
+
+
+class SearchPath(object):
+  """For looking up files in $PATH."""
+
+  def __init__(self, mem):
+    # type: (Mem) -> None
+    self.mem = mem
+    self.index = PathIndex(mem)
+    self.cache = {}  # type: Dict[str, str]
+
+  def Lookup(self, name, exec_required=True):
+    # type: (str, bool) -> Optional[str]
+    """
+    Returns the path itself (for relative path), the resolve path, or None.
+    """
+    if '/' in name:
+      if path_stat.exists(name):
+        return name
+      else:
+        return None
+
+    return self.index.Lookup(name, exec_required=exec_required)
+
   def CachedLookup(self, name):
     # type: (str) -> Optional[str]
     if name in self.cache:
@@ -715,6 +899,17 @@ class Mem(object):
     # CALL_SOURCE, and BASH_LINENO.
     self.debug_stack = debug_stack
 
+    # FUNCNAME, BASH_SOURCE, and BASH_LINENO only change when the debug stack
+    # does, so they're computed lazily and reset on push and pop.
+    self.funcname_val = None  # type: Optional[value__MaybeStrArray]
+    self.bash_source_val = None  # type: Optional[value__MaybeStrArray]
+    self.bash_lineno_val = None  # type: Optional[value__MaybeStrArray]
+
+    # name -> (cell, name_map) for scope_e.Dynamic lookups.  Entries are
+    # removed when a cell is bound or unset, or its frame is popped.  Pushing
+    # an empty frame can't change the result of a lookup.
+    self.dynamic_cache = {}  # type: Dict[str, Tuple[Optional[cell], Dict[str, cell]]]
+
     self.current_spid = runtime.NO_SPID
 
     self.line_num = value.Str('')
@@ -849,7 +1044,7 @@ class Mem(object):
   def PopCall(self):
     # type: () -> None
     self._PopDebugStack()
-    self.var_stack.pop()
+    self._PopVarFrame()
     self.argv_stack.pop()
 
   def PushSource(self, source_name, argv):
@@ -877,7 +1072,19 @@ class Mem(object):
   def PopTemp(self):
     # type: () -> None
     self._PopDebugStack()
-    self.var_stack.pop()
+    self._PopVarFrame()
+
+  def _PopVarFrame(self):
+    # type: () -> None
+    name_map = self.var_stack.pop()
+    for name in name_map:
+      self._InvalidateName(name)
+
+  def _InvalidateName(self, name):
+    # type: (str) -> None
+    """Called when the cell that 'name' resolves to may have changed."""
+    if name in self.dynamic_cache:
+      del self.dynamic_cache[name]
 
   def TopNamespace(self):
     # type: () -> Dict[str, runtime_asdl.cell]
@@ -898,10 +1105,18 @@ class Mem(object):
     self.debug_stack.append(
         DebugFrame(bash_source, func_name, source_name, self.current_spid, argv_i, var_i)
     )
+    self._InvalidateDebugVars()
 
   def _PopDebugStack(self):
     # type: () -> None
     self.debug_stack.pop()
+    self._InvalidateDebugVars()
+
+  def _InvalidateDebugVars(self):
+    # type: () -> None
+    self.funcname_val = None
+    self.bash_source_val = None
+    self.bash_lineno_val = None
 
   #
   # Argv
@@ -985,13 +1200,21 @@ class Mem(object):
       name_map: The name_map it should be set to or deleted from.
     """
     if lookup_mode == scope_e.Dynamic:
+      result = self.dynamic_cache.get(name)
+      if result is not None:
+        return result
+
+      no_cell = None  # type: Optional[runtime_asdl.cell]
+      result = (no_cell, self.var_stack[0])  # set in global name_map
       for i in xrange(len(self.var_stack) - 1, -1, -1):
         name_map = self.var_stack[i]
         if name in name_map:
           cell = name_map[name]
-          return cell, name_map
-      no_cell = None  # type: Optional[runtime_asdl.cell]
-      return no_cell, self.var_stack[0]  # set in global name_map
+          result = (cell, name_map)
+          break
+
+      self.dynamic_cache[name] = result
+      return result
 
     elif lookup_mode == scope_e.LocalOnly:
       name_map = self.var_stack[-1]
@@ -1201,6 +1424,7 @@ class Mem(object):
                                    bool(flags & SetNameref),
                                    val)
           name_map[cell_name] = cell
+          self._InvalidateName(cell_name)
 
         # Maintain invariant that only strings and undefined cells can be
         # exported.
@@ -1316,6 +1540,7 @@ class Mem(object):
     # arrays can't be exported; can't have AssocArray flag
     readonly = bool(flags & SetReadOnly)
     name_map[lval.name] = runtime_asdl.cell(False, readonly, False, new_value)
+    self._InvalidateName(lval.name)
 
   def InternalSetGlobal(self, name, new_val):
     # type: (str, value_t) -> None
@@ -1332,51 +1557,49 @@ class Mem(object):
     cell = self.var_stack[0][name]
     cell.val = new_val
 
-  def GetVar(self, name, lookup_mode=scope_e.Dynamic):
-    # type: (str, scope_t) -> value_t
-    assert isinstance(name, str), name
-
-    # TODO: Short-circuit down to _ResolveNameOrRef by doing a single hash
-    # lookup:
-    # COMPUTED_VARS = {'PIPESTATUS': 1, 'FUNCNAME': 1, ...}
-    # if name not in COMPUTED_VARS: ...
+  def _GetComputedVar(self, which):
+    # type: (int) -> value_t
 
-    if name == 'ARGV':
+    if which == _ARGV:
       # TODO:
       # - Reuse the MaybeStrArray?
       # - @@ could be an alias for ARGV (in command mode, but not expr mode)
       return value.MaybeStrArray(self.GetArgv())
 
-    if name == 'PIPESTATUS':
+    if which == _PIPESTATUS:
       return value.MaybeStrArray([str(i) for i in self.pipe_status[-1]])
 
     # Do lookup of system globals before looking at user variables.  Note: we
     # could optimize this at compile-time like $?.  That would break
     # ${!varref}, but it's already broken for $?.
-    if name == 'FUNCNAME':
-      # bash wants it in reverse order.  This is a little inefficient but we're
-      # not depending on deque().
-      strs = []  # type: List[str]
-      for frame in reversed(self.debug_stack):
-        if frame.func_name:
-          strs.append(frame.func_name)
-        if frame.source_name:
-          strs.append('source')  # bash doesn't tell you the filename.
-        # Temp stacks are ignored
-      return value.MaybeStrArray(strs)  # TODO: Reuse this object too?
+    if which == _FUNCNAME:
+      if self.funcname_val is None:
+        # bash wants it in reverse order.  This is a little inefficient but
+        # we're not depending on deque().
+        strs = []  # type: List[str]
+        for frame in reversed(self.debug_stack):
+          if frame.func_name:
+            strs.append(frame.func_name)
+          if frame.source_name:
+            strs.append('source')  # bash doesn't tell you the filename.
+          # Temp stacks are ignored
+        self.funcname_val = value.MaybeStrArray(strs)
+      return self.funcname_val
 
     # This isn't the call source, it's the source of the function DEFINITION
     # (or the sourced # file itself).
-    if name == 'BASH_SOURCE':
-      strs = []
-      for frame in reversed(self.debug_stack):
-        if frame.bash_source:
-          strs.append(frame.bash_source)
-      return value.MaybeStrArray(strs)  # TODO: Reuse this object too?
+    if which == _BASH_SOURCE:
+      if self.bash_source_val is None:
+        strs = []
+        for frame in reversed(self.debug_stack):
+          if frame.bash_source:
+            strs.append(frame.bash_source)
+        self.bash_source_val = value.MaybeStrArray(strs)
+      return self.bash_source_val
 
     # This is how bash source SHOULD be defined, but it's not!
     if 0:
-      if name == 'CALL_SOURCE':
+      if which == _CALL_SOURCE:
         strs = []
         for frame in reversed(self.debug_stack):
           # should only happen for the first entry
@@ -1390,30 +1613,41 @@ class Mem(object):
           strs.append(source_str)
         return value.MaybeStrArray(strs)  # TODO: Reuse this object too?
 
-    if name == 'BASH_LINENO':
-      strs = []
-      for frame in reversed(self.debug_stack):
-        # should only happen for the first entry
-        if frame.call_spid == runtime.NO_SPID:
-          continue
-        if frame.call_spid == LINE_ZERO:
-          strs.append('0')  # Bash does this to line up with main?
-          continue
-        span = self.arena.GetLineSpan(frame.call_spid)
-        line_num = self.arena.GetLineNumber(span.line_id)
-        strs.append(str(line_num))
-      return value.MaybeStrArray(strs)  # TODO: Reuse this object too?
+    if which == _BASH_LINENO:
+      if self.bash_lineno_val is None:
+        strs = []
+        for frame in reversed(self.debug_stack):
+          # should only happen for the first entry
+          if frame.call_spid == runtime.NO_SPID:
+            continue
+          if frame.call_spid == LINE_ZERO:
+            strs.append('0')  # Bash does this to line up with main?
+            continue
+          span = self.arena.GetLineSpan(frame.call_spid)
+          line_num = self.arena.GetLineNumber(span.line_id)
+          strs.append(str(line_num))
+        self.bash_lineno_val = value.MaybeStrArray(strs)
+      return self.bash_lineno_val
 
-    if name == 'LINENO':
+    if which == _LINENO:
       assert self.current_spid != -1, self.current_spid
       span = self.arena.GetLineSpan(self.current_spid)
       # TODO: maybe use interned GetLineNumStr?
       self.line_num.s = str(self.arena.GetLineNumber(span.line_id))
       return self.line_num
 
-    if name == 'BASHPID':  # TODO: Oil name for it
+    if which == _BASHPID:  # TODO: Oil name for it
       return value.Str(str(posix.getpid()))
 
+    raise AssertionError(which)
+
+  def GetVar(self, name, lookup_mode=scope_e.Dynamic):
+    # type: (str, scope_t) -> value_t
+    assert isinstance(name, str), name
+
+    if name in _COMPUTED_VARS:
+      return self._GetComputedVar(_COMPUTED_VARS[name])
+
     cell, _, _ = self._ResolveNameOrRef(name, lookup_mode)
 
     if cell:
@@ -1464,6 +1698,7 @@ class Mem(object):
         else:
           # This behavior is good for test/spec.sh builtin-vars -r 24 (ble.sh)
           del name_map[cell_name]
+          self._InvalidateName(cell_name)
 
         # This should never happen because we do recursive lookups of namerefs.
         assert not cell.nameref, cell
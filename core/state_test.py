@@ -4,7 +4,10 @@ state_test.py: Tests for state.py
 """
 
 import unittest
+import os
 import os.path
+import shutil
+import tempfile
 
 from _devbuild.gen.runtime_asdl import scope_e, lvalue, value, value_e
 from core import error
@@ -54,6 +57,84 @@ class MemTest(unittest.TestCase):
     else:
         self.assertEqual(search_path.Lookup('env'), '/usr/bin/env')
 
+  def testPathIndex(self):
+    mem = _InitMem()
+    index = state.PathIndex(mem)
+
+    tmp = tempfile.mkdtemp()
+    try:
+      dir1 = os.path.join(tmp, 'dir1')
+      dir2 = os.path.join(tmp, 'dir2')
+      os.mkdir(dir1)
+      os.mkdir(dir2)
+
+      def Touch(path, mode):
+        with open(path, 'w'):
+          pass
+        os.chmod(path, mode)
+
+      Touch(os.path.join(dir1, 'foo'), 0o755)
+      Touch(os.path.join(dir1, 'fog'), 0o644)  # not executable
+      Touch(os.path.join(dir2, 'foo'), 0o755)
+      Touch(os.path.join(dir2, 'fob'), 0o755)
+      Touch(os.path.join(dir2, 'bar'), 0o755)
+
+      mem.SetVar(lvalue.Named('PATH'), value.Str('%s:%s' % (dir1, dir2)),
+                 scope_e.GlobalOnly)
+
+      # First directory wins
+      self.assertEqual(os.path.join(dir1, 'foo'), index.Lookup('foo'))
+      self.assertEqual(os.path.join(dir2, 'fob'), index.Lookup('fob'))
+      self.assertEqual(None, index.Lookup('fog'))
+      self.assertEqual(os.path.join(dir1, 'fog'),
+                       index.Lookup('fog', exec_required=False))
+      self.assertEqual(None, index.Lookup('nonexistent'))
+
+      # Sorted and unique
+      self.assertEqual(['fob', 'foo'], index.PrefixLookup('fo'))
+      self.assertEqual(['bar', 'fob', 'foo'], index.PrefixLookup(''))
+      self.assertEqual([], index.PrefixLookup('z'))
+
+      # chmod doesn't change the directory mtime, but Lookup() still sees it
+      os.chmod(os.path.join(dir1, 'fog'), 0o755)
+      self.assertEqual(os.path.join(dir1, 'fog'), index.Lookup('fog'))
+
+      # New files are found.  The listing was made in the same second the
+      # directory was modified, so it's listed again.
+      Touch(os.path.join(dir2, 'baz'), 0o755)
+      self.assertEqual(os.path.join(dir2, 'baz'), index.Lookup('baz'))
+      self.assertEqual(['bar', 'baz'], index.PrefixLookup('ba'))
+
+      # Changing $PATH evicts directories that aren't in it
+      mem.SetVar(lvalue.Named('PATH'), value.Str(dir2), scope_e.GlobalOnly)
+      self.assertEqual(os.path.join(dir2, 'foo'), index.Lookup('foo'))
+      self.assertEqual([dir2], index.listings.keys())
+      self.assertEqual(['fob', 'foo'], index.PrefixLookup('fo'))
+
+      # Removed directories are evicted too
+      shutil.rmtree(dir2)
+      self.assertEqual(None, index.Lookup('foo'))
+      self.assertEqual({}, index.listings)
+      self.assertEqual([], index.PrefixLookup(''))
+
+      # An execute-only directory can't be listed, but its files can still be
+      # run
+      dir3 = os.path.join(tmp, 'dir3')
+      os.mkdir(dir3)
+      Touch(os.path.join(dir3, 'tool'), 0o755)
+      os.chmod(dir3, 0o111)
+      try:
+        mem.SetVar(lvalue.Named('PATH'), value.Str(dir3), scope_e.GlobalOnly)
+        self.assertEqual(os.path.join(dir3, 'tool'), index.Lookup('tool'))
+        self.assertEqual(None, index.Lookup('nonexistent'))
+        if os.geteuid() != 0:  # root can list it anyway
+          self.assertEqual(False, index.listings[dir3].readable)
+          self.assertEqual([], index.PrefixLookup(''))
+      finally:
+        os.chmod(dir3, 0o755)
+    finally:
+      shutil.rmtree(tmp)
+
 
   def testPushTemp(self):
     mem = _InitMem()
@@ -248,6 +329,64 @@ class MemTest(unittest.TestCase):
     val = mem.GetVar('undef', scope_e.Dynamic)
     test_lib.AssertAsdlEqual(self, value.Undef(), val)
 
+  def testDynamicLookupCache(self):
+    mem = _InitMem()
+
+    def Get(name):
+      val = mem.GetVar(name)
+      return val.s if val.tag_() == value_e.Str else None
+
+    self.assertEqual(None, Get('x'))  # miss is cached too
+
+    # x=g
+    mem.SetVar(lvalue.Named('x'), value.Str('g'), scope_e.Dynamic)
+    self.assertEqual('g', Get('x'))
+
+    mem.PushCall('f', 0, [])
+    self.assertEqual('g', Get('x'))  # found in enclosing frame
+
+    # local x=L shadows the global
+    mem.SetVar(lvalue.Named('x'), value.Str('L'), scope_e.LocalOnly)
+    self.assertEqual('L', Get('x'))
+
+    # unset x reveals it again
+    mem.Unset(lvalue.Named('x'), scope_e.Dynamic, False)
+    self.assertEqual('g', Get('x'))
+
+    mem.SetVar(lvalue.Named('x'), value.Str('L2'), scope_e.LocalOnly)
+    self.assertEqual('L2', Get('x'))
+
+    # Popping the frame evicts its names
+    mem.PopCall()
+    self.assertEqual('g', Get('x'))
+
+    # Temp bindings
+    mem.PushTemp()
+    mem.SetVar(lvalue.Named('x'), value.Str('T'), scope_e.LocalOnly)
+    self.assertEqual('T', Get('x'))
+    mem.PopTemp()
+    self.assertEqual('g', Get('x'))
+
+  def testDebugStackVars(self):
+    mem = _InitMem()
+
+    funcname = mem.GetVar('FUNCNAME')
+    self.assertEqual([], funcname.strs)
+
+    mem.PushCall('f', 0, [])
+    self.assertEqual(['f'], mem.GetVar('FUNCNAME').strs)
+    # Reused until the debug stack changes
+    self.assertIs(mem.GetVar('FUNCNAME'), mem.GetVar('FUNCNAME'))
+
+    mem.PushCall('g', 0, [])
+    self.assertEqual(['g', 'f'], mem.GetVar('FUNCNAME').strs)
+    self.assertEqual(2, len(mem.GetVar('BASH_SOURCE').strs))
+
+    mem.PopCall()
+    self.assertEqual(['f'], mem.GetVar('FUNCNAME').strs)
+    mem.PopCall()
+    self.assertEqual([], mem.GetVar('FUNCNAME').strs)
+
   def testExportThenAssign(self):
     """Regression Test"""
     mem = _InitMem()
@@ -27,6 +27,31 @@ Tuple2<Id_t, int> OneToken(lex_mode_t lex_mode, Str* line, int start_pos) {
   return Tuple2<Id_t, int>(static_cast<Id_t>(id), end_pos);
 }
 
+// Like MAX_BATCH_TOKENS in native/fastlex.c
+const int kMaxBatchTokens = 32;
+
+List<int>* OshTokens(lex_mode_t lex_mode, Str* line, int start_pos) {
+  auto result = new List<int>();
+  int pos = start_pos;
+  for (int n = 0; n < kMaxBatchTokens; ++n) {
+    int id;
+    int end_pos;
+    MatchOshToken(static_cast<int>(lex_mode),
+                  reinterpret_cast<const unsigned char*>(line->data_),
+                  line->len_, pos, &id, &end_pos);
+    if (id == id__Eol_Tok) {
+      break;
+    }
+    result->append(id);
+    result->append(end_pos);
+    if (end_pos == pos) {  // empty match
+      break;
+    }
+    pos = end_pos;
+  }
+  return result;
+}
+
 Tuple2<Id_t, Str*> SimpleLexer::Next() {
   int id;
   int end_pos;
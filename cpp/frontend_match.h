@@ -18,6 +18,9 @@ using types_asdl::lex_mode_t;
 // The big lexer
 Tuple2<Id_t, int> OneToken(lex_mode_t lex_mode, Str* line, int start_pos);
 
+// Flat list of (id, end_pos) pairs, up to a bounded number of tokens
+List<int>* OshTokens(lex_mode_t lex_mode, Str* line, int start_pos);
+
 // There are 5 secondary lexers with matchers of this type
 typedef void (*MatchFunc)(const unsigned char* line, int line_len,
                           int start_pos, int* id, int* end_pos);
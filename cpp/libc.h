@@ -36,6 +36,18 @@ inline List<Str*>* glob(Str* pat) {
   assert(0);
 }
 
+inline Tuple2<List<Str*>*, List<Str*>*>* read_dir(Str* path) {
+  assert(0);
+}
+
+inline int dir_mtime(Str* path) {
+  assert(0);
+}
+
+inline List<Str*>* glob_filter(Str* pat, List<Str*>* names) {
+  assert(0);
+}
+
 // Raises RuntimeError if the pattern is invalid.  TODO: Use a different
 // exception?
 inline List<Str*>* regex_match(Str* pattern, Str* str) {
@@ -47,6 +59,24 @@ inline Tuple2<int, int>* regex_first_group_match(Str* pattern, Str* str,
   assert(0);
 }
 
+inline List<Tuple2<int, int>*>* regex_all_group_matches(Str* pattern,
+                                                       Str* str) {
+  assert(0);
+}
+
+inline int regex_strip_pos(Str* regex, Str* str, bool from_end,
+                           bool longest) {
+  assert(0);
+}
+
+inline int utf8_count(Str* s) {
+  assert(0);
+}
+
+inline int utf8_advance(Str* s, int num_chars, int byte_offset) {
+  assert(0);
+}
+
 inline void print_time(double real, double user, double sys) {
   assert(0);
 }
@@ -10,15 +10,26 @@ namespace bool_stat {
 
 using syntax_asdl::word_t;
 
+class StatCache {
+ public:
+  void Clear() {
+    assert(0);
+  }
+  Tuple2<List<Str*>*, List<Str*>*>* ReadDir(Str* path) {
+    assert(0);
+  }
+};
+
 bool isatty(int fd, Str* s, word_t* blame_word) {
   assert(0);
 }
 
-bool DoUnaryOp(Id_t op_id, Str* s) {
+bool DoUnaryOp(Id_t op_id, Str* s, StatCache* stat_cache = nullptr) {
   assert(0);
 }
 
-bool DoBinaryOp(Id_t op_id, Str* s1, Str* s2) {
+bool DoBinaryOp(Id_t op_id, Str* s1, Str* s2,
+                StatCache* stat_cache = nullptr) {
   assert(0);
 }
 
@@ -40,8 +40,8 @@ class Parser {
 
   // Probably should delete these
   // void shift(int typ, syntax_asdl::Token* opaque, int newstate);
-  // void push(int typ, syntax_asdl::Token* opaque, Tuple2<List<List<Tuple2<int,
-  // int>*>*>*, Dict<int, int>*>* newdfa, int newstate);  void pop();
+  // void push(int typ, syntax_asdl::Token* opaque, int newstate);
+  // void pop();
 
   // grammar::Grammar* grammar;
   pnode::PNode* rootnode;
@@ -27,7 +27,7 @@ from typing import Dict, List, Optional, Any
 # https://www.gnu.org/software/bash/manual/html_node/Special-Builtins.html
 
 _NORMAL_BUILTINS = [
-    'read', 'echo', 'printf',
+    'read', 'mapfile', 'readarray', 'echo', 'printf',
 
     'cd', 'pushd', 'popd', 'dirs', 'pwd',
 
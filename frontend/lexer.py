@@ -9,7 +9,7 @@ lexer.py - Library for lexing.
 """
 
 from _devbuild.gen.syntax_asdl import Token, line_span
-from _devbuild.gen.types_asdl import lex_mode_t
+from _devbuild.gen.types_asdl import lex_mode_t, lex_mode_e
 from _devbuild.gen.id_kind_asdl import Id_t, Id, Kind
 from asdl import runtime
 from core.util import log
@@ -35,6 +35,14 @@ class LineLexer(object):
     self.arena_skip = False  # For MaybeUnreadOne
     self.last_span_id = runtime.NO_SPID  # For MaybeUnreadOne
 
+    # Tokens lexed ahead by match.OshTokens(), as a flat list of (id, end_pos)
+    # pairs.  They're valid while the mode stays the same and we're at
+    # batch_pos.
+    self.batch = []  # type: List[int]
+    self.batch_index = 0
+    self.batch_mode = lex_mode_e.ShCommand
+    self.batch_pos = -1
+
     self.Reset(line, -1, 0)  # Invalid line_id to start
 
   def __repr__(self):
@@ -48,6 +56,7 @@ class LineLexer(object):
     self.line = line
     self.line_id = line_id
     self.line_pos = line_pos
+    self.batch_pos = -1
 
   def MaybeUnreadOne(self):
     # type: () -> bool
@@ -111,9 +120,22 @@ class LineLexer(object):
     line = self.line
     line_pos = self.line_pos
 
-    tok_type, end_pos = match.OneToken(lex_mode, line, line_pos)
-    if tok_type == Id.Eol_Tok:  # Do NOT add a span for this sentinel!
-      return _EOL_TOK
+    # Walk the batch of tokens, and only call into the matcher again when the
+    # mode changes, or MaybeUnreadOne() moved line_pos.
+    i = self.batch_index
+    if (lex_mode != self.batch_mode or line_pos != self.batch_pos or
+        i == len(self.batch)):
+      self.batch = match.OshTokens(lex_mode, line, line_pos)
+      self.batch_mode = lex_mode
+      i = 0
+      if len(self.batch) == 0:  # Do NOT add a span for this sentinel!
+        self.batch_pos = -1
+        return _EOL_TOK
+
+    tok_type = self.batch[i]
+    end_pos = self.batch[i + 1]
+    self.batch_index = i + 2
+    self.batch_pos = end_pos
 
     # Save on allocations!  We often don't look at the token value.
     # TODO: can inline this function with formula on 16-bit Id.
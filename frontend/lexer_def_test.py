@@ -10,8 +10,10 @@ import unittest
 from _devbuild.gen.id_kind_asdl import Id, Kind
 from _devbuild.gen.types_asdl import lex_mode_e
 from core.test_lib import Tok
+from core.util import log
 from core import test_lib
 from frontend import lexer_def
+from frontend import lexer_dfa
 from frontend import lexer
 from frontend import consts
 from frontend.lexer import LineLexer
@@ -342,6 +344,70 @@ class RegexTest(unittest.TestCase):
     self.assertEqual(False, bool(last_echo_e_pat.match('\0')))
 
 
+DFA_LINES = [
+    'echo $x"${y:-z}"\'sq\' $((1+2)) `ls` >out 2>&1 &\n',
+    'a\0b',  # NUL is the end of the line, like in C
+    '\xff\xfe x',
+    r'newline \n NUL \0 octal \0377 hex \x00 e',
+    r'\h \w \[ \] \$',
+    'echo !! !$ !-2 !foo \\!!',
+    '*.[ch] ?[!a] {1..10..2} -300..-100',
+    '',
+]
+
+
+class DfaTest(unittest.TestCase):
+
+  def _AssertSameMatches(self, dfa, match_func, lines):
+    for line in lines:
+      for pos in xrange(len(line) + 1):
+        expected = match_func(line, pos)
+        self.assertEqual(expected, dfa.Match(line, pos),
+                         '%r at %d: expected %s' % (line, pos, expected))
+
+  def testSameAsRe2c(self):
+    fastlex = match.fastlex
+    if not fastlex:
+      log('fastlex not built; skipping')
+      return
+
+    lines = list(DFA_LINES)
+    for path in ['spec/smoke.test.sh', 'spec/var-op-strip.test.sh']:
+      with open(path) as f:
+        lines.extend(f.readlines())
+
+    for lex_mode, pat_list in lexer_def.LEXER_DEF.items():
+      dfa = lexer_dfa.Compile(pat_list)
+      match_func = lambda line, pos: fastlex.MatchOshToken(lex_mode, line, pos)
+      self._AssertSameMatches(dfa, match_func, lines)
+
+    CASES = [
+        (lexer_def.ECHO_E_DEF, fastlex.MatchEchoToken),
+        (lexer_def.GLOB_DEF, fastlex.MatchGlobToken),
+        (lexer_def.PS1_DEF, fastlex.MatchPS1Token),
+        (lexer_def.HISTORY_DEF, fastlex.MatchHistoryToken),
+        (lexer_def.BRACE_RANGE_DEF, fastlex.MatchBraceRangeToken),
+    ]
+    for pat_list, match_func in CASES:
+      self._AssertSameMatches(lexer_dfa.Compile(pat_list), match_func, lines)
+
+  def testLongestMatch(self):
+    dfa = lexer_dfa.Compile([
+        (False, 'if', Id.KW_If),
+        (True, r'[a-z]+', Id.Lit_Chars),
+        (True, r'[ ]*', Id.WS_Space),  # can match the empty string
+    ])
+    # Tie: the first rule wins
+    self.assertEqual((Id.KW_If, 2), dfa.Match('if x', 0))
+    # The longest match wins
+    self.assertEqual((Id.Lit_Chars, 3), dfa.Match('iff x', 0))
+    self.assertEqual((Id.WS_Space, 3), dfa.Match('if x', 2))
+    self.assertEqual((Id.WS_Space, 2), dfa.Match('if-', 2))  # empty
+    # End of line
+    self.assertEqual((Id.Eol_Tok, 4), dfa.Match('if x', 4))
+    self.assertEqual((Id.Eol_Tok, 1), dfa.Match('a\0', 1))
+
+
 class OtherLexerTest(unittest.TestCase):
 
   def testEchoLexer(self):
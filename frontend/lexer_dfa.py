@@ -0,0 +1,261 @@
+#!/usr/bin/env python2
+"""
+lexer_dfa.py - Compile a list of lexer rules to a single DFA.
+
+This is the pure Python fallback for when fastlex.so isn't built.  It has the
+same semantics as the re2c code generated by frontend/lexer_gen.py:
+
+- The longest match wins, and the first rule wins a tie.
+- The end of the line looks like a NUL byte.  It matches an implicit last rule
+  that returns Id.Eol_Tok without advancing.
+
+Rather than trying every regex at each position, we walk one DFA per lexer
+mode, a character at a time.
+"""
+from __future__ import print_function
+
+import sre_constants
+import sre_parse
+
+from _devbuild.gen.id_kind_asdl import Id, Id_t
+
+from typing import List, Tuple, Dict, TYPE_CHECKING
+if TYPE_CHECKING:
+  from typing import FrozenSet
+
+# Byte values are 0-255, like re2c's unsigned char
+_ALL_BYTES = frozenset(range(256))
+_NEWLINE = ord('\n')
+
+
+class _Nfa(object):
+  """Thompson NFA.  States are integers."""
+
+  def __init__(self):
+    # type: () -> None
+    self.eps = []  # type: List[List[int]]
+    self.edges = []  # type: List[List[Tuple[FrozenSet[int], int]]]
+    self.accept = {}  # type: Dict[int, int]  # state -> rule index
+
+  def NewState(self):
+    # type: () -> int
+    self.eps.append([])
+    self.edges.append([])
+    return len(self.eps) - 1
+
+  def Chars(self, chars):
+    # type: (FrozenSet[int]) -> Tuple[int, int]
+    start = self.NewState()
+    end = self.NewState()
+    self.edges[start].append((chars, end))
+    return start, end
+
+  def Empty(self):
+    # type: () -> Tuple[int, int]
+    start = self.NewState()
+    return start, start
+
+
+def _CharClass(items):
+  # type: (List[Tuple[str, object]]) -> FrozenSet[int]
+  chars = set()  # type: set
+  negate = False
+  for name, arg in items:
+    if name == 'negate':
+      negate = True
+    elif name == 'literal':
+      chars.add(arg)
+    elif name == 'range':
+      begin, end = arg  # type: ignore
+      chars.update(range(begin, end + 1))
+    else:
+      raise RuntimeError("I don't understand character class item: %r" % name)
+
+  if negate:
+    return _ALL_BYTES - frozenset(chars)
+  return frozenset(chars)
+
+
+def _Concat(nfa, frags):
+  # type: (_Nfa, List[Tuple[int, int]]) -> Tuple[int, int]
+  if not frags:
+    return nfa.Empty()
+  start, end = frags[0]
+  for s, e in frags[1:]:
+    nfa.eps[end].append(s)
+    end = e
+  return start, end
+
+
+def _Repeat(nfa, children, min_, max_):
+  # type: (_Nfa, List[Tuple[str, object]], int, int) -> Tuple[int, int]
+  frags = [_Tree(nfa, children) for _ in xrange(min_)]
+
+  if max_ == sre_constants.MAXREPEAT:  # x* at the end
+    s, e = _Tree(nfa, children)
+    loop = nfa.NewState()
+    nfa.eps[loop].append(s)
+    nfa.eps[e].append(loop)
+    frags.append((loop, loop))
+  else:  # x? repeated
+    for _ in xrange(max_ - min_):
+      s, e = _Tree(nfa, children)
+      nfa.eps[s].append(e)
+      frags.append((s, e))
+
+  return _Concat(nfa, frags)
+
+
+def _Tree(nfa, re_tree):
+  # type: (_Nfa, List[Tuple[str, object]]) -> Tuple[int, int]
+  """Like TranslateTree() in frontend/lexer_gen.py, but builds an NFA."""
+  frags = []
+  for name, arg in re_tree:
+    if name == 'literal':
+      frags.append(nfa.Chars(frozenset([arg])))
+
+    elif name == 'not_literal':
+      frags.append(nfa.Chars(_ALL_BYTES - frozenset([arg])))
+
+    elif name == 'in':  # character class
+      frags.append(nfa.Chars(_CharClass(arg)))  # type: ignore
+
+    elif name == 'any':  # . doesn't match a newline in Python or re2c
+      frags.append(nfa.Chars(_ALL_BYTES - frozenset([_NEWLINE])))
+
+    elif name == 'max_repeat':
+      min_, max_, children = arg  # type: ignore
+      frags.append(_Repeat(nfa, children, min_, max_))
+
+    elif name == 'subpattern':
+      children = arg[-1]  # type: ignore
+      frags.append(_Tree(nfa, children))
+
+    else:
+      raise RuntimeError("I don't understand regex construct: %r" % name)
+
+  return _Concat(nfa, frags)
+
+
+def _Closure(nfa, states):
+  # type: (_Nfa, List[int]) -> FrozenSet[int]
+  result = set(states)
+  stack = list(states)
+  while stack:
+    s = stack.pop()
+    for t in nfa.eps[s]:
+      if t not in result:
+        result.add(t)
+        stack.append(t)
+  return frozenset(result)
+
+
+class Dfa(object):
+  """A DFA that matches the longest token at a position.
+
+  Attributes:
+    byte_class: maps each 1-char string to an input class
+    trans: trans[state][input class] is the next state, or -1
+    accept: accept[state] is the Id of the token, or -1
+  """
+
+  def __init__(self, byte_class, trans, accept):
+    # type: (Dict[str, int], List[List[int]], List[int]) -> None
+    self.byte_class = byte_class
+    self.trans = trans
+    self.accept = accept
+
+  def Match(self, line, start_pos):
+    # type: (str, int) -> Tuple[Id_t, int]
+    """Returns (id, end_pos)."""
+    byte_class = self.byte_class
+    trans = self.trans
+    accept = self.accept
+
+    n = len(line)
+    state = 0
+    pos = start_pos
+    tok_id = accept[0]  # some rules match the empty string
+    end_pos = start_pos
+    while pos <= n:
+      ch = line[pos] if pos < n else '\0'  # like the NUL sentinel in C
+      state = trans[state][byte_class[ch]]
+      if state == -1:
+        break
+      pos += 1
+      if accept[state] != -1:
+        tok_id = accept[state]
+        end_pos = pos
+
+    if tok_id == -1:
+      raise AssertionError('no match at position %d: %r' % (start_pos, line))
+    if tok_id == Id.Eol_Tok:
+      return Id.Eol_Tok, start_pos  # don't advance past the NUL
+    return tok_id, end_pos
+
+
+def Compile(pat_list):
+  # type: (List[Tuple[bool, str, Id_t]]) -> Dfa
+  """Compile a list of (is_regex, pattern, Id) rules from lexer_def.py."""
+  nfa = _Nfa()
+  starts = []  # type: List[int]
+  ids = []  # type: List[Id_t]
+
+  rules = list(pat_list) + [(False, '\0', Id.Eol_Tok)]  # sentinel rule
+  for i, (is_regex, pat, tok_id) in enumerate(rules):
+    if is_regex:
+      s, e = _Tree(nfa, sre_parse.parse(pat))  # type: ignore
+    else:
+      s, e = _Concat(nfa, [nfa.Chars(frozenset([ord(c)])) for c in pat])
+    nfa.accept[e] = i
+    starts.append(s)
+    ids.append(tok_id)
+
+  # Partition the bytes into classes that every transition treats the same
+  # way, so the DFA has a few columns instead of 256.
+  char_sets = set()  # type: set
+  for edges in nfa.edges:
+    for chars, _ in edges:
+      char_sets.add(chars)
+  char_sets_list = list(char_sets)
+
+  signature_to_class = {}  # type: Dict[Tuple[bool, ...], int]
+  class_of = []  # type: List[int]
+  representatives = []  # type: List[int]
+  for b in xrange(256):
+    sig = tuple(b in chars for chars in char_sets_list)
+    if sig not in signature_to_class:
+      signature_to_class[sig] = len(representatives)
+      representatives.append(b)
+    class_of.append(signature_to_class[sig])
+
+  # Subset construction
+  start = _Closure(nfa, starts)
+  state_ids = {start: 0}  # type: Dict[FrozenSet[int], int]
+  subsets = [start]
+  trans = []  # type: List[List[int]]
+  accept = []  # type: List[int]
+
+  i = 0
+  while i < len(subsets):
+    subset = subsets[i]
+    i += 1
+
+    rule_nums = [nfa.accept[s] for s in subset if s in nfa.accept]
+    accept.append(ids[min(rule_nums)] if rule_nums else -1)
+
+    row = []
+    for b in representatives:
+      targets = [t for s in subset for chars, t in nfa.edges[s] if b in chars]
+      if not targets:
+        row.append(-1)
+        continue
+      next_subset = _Closure(nfa, targets)
+      if next_subset not in state_ids:
+        state_ids[next_subset] = len(subsets)
+        subsets.append(next_subset)
+      row.append(state_ids[next_subset])
+    trans.append(row)
+
+  byte_class = dict((chr(b), class_of[b]) for b in xrange(256))
+  return Dfa(byte_class, trans, accept)
@@ -19,59 +19,36 @@ except ImportError:
 if fastlex:
   # Shouldn't use re module in this case
   re = None
+  lexer_dfa = None  # type: Any
 else:
   import re  # type: ignore
+  from frontend import lexer_dfa
 
 
 if TYPE_CHECKING:
+  from frontend.lexer_dfa import Dfa
   SRE_Pattern = Any  # Do we need a .pyi file for re or _sre?
   SimpleMatchFunc = Callable[[str, int], Tuple[Id_t, int]]
-  LexerPairs = List[Tuple[SRE_Pattern, Id_t]]
-
-
-def _LongestMatch(re_list, line, start_pos):
-  # type: (LexerPairs, str, int) -> Tuple[Id_t, int]
-
-  # Simulate the EOL handling in re2c.
-  if start_pos >= len(line):
-    return Id.Eol_Tok, start_pos
-
-  matches = []
-  for regex, tok_type in re_list:
-    m = regex.match(line, start_pos)  # left-anchored
-    if m:
-      matches.append((m.end(0), tok_type, m.group(0)))
-  if not matches:
-    raise AssertionError('no match at position %d: %r' % (start_pos, line))
-  end_pos, tok_type, tok_val = max(matches, key=lambda m: m[0])
-  #util.log('%s %s', tok_type, end_pos)
-  return tok_type, end_pos
-
-
-def _CompileAll(pat_list):
-  # type: (List[Tuple[bool, str, Id_t]]) -> LexerPairs
-  result = []
-  for is_regex, pat, token_id in pat_list:
-    if not is_regex:
-      pat = re.escape(pat)  # type: ignore  # turn $ into \$
-    result.append((re.compile(pat), token_id))  # type: ignore
-  return result
 
 
 class _MatchOshToken_Slow(object):
-  """An abstract matcher that doesn't depend on OSH."""
+  """An abstract matcher that doesn't depend on OSH.
+
+  It compiles one DFA per lexer mode the first time the mode is used.
+  """
   def __init__(self, lexer_def):
     # type: (Dict[lex_mode_t, List[Tuple[bool, str, Id_t]]]) -> None
-    self.lexer_def = {}  # type: Dict[lex_mode_t, LexerPairs]
-    for lex_mode, pat_list in lexer_def.items():
-      self.lexer_def[lex_mode] = _CompileAll(pat_list)
+    self.lexer_def = lexer_def
+    self.dfas = {}  # type: Dict[lex_mode_t, Dfa]
 
   def __call__(self, lex_mode, line, start_pos):
     # type: (lex_mode_t, str, int) -> Tuple[Id_t, int]
     """Returns (id, end_pos)."""
-    re_list = self.lexer_def[lex_mode]
-
-    return _LongestMatch(re_list, line, start_pos)
+    dfa = self.dfas.get(lex_mode)
+    if dfa is None:
+      dfa = lexer_dfa.Compile(self.lexer_def[lex_mode])
+      self.dfas[lex_mode] = dfa
+    return dfa.Match(line, start_pos)
 
 
 def _MatchOshToken_Fast(lex_mode, line, start_pos):
@@ -83,14 +60,41 @@ def _MatchOshToken_Fast(lex_mode, line, start_pos):
   return tok_type, end_pos
 
 
+class _MatchOshTokens_Slow(object):
+  """Like fastlex.MatchOshTokens, but only returns one token at a time."""
+  def __init__(self, one_token):
+    # type: (_MatchOshToken_Slow) -> None
+    self.one_token = one_token
+
+  def __call__(self, lex_mode, line, start_pos):
+    # type: (lex_mode_t, str, int) -> List[int]
+    tok_type, end_pos = self.one_token(lex_mode, line, start_pos)
+    if tok_type == Id.Eol_Tok:
+      return []
+    return [tok_type, end_pos]
+
+
+def _MatchOshTokens_Fast(lex_mode, line, start_pos):
+  # type: (lex_mode_t, str, int) -> List[int]
+  """Returns a flat list of (Id, end_pos) pairs, not including Eol_Tok.
+
+  They're the tokens up to the end of the line (or a bounded number of them),
+  assuming the lexer mode doesn't change.
+  """
+  return fastlex.MatchOshTokens(lex_mode, line, start_pos)
+
+
 class _MatchTokenSlow(object):
   def __init__(self, pat_list):
     # type: (List[Tuple[bool, str, Id_t]]) -> None
-    self.pat_list = _CompileAll(pat_list)
+    self.pat_list = pat_list
+    self.dfa = None  # type: Dfa
 
   def __call__(self, line, start_pos):
     # type: (str, int) -> Tuple[Id_t, int]
-    return _LongestMatch(self.pat_list, line, start_pos)
+    if self.dfa is None:
+      self.dfa = lexer_dfa.Compile(self.pat_list)
+    return self.dfa.Match(line, start_pos)
 
 
 def _MatchEchoToken_Fast(line, start_pos):
@@ -132,6 +136,7 @@ def _MatchBraceRangeToken_Fast(line, start_pos):
 
 if fastlex:
   OneToken = _MatchOshToken_Fast
+  OshTokens = _MatchOshTokens_Fast
   ECHO_MATCHER = _MatchEchoToken_Fast
   GLOB_MATCHER = _MatchGlobToken_Fast
   PS1_MATCHER = _MatchPS1Token_Fast
@@ -143,6 +148,7 @@ if fastlex:
   MatchOption = fastlex.MatchOption
 else:
   OneToken = _MatchOshToken_Slow(lexer_def.LEXER_DEF)
+  OshTokens = _MatchOshTokens_Slow(OneToken)
   ECHO_MATCHER = _MatchTokenSlow(lexer_def.ECHO_E_DEF)
   GLOB_MATCHER = _MatchTokenSlow(lexer_def.GLOB_DEF)
   PS1_MATCHER = _MatchTokenSlow(lexer_def.PS1_DEF)
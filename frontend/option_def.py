@@ -158,7 +158,6 @@ _NO_OPS = [
     'direxpand', 'dirspell', 'dotglob', 'execfail',
     'extdebug',  # for --debugger?
     'extquote', 'force_fignore', 'globasciiranges',
-    'globstar',  # TODO:  implement **
     'gnu_errfmt', 'histreedit', 'histverify', 'huponexit',
     'interactive_comments', 'lithist', 'localvar_inherit', 'localvar_unset',
     'login_shell', 'mailwarn', 'no_empty_cmd_completion', 'nocaseglob',
@@ -229,10 +228,16 @@ def _Init(opt_def):
 
   # shopt options that aren't in any groups.
   opt_def.Add('failglob')  # not implemented.
+  opt_def.Add('globstar')  # ** matches directories recursively
 
   opt_def.Add('eval_unsafe_arith')  # recursive parsing and evaluation (ble.sh)
   opt_def.Add('parse_dynamic_arith')  # dynamic LHS
   opt_def.Add('compat_array')  # ${array} is ${array[0]}
+  opt_def.Add('buffered_read')  # read and getline buffer pipes (unsafe)
+  # Cache the LST of files.  Not named parse_*, since it doesn't change parsing.
+  opt_def.Add('lst_cache')
+  opt_def.Add('stat_cache')  # cache stat() for [[ -f ]] and test
+  opt_def.Add('page_lines')  # read lines of parsed files back from disk
 
   # Two strict options that from bash's shopt
   for name in ['nullglob', 'inherit_errexit']:
@@ -221,19 +221,13 @@ class ParseContext(object):
     self.parse_opts = parse_opts
     self.aliases = aliases
 
+    self.oil_grammar = oil_grammar
     self.e_parser = expr_parse.ExprParser(self, oil_grammar)
     # NOTE: The transformer is really a pure function.
     if oil_grammar:
       self.tr = expr_to_ast.Transformer(oil_grammar)
-      if mylib.PYTHON:
-        names = MakeGrammarNames(oil_grammar)
     else:  # hack for unit tests, which pass None
       self.tr = None
-      if mylib.PYTHON:  # TODO: Simplify
-        names = {}
-
-    if mylib.PYTHON:
-      self.p_printer = expr_parse.ParseTreePrinter(names)  # print raw nodes
 
     self.parsing_expr = False  # "single-threaded" state
 
@@ -241,6 +235,17 @@ class ParseContext(object):
     self.trail = _NullTrail()  # type: _BaseTrail
     self.one_pass_parse = False
 
+  if mylib.PYTHON:
+    def _PrintParseTree(self, pnode):
+      # type: (PNode) -> None
+      """Print raw nodes, for debugging."""
+      # Not done in the constructor, since it would load the whole grammar
+      if self.oil_grammar:
+        names = MakeGrammarNames(self.oil_grammar)
+      else:  # unit tests pass None
+        names = {}
+      expr_parse.ParseTreePrinter(names).Print(pnode)
+
   def Init_Trail(self, trail):
     # type: (_BaseTrail) -> None
     self.trail = trail
@@ -327,7 +332,7 @@ class ParseContext(object):
       self.parsing_expr = False
 
     if 0:
-      self.p_printer.Print(pnode)
+      self._PrintParseTree(pnode)
 
     ast_node = self.tr.MakeVarDecl(pnode)
     ast_node.keyword = kw_token  # VarDecl didn't fill this in
@@ -340,7 +345,7 @@ class ParseContext(object):
     pnode, last_token = self.e_parser.Parse(lexer,
                                             grammar_nt.oil_place_mutation)
     if 0:
-      self.p_printer.Print(pnode)
+      self._PrintParseTree(pnode)
     ast_node = self.tr.MakePlaceMutation(pnode)
     ast_node.keyword = kw_token  # VarDecl didn't fill this in
     return ast_node, last_token
@@ -354,7 +359,7 @@ class ParseContext(object):
     pnode, last_token = self._ParseOil(lexer, grammar_nt.oil_arglist)
 
     if 0:
-      self.p_printer.Print(pnode)
+      self._PrintParseTree(pnode)
 
     self.tr.ArgList(pnode, out)
     return last_token
@@ -365,7 +370,7 @@ class ParseContext(object):
     pnode, last_token = self.e_parser.Parse(lexer, start_symbol)
 
     if 0:
-      self.p_printer.Print(pnode)
+      self._PrintParseTree(pnode)
 
     ast_node = self.tr.Expr(pnode)
     return ast_node, last_token
@@ -376,7 +381,7 @@ class ParseContext(object):
     pnode, last_token = self.e_parser.Parse(lexer, start_symbol)
 
     if 0:
-      self.p_printer.Print(pnode)
+      self._PrintParseTree(pnode)
 
     lvalue, iterable = self.tr.OilForExpr(pnode)
     return lvalue, iterable, last_token
@@ -387,7 +392,7 @@ class ParseContext(object):
     pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.oil_proc)
 
     if 0:
-      self.p_printer.Print(pnode)
+      self._PrintParseTree(pnode)
 
     out.sig = self.tr.Proc(pnode)
     return last_token
@@ -398,7 +403,7 @@ class ParseContext(object):
     pnode, last_token = self.e_parser.Parse(lexer, grammar_nt.oil_func)
 
     if 0:
-      self.p_printer.Print(pnode)
+      self._PrintParseTree(pnode)
 
     self.tr.Func(pnode, out)
     return last_token
@@ -15,7 +15,7 @@ from core.util import p_die
 from typing import Optional, Tuple, List, Union, IO, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.syntax_asdl import Token
-  from core.alloc import Arena
+  from core.alloc import Arena, LinePager
 
 
 class _Reader(object):
@@ -23,6 +23,7 @@ class _Reader(object):
     # type: (Arena) -> None
     self.arena = arena
     self.line_num = 1  # physical line numbers start from 1
+    self.pager = None  # type: Optional[LinePager]
 
   def _GetLine(self):
     # type: () -> Optional[str]
@@ -35,7 +36,10 @@ class _Reader(object):
       eof_line = None  # type: Optional[str]
       return -1, eof_line, 0
 
-    line_id = self.arena.AddLine(line, self.line_num)
+    if self.pager:
+      line_id = self.arena.AddPagedLine(line, self.line_num, self.pager)
+    else:
+      line_id = self.arena.AddLine(line, self.line_num)
     self.line_num += 1
     return line_id, line, 0
 
@@ -52,6 +56,31 @@ class _Reader(object):
     """
     return False
 
+  def SkipTo(self, line_num):
+    # type: (int) -> None
+    """Read up to line_num without adding the lines to the Arena.
+
+    For a file whose first nodes were loaded by core/parse_cache.py.
+    """
+    while self.line_num < line_num:
+      line = self._GetLine()
+      if line is None:
+        break
+      if self.pager:
+        self.pager.Append(line)
+      self.line_num += 1
+    if self.pager:
+      self.pager.Release()
+
+  def ReleaseLines(self):
+    # type: () -> None
+    """Called after a command is parsed in main_loop.py.
+
+    Paged lines before the current one can then be dropped from memory.
+    """
+    if self.pager:
+      self.pager.Release()
+
 
 class DisallowedLineReader(_Reader):
   """For CommandParser in Oil expressions."""
@@ -69,14 +98,17 @@ class DisallowedLineReader(_Reader):
 class FileLineReader(_Reader):
   """For -c and stdin?"""
 
-  def __init__(self, f, arena):
-    # type: (mylib.LineReader, Arena) -> None
+  def __init__(self, f, arena, pager=None):
+    # type: (mylib.LineReader, Arena, Optional[LinePager]) -> None
     """
     Args:
-      lines: List of (line_id, line) pairs
+      f: the file to read lines from
+      pager: if set, the Arena doesn't keep the lines in memory after
+        they're parsed
     """
     _Reader.__init__(self, arena)
     self.f = f
+    self.pager = pager
     self.last_line_hint = False
 
   def _GetLine(self):
@@ -52,6 +52,64 @@ fastlex_MatchOshToken(PyObject *self, PyObject *args) {
   return Py_BuildValue("(ii)", id, end_pos);
 }
 
+// Upper bound on the tokens lexed ahead in one call.  The parser often changes
+// the mode after a few tokens, which throws away the rest of the batch.  The
+// bound keeps that from being quadratic on long lines.
+#define MAX_BATCH_TOKENS 32
+
+static PyObject *
+fastlex_MatchOshTokens(PyObject *self, PyObject *args) {
+  int lex_mode;
+
+  unsigned char* line;
+  int line_len;
+
+  int start_pos;
+  if (!PyArg_ParseTuple(args, "is#i",
+                        &lex_mode, &line, &line_len, &start_pos)) {
+    return NULL;
+  }
+
+  if (start_pos > line_len) {
+    PyErr_Format(PyExc_ValueError,
+                 "Invalid MatchOshTokens call (start_pos = %d, line_len = %d)",
+                 start_pos, line_len);
+    return NULL;
+  }
+
+  // Flat list of (id, end_pos) pairs, not including Eol_Tok.
+  int ids[MAX_BATCH_TOKENS];
+  int ends[MAX_BATCH_TOKENS];
+  int n = 0;
+  int pos = start_pos;
+  while (n < MAX_BATCH_TOKENS) {
+    int id;
+    int end_pos;
+    MatchOshToken(lex_mode, line, line_len, pos, &id, &end_pos);
+    if (id == id__Eol_Tok) {
+      break;
+    }
+    ids[n] = id;
+    ends[n] = end_pos;
+    n++;
+    if (end_pos == pos) {  // empty match: the mode is about to change
+      break;
+    }
+    pos = end_pos;
+  }
+
+  PyObject* result = PyList_New(n * 2);
+  if (result == NULL) {
+    return NULL;
+  }
+  int i;
+  for (i = 0; i < n; ++i) {
+    PyList_SET_ITEM(result, i * 2, PyInt_FromLong(ids[i]));
+    PyList_SET_ITEM(result, i * 2 + 1, PyInt_FromLong(ends[i]));
+  }
+  return result;
+}
+
 static PyObject *
 fastlex_MatchEchoToken(PyObject *self, PyObject *args) {
   unsigned char* line;
@@ -214,6 +272,8 @@ fastlex_ShouldHijack(PyObject *self, PyObject *args) {
 static PyMethodDef methods[] = {
   {"MatchOshToken", fastlex_MatchOshToken, METH_VARARGS,
    "(lexer mode, line, start_pos) -> (id, end_pos)."},
+  {"MatchOshTokens", fastlex_MatchOshTokens, METH_VARARGS,
+   "(lexer mode, line, start_pos) -> [id, end_pos, id, end_pos, ...]."},
   {"MatchEchoToken", fastlex_MatchEchoToken, METH_VARARGS,
    "(line, start_pos) -> (id, end_pos)."},
   {"MatchGlobToken", fastlex_MatchGlobToken, METH_VARARGS,
@@ -51,6 +51,29 @@ class LexTest(unittest.TestCase):
     line = 'end of file\0'
     TokenizeLineOuter(line)
 
+  def testMatchOshTokens(self):
+    for line in ['end of line\n', 'echo $x"y" >out\n', 'x', '']:
+      expected = []
+      start_pos = 0
+      while True:
+        tok_type, end_pos = MatchOshToken(lex_mode_e.ShCommand, line, start_pos)
+        if tok_type == Id.Eol_Tok:
+          break
+        expected.extend([tok_type, end_pos])
+        start_pos = end_pos
+
+      self.assertEqual(
+          expected, fastlex.MatchOshTokens(lex_mode_e.ShCommand, line, 0))
+
+    # Starts in the middle, and stops after a bounded number of tokens
+    line = 'a ' * 100
+    tokens = fastlex.MatchOshTokens(lex_mode_e.ShCommand, line, 4)
+    self.assertEqual([Id.Lit_Chars, 5, Id.WS_Space, 6], tokens[:4])
+    self.assertEqual(64, len(tokens))
+
+    self.assertRaises(
+        ValueError, fastlex.MatchOshTokens, lex_mode_e.ShCommand, 'x', 2)
+
   def testMatchOption(self):
     log('MatchOption')
     CASES = [
@@ -15,9 +15,16 @@
 #include <stdlib.h>
 #include <sys/ioctl.h>
 #include <locale.h>
+#ifdef __APPLE__
+#include <xlocale.h>  // newlocale(), uselocale()
+#endif
 #include <fnmatch.h>
 #include <glob.h>
 #include <regex.h>
+#include <dirent.h>
+#include <fcntl.h>  // AT_SYMLINK_NOFOLLOW
+#include <string.h>
+#include <sys/stat.h>
 
 #include <Python.h>
 
@@ -167,6 +174,225 @@ func_glob(PyObject *self, PyObject *args) {
   return matches;
 }
 
+// For osh/glob_.py, which walks directories itself rather than calling
+// glob().  Returns a tuple (names, dirs), or None if the directory can't be
+// read.  names has every entry, including . and .. like glob() sees them.
+// dirs has the subdirectories, but not symlinks to them, so ** doesn't follow
+// links.
+static PyObject *
+func_read_dir(PyObject *self, PyObject *args) {
+  const char* path;
+  if (!PyArg_ParseTuple(args, "s", &path)) {
+    return NULL;
+  }
+
+  DIR* dir = opendir(path);
+  if (dir == NULL) {
+    Py_RETURN_NONE;
+  }
+
+  PyObject* names = PyList_New(0);
+  PyObject* dirs = PyList_New(0);
+  if (names == NULL || dirs == NULL) {
+    goto error;
+  }
+
+  struct dirent* entry;
+  while ((entry = readdir(dir)) != NULL) {
+    const char* name = entry->d_name;
+    PyObject* s = PyString_FromString(name);
+    if (s == NULL || PyList_Append(names, s) < 0) {
+      Py_XDECREF(s);
+      goto error;
+    }
+
+    int is_dir = 0;
+    if (strcmp(name, ".") != 0 && strcmp(name, "..") != 0) {
+#ifdef _DIRENT_HAVE_D_TYPE
+      if (entry->d_type == DT_DIR) {
+        is_dir = 1;
+      } else if (entry->d_type == DT_UNKNOWN) {
+#else
+      {
+#endif
+        // Some file systems don't fill in d_type
+        struct stat st;
+        if (fstatat(dirfd(dir), name, &st, AT_SYMLINK_NOFOLLOW) == 0) {
+          is_dir = S_ISDIR(st.st_mode);
+        }
+      }
+    }
+    if (is_dir && PyList_Append(dirs, s) < 0) {
+      Py_DECREF(s);
+      goto error;
+    }
+    Py_DECREF(s);
+  }
+  closedir(dir);
+
+  return Py_BuildValue("(NN)", names, dirs);
+
+error:
+  closedir(dir);
+  Py_XDECREF(names);
+  Py_XDECREF(dirs);
+  return NULL;
+}
+
+// Return the mtime of a directory in nanoseconds, or -1 if the path isn't a
+// directory.  Symlinks are followed.
+static PyObject *
+func_dir_mtime(PyObject *self, PyObject *args) {
+  const char* path;
+  if (!PyArg_ParseTuple(args, "s", &path)) {
+    return NULL;
+  }
+
+  struct stat st;
+  if (stat(path, &st) != 0 || !S_ISDIR(st.st_mode)) {
+    return PyInt_FromLong(-1);
+  }
+#ifdef __APPLE__
+  struct timespec mtime = st.st_mtimespec;
+#else
+  struct timespec mtime = st.st_mtim;
+#endif
+  return PyLong_FromLongLong(
+      (long long)mtime.tv_sec * 1000000000LL + mtime.tv_nsec);
+}
+
+// Return the names that match a pattern for one path component, the same way
+// glob() matches them.  In particular, a leading . must be matched explicitly.
+static PyObject *
+func_glob_filter(PyObject *self, PyObject *args) {
+  const char* pattern;
+  PyObject* names;
+  if (!PyArg_ParseTuple(args, "sO!", &pattern, &PyList_Type, &names)) {
+    return NULL;
+  }
+
+  PyObject* matches = PyList_New(0);
+  if (matches == NULL) {
+    return NULL;
+  }
+
+  Py_ssize_t n = PyList_GET_SIZE(names);
+  Py_ssize_t i;
+  for (i = 0; i < n; ++i) {
+    PyObject* item = PyList_GET_ITEM(names, i);
+    const char* name = PyString_AsString(item);
+    if (name == NULL) {
+      Py_DECREF(matches);
+      return NULL;
+    }
+    if (fnmatch(pattern, name, FNM_PERIOD) == 0 &&
+        PyList_Append(matches, item) < 0) {
+      Py_DECREF(matches);
+      return NULL;
+    }
+  }
+  return matches;
+}
+
+// The LC_CTYPE locale from the environment, created once per process.
+//
+// We used to call setlocale(LC_CTYPE, "") and then restore the old locale on
+// every call, which reloads locale data each time.  uselocale() just swaps a
+// per-thread pointer.
+static locale_t user_ctype_locale = (locale_t) 0;
+
+// Switch to the user's LC_CTYPE locale.  Returns the previous locale, which
+// must be passed to uselocale() when done, or (locale_t) 0 with a Python
+// exception set.
+static locale_t enter_user_locale(void) {
+  if (user_ctype_locale == (locale_t) 0) {
+    user_ctype_locale = newlocale(LC_CTYPE_MASK, "", (locale_t) 0);
+    if (user_ctype_locale == (locale_t) 0) {
+      PyErr_SetString(PyExc_SystemError, "Invalid locale for LC_CTYPE");
+      return (locale_t) 0;
+    }
+  }
+  locale_t old = uselocale(user_ctype_locale);
+  if (old == (locale_t) 0) {
+    PyErr_SetString(PyExc_SystemError, "Invalid locale for LC_CTYPE");
+  }
+  return old;
+}
+
+// A bounded LRU cache of compiled regexes.  ${x//pat/replace} and [[ $x =~ pat ]]
+// in a loop usually use the same few patterns, and regcomp() is expensive
+// compared to regexec() on short strings.
+//
+// The key is the pattern, the regcomp() flags, and whether it was compiled in
+// the user's locale, since that changes how multibyte chars are handled.
+
+#define REGEX_CACHE_SIZE 32
+
+typedef struct {
+  char *pattern;  // owned; NULL if the slot is unused
+  int cflags;
+  int user_locale;
+  unsigned long last_used;
+  regex_t re;
+} regex_cache_entry;
+
+static regex_cache_entry regex_cache[REGEX_CACHE_SIZE];
+static unsigned long regex_cache_clock = 0;
+
+// Return a compiled regex owned by the cache.  If regcomp() fails, return NULL
+// and store its error code in *err.  The caller must already be in the right
+// locale.
+static regex_t *regex_cache_get(const char *pattern, int cflags,
+                                int user_locale, int *err) {
+  regex_cache_clock++;
+
+  int i;
+  int victim = 0;
+  for (i = 0; i < REGEX_CACHE_SIZE; ++i) {
+    regex_cache_entry *e = &regex_cache[i];
+    if (e->pattern == NULL) {
+      victim = i;  // prefer an empty slot
+      break;
+    }
+    if (e->cflags == cflags && e->user_locale == user_locale &&
+        strcmp(e->pattern, pattern) == 0) {
+      e->last_used = regex_cache_clock;
+      return &e->re;
+    }
+    if (e->last_used < regex_cache[victim].last_used) {
+      victim = i;
+    }
+  }
+
+  regex_t re;
+  int ret = regcomp(&re, pattern, cflags);
+  if (ret != 0) {
+    *err = ret;  // don't cache invalid patterns
+    return NULL;
+  }
+
+  char *copy = strdup(pattern);
+  if (copy == NULL) {
+    regfree(&re);
+    *err = REG_ESPACE;
+    return NULL;
+  }
+
+  // Evict the least recently used entry
+  regex_cache_entry *e = &regex_cache[victim];
+  if (e->pattern != NULL) {
+    debug("regex cache: evicting %s", e->pattern);
+    free(e->pattern);
+    regfree(&e->re);
+  }
+  e->pattern = copy;
+  e->cflags = cflags;
+  e->user_locale = user_locale;
+  e->last_used = regex_cache_clock;
+  e->re = re;
+  return &e->re;
+}
+
 static PyObject *
 func_regex_parse(PyObject *self, PyObject *args) {
   const char* pattern;
@@ -268,24 +494,24 @@ func_regex_match(PyObject *self, PyObject *args) {
     return NULL;
   }
 
-  regex_t pat;
-  if (regcomp(&pat, pattern, REG_EXTENDED) != 0) {
+  int err;
+  regex_t *pat = regex_cache_get(pattern, REG_EXTENDED, 0, &err);
+  if (pat == NULL) {
     // When the regex contains a variable, it can't be checked at compile-time.
     PyErr_SetString(PyExc_RuntimeError, "Invalid regex syntax (func_regex_match)");
     return NULL;
   }
 
-  int outlen = pat.re_nsub + 1;
+  int outlen = pat->re_nsub + 1;
   PyObject *ret = PyList_New(outlen);
 
   if (ret == NULL) {
-    regfree(&pat);
     return NULL;
   }
 
   int match;
   regmatch_t *pmatch = (regmatch_t*) malloc(sizeof(regmatch_t) * outlen);
-  if (match = (regexec(&pat, str, outlen, pmatch, 0) == 0)) {
+  if ((match = (regexec(pat, str, outlen, pmatch, 0) == 0))) {
     int i;
     for (i = 0; i < outlen; i++) {
       int len = pmatch[i].rm_eo - pmatch[i].rm_so;
@@ -295,9 +521,9 @@ func_regex_match(PyObject *self, PyObject *args) {
   }
 
   free(pmatch);
-  regfree(&pat);
 
   if (!match) {
+    Py_DECREF(ret);
     Py_RETURN_NONE;
   }
 
@@ -320,20 +546,20 @@ func_regex_first_group_match(PyObject *self, PyObject *args) {
     return NULL;
   }
 
-  regex_t pat;
   regmatch_t m[NMATCH];
 
-  const char *old_locale = setlocale(LC_CTYPE, NULL);
-
-  if (setlocale(LC_CTYPE, "") == NULL) {
-	  PyErr_SetString(PyExc_SystemError, "Invalid locale for LC_CTYPE");
-	  return NULL;
+  locale_t old_locale = enter_user_locale();
+  if (old_locale == (locale_t) 0) {
+    return NULL;
   }
 
   // Could have been checked by regex_parse for [[ =~ ]], but not for glob
   // patterns like ${foo/x*/y}.
 
-  if (regcomp(&pat, pattern, REG_EXTENDED) != 0) {
+  int err;
+  regex_t *pat = regex_cache_get(pattern, REG_EXTENDED, 1, &err);
+  if (pat == NULL) {
+    uselocale(old_locale);
     PyErr_SetString(PyExc_RuntimeError,
                     "Invalid regex syntax (func_regex_first_group_match)");
     return NULL;
@@ -342,10 +568,9 @@ func_regex_first_group_match(PyObject *self, PyObject *args) {
   debug("first_group_match pat %s str %s pos %d", pattern, str, pos);
 
   // Match at offset 'pos'
-  int result = regexec(&pat, str + pos, NMATCH, m, 0 /*flags*/);
-  regfree(&pat);
+  int result = regexec(pat, str + pos, NMATCH, m, 0 /*flags*/);
 
-  setlocale(LC_CTYPE, old_locale);
+  uselocale(old_locale);
 
   if (result != 0) {
     Py_RETURN_NONE;  // no match
@@ -357,6 +582,273 @@ func_regex_first_group_match(PyObject *self, PyObject *args) {
   return Py_BuildValue("(i,i)", pos + start, pos + end);
 }
 
+// Like calling regex_first_group_match() in a loop, advancing to the end of
+// each match, but the regex is compiled once and we only cross from Python
+// into C once.  Used for ${x//pat/replace}.
+static PyObject *
+func_regex_all_group_matches(PyObject *self, PyObject *args) {
+  const char* pattern;
+  const char* str;
+  if (!PyArg_ParseTuple(args, "ss", &pattern, &str)) {
+    return NULL;
+  }
+  int n = strlen(str);
+
+  regmatch_t m[NMATCH];
+
+  locale_t old_locale = enter_user_locale();
+  if (old_locale == (locale_t) 0) {
+    return NULL;
+  }
+
+  int err;
+  regex_t *pat = regex_cache_get(pattern, REG_EXTENDED, 1, &err);
+  if (pat == NULL) {
+    uselocale(old_locale);
+    PyErr_SetString(PyExc_RuntimeError,
+                    "Invalid regex syntax (func_regex_all_group_matches)");
+    return NULL;
+  }
+
+  PyObject *matches = PyList_New(0);
+  if (matches == NULL) {
+    uselocale(old_locale);
+    return NULL;
+  }
+
+  int pos = 0;
+  while (pos < n) {  // needed to prevent infinite loop in (.*) case
+    if (regexec(pat, str + pos, NMATCH, m, 0 /*flags*/) != 0) {
+      break;  // no more matches
+    }
+    int start = pos + m[1].rm_so;
+    int end = pos + m[1].rm_eo;
+
+    PyObject *span = Py_BuildValue("(i,i)", start, end);
+    if (span == NULL || PyList_Append(matches, span) < 0) {
+      Py_XDECREF(span);
+      Py_DECREF(matches);
+      uselocale(old_locale);
+      return NULL;
+    }
+    Py_DECREF(span);
+
+    // Advance past the match.  An empty match doesn't make progress, so skip
+    // a byte instead of looping forever.
+    pos = (end > pos) ? end : pos + 1;
+  }
+
+  uselocale(old_locale);
+  return matches;
+}
+
+// Only cut strings between characters.  In a multibyte locale, assume UTF-8
+// like osh/string_ops.py does.
+static int is_char_start(const char *s, int i, int multibyte) {
+  return !multibyte || (s[i] & 0xC0) != 0x80;  // not a continuation byte
+}
+
+// Return the start of a char in [lo, hi), preferring one at or after mid, or
+// -1 if there is none.
+static int find_char_start(const char *s, int lo, int mid, int hi,
+                           int multibyte) {
+  int i;
+  for (i = mid; i < hi; ++i) {
+    if (is_char_start(s, i, multibyte)) {
+      return i;
+    }
+  }
+  for (i = mid - 1; i >= lo; --i) {
+    if (is_char_start(s, i, multibyte)) {
+      return i;
+    }
+  }
+  return -1;
+}
+
+// Return a malloc()'d copy of regex with the given prefix and suffix.
+static char *surround_regex(const char *prefix, const char *regex,
+                            const char *suffix) {
+  size_t len = strlen(prefix) + strlen(regex) + strlen(suffix) + 1;
+  char *buf = (char *) malloc(len);
+  if (buf != NULL) {
+    snprintf(buf, len, "%s%s%s", prefix, regex, suffix);
+  }
+  return buf;
+}
+
+// For ${x#pat} and family, after pat is translated to an ERE.  Returns where
+// to cut the string: the end of the matching prefix, the start of the matching
+// suffix, or -1 if there's no match.
+//
+// regexec() finds the leftmost-longest match, so the longest prefix (^(re))
+// or suffix ((re)$) takes one call, which also fails early if nothing matches.
+//
+// For the shortest prefix, note that "some prefix of s[0:j] matches" is false
+// and then true as j increases, and ^(re) on s[0:j] tests it.  So we binary
+// search for the first true position, which is where the shortest prefix ends.
+// Likewise for the shortest suffix with (re)$ on s[i:n].  That's O(log n)
+// calls, without copying a substring for each position.
+static PyObject *
+func_regex_strip_pos(PyObject *self, PyObject *args) {
+  const char* regex;
+  const char* str;
+  int from_end, longest;
+  if (!PyArg_ParseTuple(args, "ssii", &regex, &str, &from_end, &longest)) {
+    return NULL;
+  }
+  int n = strlen(str);
+
+  char *pattern = from_end ? surround_regex("(", regex, ")$")
+                           : surround_regex("^(", regex, ")");
+  if (pattern == NULL) {
+    return PyErr_NoMemory();
+  }
+
+  locale_t old_locale = enter_user_locale();
+  if (old_locale == (locale_t) 0) {
+    free(pattern);
+    return NULL;
+  }
+
+  int err;
+  regex_t *pat = regex_cache_get(pattern, REG_EXTENDED, 1, &err);
+  free(pattern);
+  if (pat == NULL) {
+    uselocale(old_locale);
+    PyErr_SetString(PyExc_RuntimeError,
+                    "Invalid regex syntax (func_regex_strip_pos)");
+    return NULL;
+  }
+
+  int multibyte = MB_CUR_MAX > 1;  // in the user's locale
+
+  regmatch_t m[1];
+  int pos = -1;
+  if (regexec(pat, str, 1, m, 0 /*flags*/) != 0) {
+    ;  // no match
+  } else if (longest) {
+    pos = from_end ? m[0].rm_so : m[0].rm_eo;
+  } else if (from_end) {
+    // Find the last start position i where s[i:n] contains a match.
+    int lo = m[0].rm_so;  // true
+    int hi = n;  // positions after hi are false
+    while (lo < hi) {
+      int i = find_char_start(str, lo + 1, lo + (hi - lo + 1) / 2, hi + 1,
+                              multibyte);
+      if (i == -1) {
+        break;
+      }
+      if (regexec(pat, str + i, 1, m, 0) == 0) {
+        lo = i;
+      } else {
+        hi = i - 1;
+      }
+    }
+    pos = lo;
+  } else {
+    // Find the first end position j where s[0:j] contains a match.  Copy the
+    // longest prefix so it can be terminated at j.
+    int lo = 0;  // positions before lo are false
+    int hi = m[0].rm_eo;  // true
+    char *buf = (char *) malloc(hi + 1);
+    if (buf == NULL) {
+      uselocale(old_locale);
+      return PyErr_NoMemory();
+    }
+    memcpy(buf, str, hi);
+    buf[hi] = '\0';
+
+    while (lo < hi) {
+      int j = find_char_start(str, lo, lo + (hi - lo) / 2, hi, multibyte);
+      if (j == -1) {
+        break;
+      }
+      char c = buf[j];
+      buf[j] = '\0';
+      int result = regexec(pat, buf, 1, m, 0);
+      buf[j] = c;
+      if (result == 0) {
+        hi = j;
+      } else {
+        lo = j + 1;
+      }
+    }
+    free(buf);
+    pos = hi;
+  }
+
+  uselocale(old_locale);
+  return PyInt_FromLong(pos);
+}
+
+// Error codes for invalid UTF-8, which osh/string_ops.py turns into messages.
+#define UTF8_INCOMPLETE_CHAR -1
+#define UTF8_INVALID_CONT -2
+#define UTF8_INVALID_START -3
+
+// Advance over at most max_chars UTF-8 chars of s[*pos:n], validating them in
+// the same order as _NextUtf8Char() in osh/string_ops.py.  Returns the number
+// of chars, or a negative error code.  *pos is left after the last char.
+static int utf8_scan(const unsigned char *s, int n, int *pos, int max_chars) {
+  int i = *pos;
+  int num_chars = 0;
+  while (i < n && num_chars != max_chars) {
+    unsigned char c = s[i];
+    int len;
+    if (c < 0x80) {
+      len = 1;
+    } else if ((c >> 5) == 0x6) {
+      len = 2;
+    } else if ((c >> 4) == 0xE) {
+      len = 3;
+    } else if ((c >> 3) == 0x1E) {
+      len = 4;
+    } else {
+      return UTF8_INVALID_START;
+    }
+    int j;
+    for (j = i + 1; j < i + len; ++j) {
+      if (j >= n) {
+        return UTF8_INCOMPLETE_CHAR;
+      }
+      if ((s[j] >> 6) != 0x2) {
+        return UTF8_INVALID_CONT;
+      }
+    }
+    i += len;
+    num_chars++;
+  }
+  *pos = i;
+  return num_chars;
+}
+
+static PyObject *
+func_utf8_count(PyObject *self, PyObject *args) {
+  const char *str;
+  int n;
+  if (!PyArg_ParseTuple(args, "s#", &str, &n)) {
+    return NULL;
+  }
+  int pos = 0;
+  return PyInt_FromLong(utf8_scan((const unsigned char *) str, n, &pos, -1));
+}
+
+static PyObject *
+func_utf8_advance(PyObject *self, PyObject *args) {
+  const char *str;
+  int n, num_chars, pos;
+  if (!PyArg_ParseTuple(args, "s#ii", &str, &n, &num_chars, &pos)) {
+    return NULL;
+  }
+  if (num_chars < 0 || pos < 0) {
+    PyErr_SetString(PyExc_ValueError, "Expected non-negative arguments");
+    return NULL;
+  }
+  int result = utf8_scan((const unsigned char *) str, n, &pos, num_chars);
+  return PyInt_FromLong(result < 0 ? result : pos);
+}
+
 // We do this in C so we can remove '%f' % 0.1 from the CPython build.  That
 // involves dtoa.c and pystrod.c, which are thousands of lines of code.
 static PyObject *
@@ -442,6 +934,16 @@ static PyMethodDef methods[] = {
   // We need this since Python's glob doesn't have char classes.
   {"glob", func_glob, METH_VARARGS, ""},
 
+  // For walking directories in osh/glob_.py.  Return a tuple of all entry
+  // names and subdirectory names, or None if the directory can't be read.
+  {"read_dir", func_read_dir, METH_VARARGS, ""},
+
+  // Return the mtime of a directory in nanoseconds, or -1 if it's not one.
+  {"dir_mtime", func_dir_mtime, METH_VARARGS, ""},
+
+  // Return the names that match a glob pattern for one path component.
+  {"glob_filter", func_glob_filter, METH_VARARGS, ""},
+
   // Compile a regex in ERE syntax, returning whether it is valid
   {"regex_parse", func_regex_parse, METH_VARARGS, ""},
 
@@ -454,6 +956,25 @@ static PyMethodDef methods[] = {
   // the regex is invalid.
   {"regex_first_group_match", func_regex_first_group_match, METH_VARARGS, ""},
 
+  // Return a list of the (start, end) positions of the first group in every
+  // non-overlapping match of the regex.  Raises RuntimeError if the regex is
+  // invalid.
+  {"regex_all_group_matches", func_regex_all_group_matches, METH_VARARGS, ""},
+
+  // For ${x#pat} and family.  Return where to cut the string so a prefix or
+  // suffix matching the regex is removed, or -1 if there's no match.  Raises
+  // RuntimeError if the regex is invalid.
+  {"regex_strip_pos", func_regex_strip_pos, METH_VARARGS, ""},
+
+  // Return the number of UTF-8 chars in a string, or a negative error code if
+  // it's invalid.
+  {"utf8_count", func_utf8_count, METH_VARARGS, ""},
+
+  // Return the byte offset after advancing a number of UTF-8 chars from a byte
+  // offset, stopping at the end of the string.  Returns a negative error code
+  // if a char is invalid.
+  {"utf8_advance", func_utf8_advance, METH_VARARGS, ""},
+
   // "Print three floating point values for the 'time' builtin.
   {"print_time", func_print_time, METH_VARARGS, ""},
 
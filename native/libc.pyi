@@ -2,9 +2,16 @@ from typing import List, Optional, Tuple
 
 def gethostname() -> str: ...
 def glob(pat: str) -> List[str]: ...
+def read_dir(path: str) -> Optional[Tuple[List[str], List[str]]]: ...
+def dir_mtime(path: str) -> int: ...
+def glob_filter(pat: str, names: List[str]) -> List[str]: ...
 def fnmatch(pat: str, s: str) -> bool: ...
 def regex_first_group_match(regex: str, s: str, pos: int) -> Optional[Tuple[int, int]]: ...
+def regex_all_group_matches(regex: str, s: str) -> List[Tuple[int, int]]: ...
+def regex_strip_pos(regex: str, s: str, from_end: bool, longest: bool) -> int: ...
 def regex_match(regex: str, s: str) -> List[str]: ...
+def utf8_count(s: str) -> int: ...
+def utf8_advance(s: str, num_chars: int, byte_offset: int) -> int: ...
 def wcswidth(s: str) -> int: ...
 def get_terminal_width() -> int: ...
 def print_time(real: float, user: float, sys: float) -> None: ...
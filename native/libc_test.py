@@ -119,6 +119,26 @@ class LibcTest(unittest.TestCase):
     print(libc.glob('\\\\'))
     print(libc.glob('[[:punct:]]'))
 
+  def testReadDir(self):
+    names, dirs = libc.read_dir('native')
+    self.assert_('.' in names)
+    self.assert_('libc.c' in names)
+    self.assertEqual([], dirs)
+    self.assert_('native' in libc.read_dir('.')[1])
+    self.assertEqual(None, libc.read_dir('_nonexistent'))
+
+    self.assert_(libc.dir_mtime('native') > 0)
+    self.assertEqual(-1, libc.dir_mtime('native/libc.c'))
+    self.assertEqual(-1, libc.dir_mtime('_nonexistent'))
+
+  def testGlobFilter(self):
+    names = ['.', '..', '.hidden', 'a.py', 'b.c', 'x*']
+    self.assertEqual(['a.py', 'b.c', 'x*'], libc.glob_filter('*', names))
+    self.assertEqual(['.', '..', '.hidden'], libc.glob_filter('.*', names))
+    self.assertEqual(['a.py'], libc.glob_filter('[a-z].py', names))
+    self.assertEqual(['x*'], libc.glob_filter('x\\*', names))
+    self.assertEqual([], libc.glob_filter('?hidden', names))
+
   def testRegexParse(self):
     self.assertEqual(True, libc.regex_parse(r'.*\.py'))
 
@@ -169,6 +189,89 @@ class LibcTest(unittest.TestCase):
     self.assertRaises(
         RuntimeError, libc.regex_first_group_match, r'*', 'abcd', 0)
 
+  def testRegexAllGroupMatches(self):
+    s='oXooXoooXoX'
+    self.assertEqual(
+        [(1, 3), (4, 6), (8, 10)],
+        libc.regex_all_group_matches('(X.)', s))
+
+    self.assertEqual([], libc.regex_all_group_matches('(Y)', s))
+    self.assertEqual([], libc.regex_all_group_matches('(X)', ''))
+
+    # (.*) consumes the rest of the string
+    self.assertEqual([(0, 11)], libc.regex_all_group_matches('(.*)', s))
+
+    # Empty matches don't loop forever
+    self.assertEqual(
+        [(0, 0), (1, 1), (2, 2)],
+        libc.regex_all_group_matches('(Y*)', 'abc'))
+
+    # Same result as calling regex_first_group_match() in a loop
+    s = 'ab' * 1000
+    matches = libc.regex_all_group_matches('(b)', s)
+    self.assertEqual(1000, len(matches))
+    self.assertEqual((1999, 2000), matches[-1])
+
+    self.assertRaises(
+        RuntimeError, libc.regex_all_group_matches, r'*', 'abcd')
+
+  def testRegexStripPos(self):
+    s = 'a/b/c.tar.gz'
+    # (regex, from_end, longest, expected)
+    CASES = [
+        ('.*/', False, False, 2),  # ${s#*/}
+        ('.*/', False, True, 4),  # ${s##*/}
+        (r'\..*', True, False, 9),  # ${s%.*}
+        (r'\..*', True, True, 5),  # ${s%%.*}
+        ('x', False, False, -1),
+        ('x', True, True, -1),
+        ('.*', False, False, 0),
+        ('.*', True, False, 12),
+    ]
+    for regex, from_end, longest, expected in CASES:
+      self.assertEqual(
+          expected, libc.regex_strip_pos(regex, s, from_end, longest),
+          (regex, from_end, longest))
+
+    # Same as the longest match when there's only one
+    s = '/'.join(str(i) for i in xrange(1000))
+    self.assertEqual(len(s), libc.regex_strip_pos('.*999', s, False, False))
+    self.assertEqual(0, libc.regex_strip_pos('0/1/.*', s, True, False))
+
+    self.assertRaises(
+        RuntimeError, libc.regex_strip_pos, r'*', 'abcd', False, False)
+
+  def testUtf8(self):
+    s = 'a\xce\xbcb'
+    self.assertEqual(3, libc.utf8_count(s))
+    self.assertEqual(0, libc.utf8_count(''))
+    self.assertEqual(3, libc.utf8_advance(s, 2, 0))
+    self.assertEqual(4, libc.utf8_advance(s, 1, 3))
+    self.assertEqual(4, libc.utf8_advance(s, 10, 0))  # stops at the end
+    self.assertEqual(1, libc.utf8_advance(s, 0, 1))
+
+    # Error codes
+    self.assertEqual(-1, libc.utf8_count('a\xce'))  # incomplete
+    self.assertEqual(-2, libc.utf8_count('\xcea'))  # invalid continuation
+    self.assertEqual(-3, libc.utf8_count('a\xff'))  # invalid start
+    self.assertEqual(1, libc.utf8_advance('a\xff', 1, 0))  # not reached
+    self.assertEqual(-3, libc.utf8_advance('a\xff', 2, 0))
+
+  def testRegexCache(self):
+    # More distinct patterns than cache slots, so entries are evicted and
+    # recompiled.  Results must not depend on what's cached.
+    for _ in xrange(3):
+      for i in xrange(100):
+        pat = '(x{%d})' % (i + 1)
+        s = 'x' * (i + 1)
+        self.assertEqual((0, i + 1), libc.regex_first_group_match(pat, s, 0))
+        self.assertEqual(None, libc.regex_first_group_match(pat, s[1:], 0))
+        self.assertEqual([s, s], libc.regex_match(pat, s))
+
+    # Invalid patterns aren't cached
+    for _ in xrange(2):
+      self.assertRaises(RuntimeError, libc.regex_match, r'*', 'abcd')
+
   def testRegexFirstGroupMatchError(self):
     # Helping to debug issue #291
     s = ''
@@ -97,6 +97,7 @@ class statvfs_result(object):
 
 def _exit(status: int) -> None: ...
 def abort() -> None: ...
+def accept(fd: int) -> int: ...
 def access(path: unicode, mode: int) -> bool: ...
 def chdir(path: unicode) -> None: ...
 def chmod(path: unicode, mode: int) -> None: ...
@@ -135,6 +136,7 @@ def getgroups() -> List[int]: ...
 def getloadavg() -> Tuple[float, float, float]:
     raise OSError()
 def getlogin() -> str: ...
+def getpeereid(fd: int) -> Tuple[int, int]: ...
 def getpgid(pid: int) -> int: ...
 def getpgrp() -> int: ...
 def getpid() -> int: ...
@@ -151,7 +153,7 @@ def lchown(path: unicode, uid: int, gid: int) -> None: ...
 def link(source: unicode, link_name: str) -> None: ...
 _T = TypeVar("_T")
 def listdir(path: _T) -> List[_T]: ...
-def lseek(fd: int, pos: int, how: int) -> None: ...
+def lseek(fd: int, pos: int, how: int) -> int: ...
 def lstat(path: unicode) -> stat_result: ...
 def major(device: int) -> int: ...
 def makedev(major: int, minor: int) -> int: ...
@@ -167,10 +169,13 @@ def pipe() -> Tuple[int, int]: ...
 def popen(command: str, mode: str = ..., bufsize: int = ...) -> IO[str]: ...
 def putenv(varname: str, value: str) -> None: ...
 def read(fd: int, n: int) -> str: ...
+def read_all(fd: int, max_bytes: int, strip_newlines: bool) -> Optional[str]: ...
 def readlink(path: _T) -> _T: ...
+def recv_fds(fd: int, max_bytes: int) -> Tuple[str, List[int]]: ...
 def remove(path: unicode) -> None: ...
 def rename(src: unicode, dst: unicode) -> None: ...
 def rmdir(path: unicode) -> None: ...
+def send_fds(fd: int, data: str, fds: List[int]) -> int: ...
 def setegid(egid: int) -> None: ...
 def seteuid(euid: int) -> None: ...
 def setgid(gid: int) -> None: ...
@@ -183,6 +188,7 @@ def setresuid(ruid: int, euid: int, suid: int) -> None: ...
 def setreuid(ruid: int, euid: int) -> None: ...
 def setsid() -> None: ...
 def setuid(pid: int) -> None: ...
+def spawn(path: str, args: List[str], env: Dict[str, str], sigdef: List[int]) -> int: ...
 def stat(path: unicode) -> stat_result: ...
 def statvfs(path: unicode) -> statvfs_result: ...
 def stat_float_times(fd: int) -> None: ...
@@ -197,6 +203,8 @@ def tmpfile() -> IO[str]: ...
 def ttyname(fd: int) -> str: ...
 def umask(mask: int) -> int: ...
 def uname() -> Tuple[str, str, str, str, str]: ...
+def unix_connect(path: str) -> int: ...
+def unix_listen(path: str, backlog: int) -> int: ...
 def unlink(path: unicode) -> None: ...
 def unsetenv(varname: str) -> None: ...
 def urandom(n: int) -> str: ...
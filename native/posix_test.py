@@ -28,6 +28,7 @@ Other notes:
 """
 from __future__ import print_function
 
+import errno
 import signal
 import subprocess
 import unittest
@@ -52,6 +53,7 @@ FUNCS = [
     "execv",
     "execve",
     "fork",
+    "spawn",
     "geteuid",
     "getpid",
     "getuid",
@@ -59,12 +61,21 @@ FUNCS = [
     "open",
     "close",
     "dup2",
+    "lseek",
     "read",
+    "read_all",
     "write",
     "fdopen",
+    "fstat",
     "isatty",
     "pipe",
     "strerror",
+    "unix_listen",
+    "unix_connect",
+    "accept",
+    "getpeereid",
+    "send_fds",
+    "recv_fds",
     "WIFSIGNALED",
     "WIFEXITED",
     "WEXITSTATUS",
@@ -101,6 +112,108 @@ class PosixTest(unittest.TestCase):
     posix_.read(0, 0)
     posix_.write(1, '')
 
+  def testLseekAndFstat(self):
+    PATH = '_tmp/posix-lseek.txt'
+    with open(PATH, 'w') as f:
+      f.write('0123456789')
+
+    fd = posix_.open(PATH, posix_.O_RDONLY)
+    try:
+      self.assertEqual(10, posix_.fstat(fd).st_size)
+      self.assertEqual('0123', posix_.read(fd, 4))
+      # Seek back relative to the current position (SEEK_CUR)
+      self.assertEqual(2, posix_.lseek(fd, -2, 1))
+      self.assertEqual('23', posix_.read(fd, 2))
+    finally:
+      posix_.close(fd)
+
+    r, w = posix_.pipe()
+    try:
+      self.assertRaises(OSError, posix_.lseek, r, 0, 1)
+    finally:
+      posix_.close(r)
+      posix_.close(w)
+
+  def testReadAll(self):
+    PATH = '_tmp/posix-read-all.txt'
+    big = 'x' * 100000  # several times the initial buffer
+    with open(PATH, 'w') as f:
+      f.write(big + '\n\n')
+
+    fd = posix_.open(PATH, posix_.O_RDONLY)
+    try:
+      self.assertEqual(big + '\n\n', posix_.read_all(fd, 0, False))
+      self.assertEqual('', posix_.read_all(fd, 0, False))  # at EOF
+      posix_.lseek(fd, 0, 0)
+      self.assertEqual(big, posix_.read_all(fd, 0, True))
+      # Limits
+      posix_.lseek(fd, 0, 0)
+      self.assertEqual(None, posix_.read_all(fd, 1000, True))
+      posix_.lseek(fd, 0, 0)
+      self.assertEqual(big, posix_.read_all(fd, len(big) + 2, True))
+      posix_.lseek(fd, 0, 0)
+      self.assertEqual(None, posix_.read_all(fd, len(big) + 1, True))
+    finally:
+      posix_.close(fd)
+
+    r, w = posix_.pipe()
+    posix_.write(w, 'a\nb\n')
+    posix_.close(w)
+    self.assertEqual('a\nb', posix_.read_all(r, 0, True))
+    posix_.close(r)
+
+  def testSpawn(self):
+    pid = posix_.spawn('/bin/sh', ['sh', '-c', 'exit $X'], {'X': '42'},
+                       [signal.SIGPIPE])
+    _, status = posix_.waitpid(pid, 0)
+    self.assertEqual(42, posix_.WEXITSTATUS(status))
+
+    # Exec errors are raised in the parent
+    try:
+      posix_.spawn('/nonexistent', ['x'], {}, [])
+    except OSError as e:
+      self.assertEqual(errno.ENOENT, e.errno)
+    else:
+      self.fail('Expected OSError')
+
+  def testUnixSocketFds(self):
+    path = '_tmp/posix-test.sock'
+    try:
+      posix_.unlink(path)
+    except OSError:
+      pass
+    listen_fd = posix_.unix_listen(path, 5)
+    try:
+      client = posix_.unix_connect(path)
+      server = posix_.accept(listen_fd)
+
+      ids = (posix_.geteuid(), posix_.getegid())
+      self.assertEqual(ids, posix_.getpeereid(client))
+      self.assertEqual(ids, posix_.getpeereid(server))
+
+      r, w = posix_.pipe()
+      self.assertEqual(2, posix_.send_fds(client, 'hi', [w]))
+      posix_.close(w)
+      data, fds = posix_.recv_fds(server, 100)
+      self.assertEqual('hi', data)
+      self.assertEqual(1, len(fds))
+
+      # The received descriptor is the write end of the same pipe
+      posix_.write(fds[0], 'via fd')
+      posix_.close(fds[0])
+      self.assertEqual('via fd', posix_.read(r, 100))
+      posix_.close(r)
+
+      self.assertRaises(ValueError, posix_.send_fds, client, '', [0])
+      posix_.close(client)
+      self.assertEqual(('', []), posix_.recv_fds(server, 100))  # EOF
+      posix_.close(server)
+    finally:
+      posix_.close(listen_fd)
+      posix_.unlink(path)
+
+    self.assertRaises(OSError, posix_.unix_connect, path)
+
   def testRead(self):
     if posix_.environ.get('EINTR_TEST'):
       # Now we can do kill -TERM PID can get EINTR.
@@ -1287,6 +1287,141 @@ posix_execve(PyObject *self, PyObject *args)
 }
 #endif /* HAVE_EXECV */
 
+#ifdef HAVE_EXECV
+#include <spawn.h>
+
+PyDoc_STRVAR_remove(posix_spawn__doc__,
+"spawn(path, args, env, sigdef) -> pid\n\n\
+Start a program with posix_spawn(), which doesn't copy the page tables\n\
+of this process like fork() does.\n\
+\n\
+    path: path of executable file\n\
+    args: list of arguments\n\
+    env: dictionary of strings mapping to strings\n\
+    sigdef: list of signals to reset to SIG_DFL in the child");
+
+/* OVM_MAIN patch: for external commands.  Unlike fork() and then exec(), an
+ * exec error like ENOENT or ENOEXEC is raised as an OSError in the parent. */
+static PyObject *
+posix_spawn_(PyObject *self, PyObject *args)
+{
+    char *path;
+    PyObject *argv, *env, *sigdef;
+    char **argvlist = NULL;
+    char **envlist = NULL;
+    PyObject *key, *val, *keys = NULL, *vals = NULL;
+    Py_ssize_t i, argc, envc = 0, lastarg = 0;
+    posix_spawnattr_t attr;
+    sigset_t sigs;
+    pid_t pid;
+    int err, attr_ok = 0;
+    PyObject *result = NULL;
+
+    if (!PyArg_ParseTuple(args, "etO!O!O!:spawn",
+                          Py_FileSystemDefaultEncoding, &path,
+                          &PyList_Type, &argv, &PyDict_Type, &env,
+                          &PyList_Type, &sigdef))
+        return NULL;
+
+    argc = PyList_Size(argv);
+    argvlist = PyMem_NEW(char *, argc + 1);
+    if (argvlist == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    for (i = 0; i < argc; i++) {
+        if (!PyArg_Parse(PyList_GetItem(argv, i),
+                         "et;spawn() arg 2 must contain only strings",
+                         Py_FileSystemDefaultEncoding,
+                         &argvlist[i])) {
+            lastarg = i;
+            goto done;
+        }
+    }
+    lastarg = argc;
+    argvlist[argc] = NULL;
+
+    envlist = PyMem_NEW(char *, PyDict_Size(env) + 1);
+    if (envlist == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    keys = PyDict_Keys(env);
+    vals = PyDict_Values(env);
+    if (!keys || !vals)
+        goto done;
+    for (i = 0; i < PyList_Size(keys); i++) {
+        char *p, *k, *v;
+        size_t len;
+
+        key = PyList_GetItem(keys, i);
+        val = PyList_GetItem(vals, i);
+        if (!PyArg_Parse(key, "s;spawn() arg 3 contains a non-string key",
+                         &k) ||
+            !PyArg_Parse(val, "s;spawn() arg 3 contains a non-string value",
+                         &v))
+            goto done;
+
+        len = PyString_Size(key) + PyString_Size(val) + 2;
+        p = PyMem_NEW(char, len);
+        if (p == NULL) {
+            PyErr_NoMemory();
+            goto done;
+        }
+        PyOS_snprintf(p, len, "%s=%s", k, v);
+        envlist[envc++] = p;
+    }
+    envlist[envc] = NULL;
+
+    sigemptyset(&sigs);
+    for (i = 0; i < PyList_Size(sigdef); i++) {
+        long sig = PyInt_AsLong(PyList_GetItem(sigdef, i));
+        if (sig == -1 && PyErr_Occurred())
+            goto done;
+        sigaddset(&sigs, (int)sig);
+    }
+
+    if ((err = posix_spawnattr_init(&attr)) != 0) {
+        errno = err;
+        posix_error();
+        goto done;
+    }
+    attr_ok = 1;
+    if ((err = posix_spawnattr_setsigdefault(&attr, &sigs)) != 0 ||
+        (err = posix_spawnattr_setflags(&attr, POSIX_SPAWN_SETSIGDEF)) != 0) {
+        errno = err;
+        posix_error();
+        goto done;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    err = posix_spawn(&pid, path, NULL, &attr, argvlist, envlist);
+    Py_END_ALLOW_THREADS
+
+    if (err != 0) {
+        errno = err;
+        posix_error();
+        goto done;
+    }
+    result = PyInt_FromLong((long)pid);
+
+  done:
+    if (attr_ok)
+        posix_spawnattr_destroy(&attr);
+    if (envlist) {
+        while (--envc >= 0)
+            PyMem_DEL(envlist[envc]);
+        PyMem_DEL(envlist);
+    }
+    if (argvlist)
+        free_string_array(argvlist, lastarg);
+    Py_XDECREF(vals);
+    Py_XDECREF(keys);
+    PyMem_Free(path);
+    return result;
+}
+#endif /* HAVE_EXECV */
+
 #ifdef HAVE_FORK
 PyDoc_STRVAR_remove(posix_fork__doc__,
 "fork() -> pid\n\n\
@@ -2068,6 +2203,53 @@ posix_dup2(PyObject *self, PyObject *args)
 }
 
 
+PyDoc_STRVAR_remove(posix_lseek__doc__,
+"lseek(fd, pos, how) -> newpos\n\n\
+Set the current position of a file descriptor.\n\
+Return the new cursor position in bytes, starting from the beginning.");
+
+static PyObject *
+posix_lseek(PyObject *self, PyObject *args)
+{
+    int fd, how;
+    off_t pos, res;
+    PyObject *posobj;
+    if (!PyArg_ParseTuple(args, "iOi:lseek", &fd, &posobj, &how))
+        return NULL;
+#ifdef SEEK_SET
+    /* Turn 0, 1, 2 into SEEK_{SET,CUR,END} */
+    switch (how) {
+    case 0: how = SEEK_SET; break;
+    case 1: how = SEEK_CUR; break;
+    case 2: how = SEEK_END; break;
+    }
+#endif /* SEEK_END */
+
+#if !defined(HAVE_LARGEFILE_SUPPORT)
+    pos = PyInt_AsLong(posobj);
+#else
+    pos = PyLong_Check(posobj) ?
+        PyLong_AsLongLong(posobj) : PyInt_AsLong(posobj);
+#endif
+    if (PyErr_Occurred())
+        return NULL;
+
+    if (!_PyVerify_fd(fd))
+        return posix_error();
+    Py_BEGIN_ALLOW_THREADS
+    res = lseek(fd, pos, how);
+    Py_END_ALLOW_THREADS
+    if (res < 0)
+        return posix_error();
+
+#if !defined(HAVE_LARGEFILE_SUPPORT)
+    return PyInt_FromLong(res);
+#else
+    return PyLong_FromLongLong(res);
+#endif
+}
+
+
 PyDoc_STRVAR_remove(posix_read__doc__,
 "read(fd, buffersize) -> string\n\n\
 Read a file descriptor.");
@@ -2115,6 +2297,437 @@ posix_read(PyObject *self, PyObject *args)
 }
 
 
+PyDoc_STRVAR_remove(posix_read_all__doc__,
+"read_all(fd, max_bytes, strip_newlines) -> string or None\n\n\
+Read a file descriptor until EOF into one buffer.\n\
+A regular file is read with one read() of its size.\n\
+Return None if more than max_bytes were read (0 means no limit).");
+
+/* OVM_MAIN patch: for capturing command sub output.  The buffer grows
+ * geometrically and we read into its free space, so the output is copied
+ * once, not once per chunk and again to join the chunks.  Trailing newlines
+ * are trimmed by shrinking the string. */
+static PyObject *
+posix_read_all(PyObject *self, PyObject *args)
+{
+    int fd, strip_newlines;
+    Py_ssize_t max_bytes, size, len, want;
+    ssize_t n;
+    PyObject *buffer;
+    if (!PyArg_ParseTuple(args, "ini:read_all", &fd, &max_bytes,
+                          &strip_newlines))
+        return NULL;
+    if (max_bytes < 0) {
+        errno = EINVAL;
+        return posix_error();
+    }
+    if (!_PyVerify_fd(fd))
+        return posix_error();
+
+    size = 16384;
+    /* For a regular file, one read() of the rest of it, plus one at EOF. */
+    {
+        struct stat st;
+        off_t pos;
+        if (fstat(fd, &st) == 0 && S_ISREG(st.st_mode) &&
+            (pos = lseek(fd, 0, SEEK_CUR)) >= 0 && st.st_size > pos &&
+            st.st_size - pos < PY_SSIZE_T_MAX) {
+            size = (Py_ssize_t)(st.st_size - pos) + 1;
+        }
+    }
+    if (max_bytes && size > max_bytes + 1)
+        size = max_bytes + 1;
+    buffer = PyString_FromStringAndSize((char *)NULL, size);
+    if (buffer == NULL)
+        return NULL;
+
+    len = 0;
+    while (1) {
+        if (len == size) {
+            if (max_bytes && len > max_bytes) {
+                Py_DECREF(buffer);
+                Py_RETURN_NONE;  /* over the limit */
+            }
+            size = (size <= PY_SSIZE_T_MAX / 2) ? size * 2 : PY_SSIZE_T_MAX;
+            /* Read one byte past the limit, to tell if it's exceeded. */
+            if (max_bytes && size > max_bytes + 1)
+                size = max_bytes + 1;
+            if (_PyString_Resize(&buffer, size) < 0)
+                return NULL;
+        }
+        want = size - len;
+        if (want > INT_MAX)
+            want = INT_MAX;
+
+        Py_BEGIN_ALLOW_THREADS
+        n = read(fd, PyString_AS_STRING(buffer) + len, want);
+        Py_END_ALLOW_THREADS
+
+        if (n > 0) {
+            len += n;
+        } else if (n == 0) {  /* EOF */
+            break;
+        } else {
+            if (PyErr_CheckSignals()) {
+                Py_DECREF(buffer);
+                return NULL;  // Propagate KeyboardInterrupt
+            }
+            if (errno != EINTR) {
+                Py_DECREF(buffer);
+                return posix_error();
+            }
+            // Otherwise, try again on EINTR.
+        }
+    }
+
+    if (max_bytes && len > max_bytes) {
+        Py_DECREF(buffer);
+        Py_RETURN_NONE;
+    }
+    if (strip_newlines) {
+        while (len > 0 && PyString_AS_STRING(buffer)[len - 1] == '\n')
+            len--;
+    }
+    if (len != size)
+        _PyString_Resize(&buffer, len);
+    return buffer;
+}
+
+
+/* OVM_MAIN patch: Unix domain sockets that pass file descriptors, for 'osh
+ * --fork-server' and its clients.  OVM doesn't have the socket module, and
+ * Python 2's doesn't have sendmsg() and recvmsg() anyway. */
+#include <sys/socket.h>
+#include <sys/un.h>
+
+/* The most descriptors send_fds() and recv_fds() handle in one message. */
+#define MAX_PASSED_FDS 16
+
+static int
+set_cloexec(int fd)
+{
+    int flags = fcntl(fd, F_GETFD);
+    if (flags < 0)
+        return -1;
+    return fcntl(fd, F_SETFD, flags | FD_CLOEXEC);
+}
+
+/* Return a new socket, or -1 with errno set. */
+static int
+unix_socket(char *path, struct sockaddr_un *addr)
+{
+    int fd;
+    if (strlen(path) >= sizeof(addr->sun_path)) {
+        errno = ENAMETOOLONG;
+        return -1;
+    }
+    memset(addr, 0, sizeof(*addr));
+    addr->sun_family = AF_UNIX;
+    strcpy(addr->sun_path, path);
+
+    fd = socket(AF_UNIX, SOCK_STREAM, 0);
+    if (fd < 0)
+        return -1;
+    if (set_cloexec(fd) < 0) {
+        int saved_errno = errno;
+        close(fd);
+        errno = saved_errno;
+        return -1;
+    }
+    return fd;
+}
+
+PyDoc_STRVAR_remove(posix_unix_listen__doc__,
+"unix_listen(path, backlog) -> fd\n\n\
+Create a Unix domain stream socket listening at path.");
+
+static PyObject *
+posix_unix_listen(PyObject *self, PyObject *args)
+{
+    char *path;
+    int backlog, fd;
+    struct sockaddr_un addr;
+    if (!PyArg_ParseTuple(args, "si:unix_listen", &path, &backlog))
+        return NULL;
+
+    fd = unix_socket(path, &addr);
+    if (fd < 0)
+        return posix_error_with_filename(path);
+    if (bind(fd, (struct sockaddr *)&addr, sizeof(addr)) < 0 ||
+        listen(fd, backlog) < 0) {
+        int saved_errno = errno;
+        close(fd);
+        errno = saved_errno;
+        return posix_error_with_filename(path);
+    }
+    return PyInt_FromLong(fd);
+}
+
+PyDoc_STRVAR_remove(posix_unix_connect__doc__,
+"unix_connect(path) -> fd\n\n\
+Connect a Unix domain stream socket to path.");
+
+static PyObject *
+posix_unix_connect(PyObject *self, PyObject *args)
+{
+    char *path;
+    int fd, res;
+    struct sockaddr_un addr;
+    if (!PyArg_ParseTuple(args, "s:unix_connect", &path))
+        return NULL;
+
+    fd = unix_socket(path, &addr);
+    if (fd < 0)
+        return posix_error_with_filename(path);
+    Py_BEGIN_ALLOW_THREADS
+    res = connect(fd, (struct sockaddr *)&addr, sizeof(addr));
+    Py_END_ALLOW_THREADS
+    if (res < 0) {
+        int saved_errno = errno;
+        close(fd);
+        errno = saved_errno;
+        return posix_error_with_filename(path);
+    }
+    return PyInt_FromLong(fd);
+}
+
+PyDoc_STRVAR_remove(posix_accept__doc__,
+"accept(fd) -> fd\n\n\
+Accept a connection on a listening socket.");
+
+static PyObject *
+posix_accept(PyObject *self, PyObject *args)
+{
+    int fd, conn;
+    if (!PyArg_ParseTuple(args, "i:accept", &fd))
+        return NULL;
+
+    while (1) {
+        Py_BEGIN_ALLOW_THREADS
+        conn = accept(fd, NULL, NULL);
+        Py_END_ALLOW_THREADS
+        if (conn >= 0)
+            break;
+        if (PyErr_CheckSignals())
+            return NULL;
+        if (errno != EINTR)
+            return posix_error();
+        // Otherwise, try again on EINTR.
+    }
+    if (set_cloexec(conn) < 0) {
+        int saved_errno = errno;
+        close(conn);
+        errno = saved_errno;
+        return posix_error();
+    }
+    return PyInt_FromLong(conn);
+}
+
+PyDoc_STRVAR_remove(posix_getpeereid__doc__,
+"getpeereid(fd) -> (uid, gid)\n\n\
+Return the effective user and group IDs of the process at the other end of\n\
+a connected Unix domain socket.");
+
+static PyObject *
+posix_getpeereid(PyObject *self, PyObject *args)
+{
+    int sock;
+    if (!PyArg_ParseTuple(args, "i:getpeereid", &sock))
+        return NULL;
+#ifdef SO_PEERCRED
+    {
+        /* Linux */
+        struct ucred cred;
+        socklen_t len = sizeof(cred);
+        if (getsockopt(sock, SOL_SOCKET, SO_PEERCRED, &cred, &len) < 0)
+            return posix_error();
+        return Py_BuildValue("(ll)", (long)cred.uid, (long)cred.gid);
+    }
+#else
+    {
+        /* BSD and OS X */
+        uid_t uid;
+        gid_t gid;
+        if (getpeereid(sock, &uid, &gid) < 0)
+            return posix_error();
+        return Py_BuildValue("(ll)", (long)uid, (long)gid);
+    }
+#endif
+}
+
+PyDoc_STRVAR_remove(posix_send_fds__doc__,
+"send_fds(fd, data, fds) -> bytes_sent\n\n\
+Send data on a socket, with a list of file descriptors attached to its\n\
+first byte.  Like write(), it may send only part of the data.");
+
+static PyObject *
+posix_send_fds(PyObject *self, PyObject *args)
+{
+    int sock;
+    char *data;
+    Py_ssize_t len, i, num_fds;
+    PyObject *fd_list;
+    struct msghdr msg;
+    struct iovec iov;
+    union {
+        struct cmsghdr align;
+        char buf[CMSG_SPACE(sizeof(int) * MAX_PASSED_FDS)];
+    } control;
+    ssize_t n;
+
+    if (!PyArg_ParseTuple(args, "is#O!:send_fds", &sock, &data, &len,
+                          &PyList_Type, &fd_list))
+        return NULL;
+    num_fds = PyList_Size(fd_list);
+    if (len == 0 || num_fds > MAX_PASSED_FDS) {
+        PyErr_SetString(PyExc_ValueError,
+                        "send_fds() needs data and at most 16 descriptors");
+        return NULL;
+    }
+
+    memset(&msg, 0, sizeof(msg));
+    iov.iov_base = data;
+    iov.iov_len = len;
+    msg.msg_iov = &iov;
+    msg.msg_iovlen = 1;
+    if (num_fds > 0) {
+        struct cmsghdr *cmsg;
+        int fds[MAX_PASSED_FDS];
+        for (i = 0; i < num_fds; i++) {
+            long fd = PyInt_AsLong(PyList_GetItem(fd_list, i));
+            if (fd == -1 && PyErr_Occurred())
+                return NULL;
+            fds[i] = (int)fd;
+        }
+        memset(&control, 0, sizeof(control));
+        msg.msg_control = control.buf;
+        msg.msg_controllen = CMSG_SPACE(sizeof(int) * num_fds);
+        cmsg = CMSG_FIRSTHDR(&msg);
+        cmsg->cmsg_level = SOL_SOCKET;
+        cmsg->cmsg_type = SCM_RIGHTS;
+        cmsg->cmsg_len = CMSG_LEN(sizeof(int) * num_fds);
+        memcpy(CMSG_DATA(cmsg), fds, sizeof(int) * num_fds);
+    }
+
+    while (1) {
+        Py_BEGIN_ALLOW_THREADS
+        n = sendmsg(sock, &msg, 0);
+        Py_END_ALLOW_THREADS
+        if (n >= 0)
+            break;
+        if (PyErr_CheckSignals())
+            return NULL;
+        if (errno != EINTR)
+            return posix_error();
+        // Otherwise, try again on EINTR.
+    }
+    return PyInt_FromSsize_t(n);
+}
+
+PyDoc_STRVAR_remove(posix_recv_fds__doc__,
+"recv_fds(fd, max_bytes) -> (data, fds)\n\n\
+Receive data from a socket, and any file descriptors attached to it.\n\
+The descriptors are close-on-exec.  data is empty at EOF.");
+
+static PyObject *
+posix_recv_fds(PyObject *self, PyObject *args)
+{
+    int sock;
+    Py_ssize_t max_bytes;
+    PyObject *buffer, *fd_list;
+    struct msghdr msg;
+    struct iovec iov;
+    struct cmsghdr *cmsg;
+    union {
+        struct cmsghdr align;
+        char buf[CMSG_SPACE(sizeof(int) * MAX_PASSED_FDS)];
+    } control;
+    ssize_t n;
+    int flags = 0;
+
+    if (!PyArg_ParseTuple(args, "in:recv_fds", &sock, &max_bytes))
+        return NULL;
+    if (max_bytes <= 0) {
+        errno = EINVAL;
+        return posix_error();
+    }
+    buffer = PyString_FromStringAndSize((char *)NULL, max_bytes);
+    if (buffer == NULL)
+        return NULL;
+
+#ifdef MSG_CMSG_CLOEXEC
+    flags |= MSG_CMSG_CLOEXEC;
+#endif
+    while (1) {
+        memset(&msg, 0, sizeof(msg));
+        iov.iov_base = PyString_AS_STRING(buffer);
+        iov.iov_len = max_bytes;
+        msg.msg_iov = &iov;
+        msg.msg_iovlen = 1;
+        msg.msg_control = control.buf;
+        msg.msg_controllen = sizeof(control.buf);
+
+        Py_BEGIN_ALLOW_THREADS
+        n = recvmsg(sock, &msg, flags);
+        Py_END_ALLOW_THREADS
+        if (n >= 0)
+            break;
+        if (PyErr_CheckSignals()) {
+            Py_DECREF(buffer);
+            return NULL;
+        }
+        if (errno != EINTR) {
+            Py_DECREF(buffer);
+            return posix_error();
+        }
+        // Otherwise, try again on EINTR.
+    }
+
+    fd_list = PyList_New(0);
+    if (fd_list == NULL) {
+        Py_DECREF(buffer);
+        return NULL;
+    }
+    for (cmsg = CMSG_FIRSTHDR(&msg); cmsg != NULL;
+         cmsg = CMSG_NXTHDR(&msg, cmsg)) {
+        Py_ssize_t i, num_fds;
+        if (cmsg->cmsg_level != SOL_SOCKET || cmsg->cmsg_type != SCM_RIGHTS)
+            continue;
+        num_fds = (cmsg->cmsg_len - CMSG_LEN(0)) / sizeof(int);
+        for (i = 0; i < num_fds; i++) {
+            int fd;
+            PyObject *item;
+            memcpy(&fd, CMSG_DATA(cmsg) + i * sizeof(int), sizeof(int));
+#ifndef MSG_CMSG_CLOEXEC
+            set_cloexec(fd);
+#endif
+            item = PyInt_FromLong(fd);
+            if (item == NULL || PyList_Append(fd_list, item) < 0) {
+                Py_XDECREF(item);
+                Py_DECREF(fd_list);
+                Py_DECREF(buffer);
+                return NULL;
+            }
+            Py_DECREF(item);
+        }
+    }
+    if (msg.msg_flags & MSG_CTRUNC) {
+        /* Some descriptors were dropped, so don't hand back a partial list. */
+        Py_ssize_t i;
+        for (i = 0; i < PyList_Size(fd_list); i++)
+            close((int)PyInt_AsLong(PyList_GetItem(fd_list, i)));
+        Py_DECREF(fd_list);
+        Py_DECREF(buffer);
+        errno = EMSGSIZE;
+        return posix_error();
+    }
+
+    if (n != max_bytes)
+        _PyString_Resize(&buffer, n);
+    return Py_BuildValue("(NN)", buffer, fd_list);
+}
+
+
 PyDoc_STRVAR_remove(posix_write__doc__,
 "write(fd, string) -> byteswritten\n\n\
 Write a string to a file descriptor.");
@@ -20,12 +20,13 @@ from frontend import arg_def
 from frontend import args
 from frontend import match
 from mycpp.mylib import tagswitch
+from osh import builtin_misc
 
 import yajl
-import posix_ as posix
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
+  from core.optview import Exec
   from core.ui import ErrorFormatter
   from core.state import Mem
   from osh.cmd_eval import CommandEvaluator
@@ -189,13 +190,11 @@ JSON_READ_SPEC = arg_def.OilFlags('json-read')
 # yajl has this option
 JSON_READ_SPEC.Flag('-validate', args.Bool, default=True,
                      help='Validate UTF-8')
+JSON_READ_SPEC.Flag('-lines', args.Bool, default=False,
+                     help='Read one JSON document per line (JSON lines)')
 
 _JSON_ACTION_ERROR = "builtin expects 'read' or 'write'"
 
-# global file object that can be passed to yajl.load(), and that also can be
-# used with redirects.  See comment below.
-_STDIN = posix.fdopen(0)
-
 
 class Json(object):
   """Json I/O.
@@ -212,13 +211,16 @@ class Json(object):
 
   json read :x < foo.tsv2
 
+  while json read -lines :rec { ... }  # one record per line
+
   How about:
       json echo &myobj 
   Well that will get confused with a redirect.
   """
-  def __init__(self, mem, cmd_ev, errfmt):
-    # type: (Mem, CommandEvaluator, ErrorFormatter) -> None
+  def __init__(self, mem, exec_opts, cmd_ev, errfmt):
+    # type: (Mem, Exec, CommandEvaluator, ErrorFormatter) -> None
     self.mem = mem
+    self.exec_opts = exec_opts
     self.cmd_ev = cmd_ev
     self.errfmt = errfmt
 
@@ -289,19 +291,28 @@ class Json(object):
         raise error.Usage('got invalid variable name %r' % var_name,
                               span_id=name_spid)
 
+      # We read the fd directly rather than with yajl.load(f), which needs a
+      # file object that outlives redirects.  See
+      # https://github.com/oilshell/oil/issues/675
+      #
+      # TODO: The py-yajl binding only exposes load() and loads(), not yajl's
+      # streaming API, so a whole document is still parsed at once.  With
+      # -lines, memory is bounded by the longest line.
+
+      buffered = self.exec_opts.buffered_read()
+      if arg.lines:
+        while True:
+          line, eof = builtin_misc.ReadLineFromStdin('\n', buffered=buffered)
+          if len(line.strip()):
+            break
+          if eof:
+            return 1  # EOF, like 'read' and 'getline'
+        s = line
+      else:
+        s = builtin_misc.ReadAllFromStdin(buffered=buffered)
+
       try:
-        # Use a global _STDIN, because we get EBADF on a redirect if we use a
-        # local.  A Py_DECREF closes the file, which we don't want, because the
-        # redirect is responsible for freeing it.
-        #
-        # https://github.com/oilshell/oil/issues/675
-        #
-        # TODO: write a better binding like yajl.readfd()
-        #
-        # It should use streaming like here:
-        # https://lloyd.github.io/yajl/
-
-        obj = yajl.load(_STDIN)
+        obj = yajl.loads(s)
       except ValueError as e:
         self.errfmt.Print('json read: %s', e, span_id=action_spid)
         return 1
@@ -356,24 +367,16 @@ class Write(_Builtin):
     return 0
 
 
-def _ReadLine():
-  # type: () -> str
-  """Read a line from stdin.
+def _ReadLine(buffered):
+  # type: (bool) -> str
+  """Read a line from stdin, including the newline if there is one.
 
-  TODO: use a more efficient function in C
+  Shares the fast paths of the 'read' builtin.
   """
-  chars = []
-  while True:
-    c = posix.read(0, 1)
-    if not c:
-      break
-
-    chars.append(c)
-
-    if c == '\n':
-      break
-
-  return ''.join(chars)
+  line, eof = builtin_misc.ReadLineFromStdin('\n', buffered=buffered)
+  if not eof:
+    line += '\n'
+  return line
 
 
 GETLINE_SPEC = arg_def.OilFlags('getline')
@@ -389,6 +392,11 @@ class Getline(_Builtin):
 
   What if there are multiple vars?  Try TSV2 then?
   """
+  def __init__(self, mem, exec_opts, errfmt):
+    # type: (Mem, Exec, ErrorFormatter) -> None
+    _Builtin.__init__(self, mem, errfmt)
+    self.exec_opts = exec_opts
+
   def Run(self, cmd_val):
     arg_r = args.Reader(cmd_val.argv, spids=cmd_val.arg_spids)
     arg_r.Next()
@@ -408,7 +416,7 @@ class Getline(_Builtin):
     if next_arg is not None:
       raise error.Usage('got extra argument', span_id=next_spid)
 
-    line = _ReadLine()
+    line = _ReadLine(self.exec_opts.buffered_read())
     if len(line) == 0:  # EOF
       return 1
 
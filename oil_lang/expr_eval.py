@@ -16,7 +16,6 @@ from core.util import e_die
 from core.util import log
 from frontend import consts
 from oil_lang import objects
-from osh import braces
 from core import state
 from osh import word_compile
 from osh import word_eval
@@ -252,8 +251,7 @@ class OilEvaluator(object):
       return self.shell_ex.RunCommandSub(node.child)
 
     if node.tag == expr_e.ShArrayLiteral:
-      words = braces.BraceExpandWords(node.words)
-      strs = self.word_ev.EvalWordSequence(words)
+      strs = self.word_ev.EvalWordSequence(node.words)
       #log('ARRAY LITERAL EVALUATED TO -> %s', strs)
       return objects.StrArray(strs)
 
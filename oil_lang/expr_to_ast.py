@@ -77,7 +77,7 @@ class Transformer(object):
   """
   def __init__(self, gr):
     # type: (Grammar) -> None
-    self.number2symbol = gr.number2symbol
+    self.gr = gr  # the tables may not be loaded yet; see core/meta.py
 
   def _AssocBinary(self, children):
     # type: (List[PNode]) -> expr_t
@@ -586,7 +586,7 @@ class Transformer(object):
         return simple_var_sub(children[0].tok)
 
       else:
-        nt_name = self.number2symbol[typ]
+        nt_name = self.gr.number2symbol[typ]
         raise AssertionError(
             "PNode type %d (%s) wasn't handled" % (typ, nt_name))
 
@@ -685,7 +685,7 @@ class Transformer(object):
       iterable = self.Expr(children[3])
       return lhs, iterable
 
-    nt_name = self.number2symbol[typ]
+    nt_name = self.gr.number2symbol[typ]
     raise AssertionError(
         "PNode type %d (%s) wasn't handled" % (typ, nt_name))
 
@@ -1048,7 +1048,7 @@ class Transformer(object):
 
       raise AssertionError(children[0].tok.id)
 
-    nt_name = self.number2symbol[typ]
+    nt_name = self.gr.number2symbol[typ]
     raise NotImplementedError(nt_name)
 
   def _ClassLiteral(self, p_node):
@@ -1292,6 +1292,6 @@ class Transformer(object):
       else:
         return re.Seq(seq)
 
-    nt_name = self.number2symbol[typ]
+    nt_name = self.gr.number2symbol[typ]
     raise NotImplementedError(nt_name)
 
@@ -7,6 +7,7 @@ Not translating this file directly.
 from __future__ import print_function
 
 import stat
+import libc
 import posix_ as posix
 
 from _devbuild.gen.id_kind_asdl import Id, Id_t
@@ -14,6 +15,11 @@ from _devbuild.gen.syntax_asdl import word_t
 from core.util import e_die
 from core import ui
 
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+  from core.process import JobState
+  from core.state import Mem
+
 
 def isatty(fd, s, blame_word):
   # type: (int, str, word_t) -> bool
@@ -24,28 +30,158 @@ def isatty(fd, s, blame_word):
     e_die('File descriptor %r is too big', s, word=blame_word)
 
 
-def DoUnaryOp(op_id, s):
-  # type: (Id_t, str) -> bool
+def _Stat(path):
+  # type: (str) -> Optional[posix.stat_result]
+  try:
+    return posix.stat(path)
+  except OSError:
+    # TODO: simple_test_builtin should this as status=2.
+    # Problem: we really need errno, because test -f / is bad argument,
+    # while test -f /nonexistent is a good argument but failed.  Gah.
+    # ENOENT vs. ENAMETOOLONG.
+    #e_die("stat() error: %s", e, word=node.child)
+    return None
+
+
+def _Lstat(path):
+  # type: (str) -> Optional[posix.stat_result]
+  try:
+    return posix.lstat(path)
+  except OSError:
+    return None
+
+
+class StatCache(object):
+  """Remembers stat() and lstat() results for [[ -f ]], test, etc., and
+  directory listings for globs.
+
+  Only used with 'shopt -s stat_cache'.  Scripts often test the same paths in
+  a loop, and the shell itself can't change the file system between commands
+  unless it:
+
+  - starts a process, which could be an external command, a subshell, etc.
+    The executor calls Clear() for these.
+  - applies a redirect that creates or truncates a file.  Likewise.
+  - changes the working directory, which changes what a relative path means.
+    We notice that mem.pwd changed.
+
+  Another process could still change a file, so nothing is cached while
+  any child process is running, e.g. a background job or the other side of a
+  pipeline.  Failed lookups are cached too, since testing for a file that
+  doesn't exist is common.
+
+  A directory listing is also checked against the directory's mtime each time
+  it's used, since a glob like **/*.c reads the same directories repeatedly.
+  """
+
+  def __init__(self, mem, job_state):
+    # type: (Mem, JobState) -> None
+    self.mem = mem
+    self.job_state = job_state
+    self.stats = {}  # type: Dict[str, Optional[posix.stat_result]]
+    self.lstats = {}  # type: Dict[str, Optional[posix.stat_result]]
+    # libc.read_dir() results, and the mtime of the directory when it was read
+    self.listings = {}  # type: Dict[str, Optional[Tuple[List[str], List[str]]]]
+    self.mtimes = {}  # type: Dict[str, int]
+    self.pwd = None  # type: Optional[str]
+
+    # For tuning
+    self.hits = 0
+    self.misses = 0
+
+  def Clear(self):
+    # type: () -> None
+    if self.stats:
+      self.stats.clear()
+    if self.lstats:
+      self.lstats.clear()
+    if self.listings:
+      self.listings.clear()
+      self.mtimes.clear()
+
+  def _Usable(self):
+    # type: () -> bool
+    if self.job_state.NumProcsRunning() != 0:
+      return False
+    if self.mem.pwd != self.pwd:
+      self.Clear()
+      self.pwd = self.mem.pwd
+    return True
+
+  def Stat(self, path):
+    # type: (str) -> Optional[posix.stat_result]
+    """Like posix.stat(), but returns None on error."""
+    if not self._Usable():
+      return _Stat(path)
+    if path in self.stats:
+      self.hits += 1
+      return self.stats[path]
+    self.misses += 1
+    st = _Stat(path)
+    self.stats[path] = st
+    return st
+
+  def Lstat(self, path):
+    # type: (str) -> Optional[posix.stat_result]
+    """Like posix.lstat(), but returns None on error."""
+    if not self._Usable():
+      return _Lstat(path)
+    if path in self.lstats:
+      self.hits += 1
+      return self.lstats[path]
+    self.misses += 1
+    st = _Lstat(path)
+    self.lstats[path] = st
+    return st
+
+  def ReadDir(self, path):
+    # type: (str) -> Optional[Tuple[List[str], List[str]]]
+    """Like libc.read_dir()."""
+    if not self._Usable():
+      return libc.read_dir(path)
+    mtime = libc.dir_mtime(path)
+    if mtime == -1:  # not a directory
+      return None
+    if self.mtimes.get(path) == mtime:
+      self.hits += 1
+      return self.listings[path]
+    self.misses += 1
+    listing = libc.read_dir(path)
+    self.listings[path] = listing
+    self.mtimes[path] = mtime
+    return listing
+
+  def Stats(self):
+    # type: () -> Dict[str, int]
+    """Return counts for the stat_cache_stats() function."""
+    return {
+        'hits': self.hits,
+        'misses': self.misses,
+        'entries': len(self.stats) + len(self.lstats) + len(self.listings),
+    }
+
+
+def DoUnaryOp(op_id, s, stat_cache=None):
+  # type: (Id_t, str, Optional[StatCache]) -> bool
 
   # Only use lstat if we're testing for a symlink.
   if op_id in (Id.BoolUnary_h, Id.BoolUnary_L):
-    try:
-      mode = posix.lstat(s).st_mode
-    except OSError:
+    if stat_cache:
+      st = stat_cache.Lstat(s)
+    else:
+      st = _Lstat(s)
+    if st is None:
       # TODO: simple_test_builtin should this as status=2.
       #e_die("lstat() error: %s", e, word=node.child)
       return False
 
-    return stat.S_ISLNK(mode)
+    return stat.S_ISLNK(st.st_mode)
 
-  try:
-    st = posix.stat(s)
-  except OSError as e:
-    # TODO: simple_test_builtin should this as status=2.
-    # Problem: we really need errno, because test -f / is bad argument,
-    # while test -f /nonexistent is a good argument but failed.  Gah.
-    # ENOENT vs. ENAMETOOLONG.
-    #e_die("stat() error: %s", e, word=node.child)
+  if stat_cache:
+    st = stat_cache.Stat(s)
+  else:
+    st = _Stat(s)
+  if st is None:
     return False
   mode = st.st_mode
 
@@ -95,16 +231,14 @@ def DoUnaryOp(op_id, s):
   e_die("%s isn't implemented", ui.PrettyId(op_id))  # implicit location
 
 
-def DoBinaryOp(op_id, s1, s2):
-  # type: (Id_t, str, str) -> bool
-  try:
-    st1 = posix.stat(s1)
-  except OSError:
-    st1 = None
-  try:
-    st2 = posix.stat(s2)
-  except OSError:
-    st2 = None
+def DoBinaryOp(op_id, s1, s2, stat_cache=None):
+  # type: (Id_t, str, str, Optional[StatCache]) -> bool
+  if stat_cache:
+    st1 = stat_cache.Stat(s1)
+    st2 = stat_cache.Stat(s2)
+  else:
+    st1 = _Stat(s1)
+    st2 = _Stat(s2)
 
   if op_id in (Id.BoolBinary_nt, Id.BoolBinary_ot):
     # pretend it's a very old file
@@ -123,3 +257,44 @@ def DoBinaryOp(op_id, s1, s2):
     return st1.st_dev == st2.st_dev and st1.st_ino == st2.st_ino
 
   raise AssertionError(op_id)
+
+
+def _FileType(mode):
+  # type: (int) -> str
+  if stat.S_ISREG(mode):
+    return 'file'
+  if stat.S_ISDIR(mode):
+    return 'dir'
+  if stat.S_ISFIFO(mode):
+    return 'fifo'
+  if stat.S_ISSOCK(mode):
+    return 'socket'
+  if stat.S_ISCHR(mode):
+    return 'char'
+  if stat.S_ISBLK(mode):
+    return 'block'
+  return 'other'
+
+
+def StatTable(paths, stat_cache=None):
+  # type: (List[str], Optional[StatCache]) -> Dict[str, List[Any]]
+  """The stat_table() function.
+
+  Returns a table as a dict of columns: 'path', 'type', and 'size'.  Like
+  [[ -f ]], it follows symlinks.  A path that can't be stat'd has type '' and
+  size -1.
+  """
+  types = []  # type: List[str]
+  sizes = []  # type: List[int]
+  for path in paths:
+    if stat_cache:
+      st = stat_cache.Stat(path)
+    else:
+      st = _Stat(path)
+    if st is None:
+      types.append('')
+      sizes.append(-1)
+    else:
+      types.append(_FileType(st.st_mode))
+      sizes.append(st.st_size)
+  return {'path': list(paths), 'type': types, 'size': sizes}
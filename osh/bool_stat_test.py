@@ -0,0 +1,99 @@
+#!/usr/bin/env python2
+"""
+bool_stat_test.py: Tests for bool_stat.py
+"""
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from _devbuild.gen.id_kind_asdl import Id
+from core import process
+from core import state
+from core import test_lib
+from osh import bool_stat  # module under test
+
+
+class StatCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmp_dir, 'f')
+
+    arena = test_lib.MakeArena('bool_stat_test.py')
+    self.mem = state.Mem('', [], arena, [])
+    self.mem.SetPwd('/')
+    self.job_state = process.JobState()
+    self.cache = bool_stat.StatCache(self.mem, self.job_state)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def testCache(self):
+    cache = self.cache
+    path = self.path
+
+    # Missing files are cached too
+    self.assertEqual(False, bool_stat.DoUnaryOp(Id.BoolUnary_f, path, cache))
+    with open(path, 'w') as f:
+      f.write('x')
+    self.assertEqual(False, bool_stat.DoUnaryOp(Id.BoolUnary_f, path, cache))
+    self.assertEqual(True, bool_stat.DoUnaryOp(Id.BoolUnary_f, path))
+    self.assertEqual({'hits': 1, 'misses': 1, 'entries': 1}, cache.Stats())
+
+    cache.Clear()
+    self.assertEqual(True, bool_stat.DoUnaryOp(Id.BoolUnary_f, path, cache))
+    self.assertEqual(True, bool_stat.DoUnaryOp(Id.BoolUnary_s, path, cache))
+    self.assertEqual(False, bool_stat.DoUnaryOp(Id.BoolUnary_L, path, cache))
+    self.assertEqual(True, bool_stat.DoBinaryOp(Id.BoolBinary_ef, path, path,
+                                                cache))
+    self.assertEqual({'hits': 4, 'misses': 3, 'entries': 2}, cache.Stats())
+
+    # Changing directories clears it
+    os.remove(path)
+    self.mem.SetPwd(self.tmp_dir)
+    self.assertEqual(False, bool_stat.DoUnaryOp(Id.BoolUnary_e, path, cache))
+
+  def testReadDir(self):
+    cache = self.cache
+    names, dirs = cache.ReadDir(self.tmp_dir)
+    self.assertEqual(['.', '..'], sorted(names))
+    self.assertEqual(None, cache.ReadDir(os.path.join(self.tmp_dir, 'missing')))
+
+    # A listing is reused until the directory's mtime changes
+    self.assertEqual((names, dirs), cache.ReadDir(self.tmp_dir))
+    self.assertEqual({'hits': 1, 'misses': 1, 'entries': 1}, cache.Stats())
+    os.mkdir(os.path.join(self.tmp_dir, 'sub'))
+    names, dirs = cache.ReadDir(self.tmp_dir)
+    self.assertEqual(['sub'], dirs)
+    self.assertEqual({'hits': 1, 'misses': 2, 'entries': 1}, cache.Stats())
+
+  def testNotCachedWithChildProcesses(self):
+    self.job_state.num_procs = 1  # e.g. a pipeline stage or background job
+    self.assertEqual(None, self.cache.Stat(self.path))
+    with open(self.path, 'w') as f:
+      f.write('x')
+    self.assertNotEqual(None, self.cache.Stat(self.path))
+    self.assertEqual({'hits': 0, 'misses': 0, 'entries': 0},
+                     self.cache.Stats())
+
+  def testStatTable(self):
+    with open(self.path, 'w') as f:
+      f.write('abc')
+    missing = os.path.join(self.tmp_dir, 'missing')
+    paths = [self.path, self.tmp_dir, missing]
+
+    t = bool_stat.StatTable(paths)
+    self.assertEqual(paths, t['path'])
+    self.assertEqual(['file', 'dir', ''], t['type'])
+    self.assertEqual(3, t['size'][0])
+    self.assertEqual(-1, t['size'][2])
+
+    self.assertEqual(t, bool_stat.StatTable(paths, self.cache))
+    self.assertEqual(3, self.cache.Stats()['misses'])
+
+
+if __name__ == '__main__':
+  unittest.main()
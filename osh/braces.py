@@ -22,8 +22,9 @@ from _devbuild.gen.syntax_asdl import (
     word_part, word_part_e, word_part_t,
     word_part__BracedTuple, word_part__BracedRange,
 )
-from core.util import log, p_die
+from core.util import log, p_die, e_die
 from frontend import match
+from osh import word_
 from mycpp.mylib import tagswitch
 
 from typing import List, Optional, cast, TYPE_CHECKING
@@ -335,164 +336,271 @@ def _IntToString(i, width):
     return s
 
 
-def _RangeStrings(part):
-  # type: (word_part__BracedRange) -> List[str]
+class _RangeValues(object):
+  """The strings that {1..10..2} or {a..z} expands to, computed on demand.
 
-  if part.kind == Id.Range_Int:
-    nums = []  # type: List[str]
-
-    z1 = _LeadingZeros(part.start)
-    z2 = _LeadingZeros(part.end)
-
-    if z1 == 0 and z2 == 0:
-      width = 0
+  So {1..1000000} doesn't need a million tokens.
+  """
+  def __init__(self, part):
+    # type: (word_part__BracedRange) -> None
+    self.span_id = part.spids[0]  # Preserve span_id from the original
+    self.is_char = part.kind == Id.Range_Char
+    self.step = part.step
+
+    if self.is_char:
+      self.start = ord(part.start)
+      end = ord(part.end)
+      self.width = 0
     else:
-      if z1 < z2:
-        width = len(part.end)
+      self.start = int(part.start)
+      end = int(part.end)
+
+      z1 = _LeadingZeros(part.start)
+      z2 = _LeadingZeros(part.end)
+      if z1 == 0 and z2 == 0:
+        self.width = 0
       else:
-        width = len(part.start)
-
-    n = int(part.start)
-    end = int(part.end)
-    step = part.step
-    if step > 0:
-      while True:
-        nums.append(_IntToString(n, width))
-        n += step
-        if n > end:
-          break
+        if z1 < z2:
+          self.width = len(part.end)
+        else:
+          self.width = len(part.start)
+
+    # The start is always included.  _RangeParser ensures the step goes in the
+    # right direction.
+    if self.step > 0:
+      self.count = (end - self.start) / self.step + 1
     else:
-      while True:
-        nums.append(_IntToString(n, width))
-        n += step
-        if n < end:
-          break
-
-    return nums
-
-  else:  # Id.Range_Char
-    chars = []  # type: List[str]
-
-    n = ord(part.start)
-    ord_end = ord(part.end)
-    step = part.step
-    if step > 0:
-      while True:
-        chars.append(chr(n))
-        n += step
-        if n > ord_end:
-          break
+      self.count = (self.start - end) / -self.step + 1
+
+  def Get(self, i):
+    # type: (int) -> str
+    n = self.start + i * self.step
+    if self.is_char:
+      return chr(n)
+    return _IntToString(n, self.width)
+
+
+def _FindAlternative(starts, i):
+  # type: (List[int], int) -> int
+  """Binary search for the alternative that word i of a tuple comes from.
+
+  starts is increasing, and starts[0] is 0.
+  """
+  lo = 0
+  hi = len(starts)
+  while hi - lo > 1:  # starts[lo] <= i < starts[hi]
+    mid = (lo + hi) / 2
+    if starts[mid] <= i:
+      lo = mid
     else:
-      while True:
-        chars.append(chr(n))
-        n += step
-        if n < ord_end:
-          break
-
-    return chars
-
-
-def _ExpandPart(parts,  # type: List[word_part_t]
-                first_alt_index,  # type: int
-                suffixes,  # type: List[List[word_part_t]]
-                ):
-  # type: (...) -> List[List[word_part_t]]
-  """Mutually recursive with _BraceExpand.
-
-  Args:
-    parts: input parts
-    first_alt_index: index of the first BracedTuple
-    suffixes: List of suffixes to append.
+      hi = mid
+  return lo
+
+
+class _Expansion(object):
+  """The words that a list of parts expands to, computed on demand.
+
+  The words are the cartesian product of the BracedTuple and BracedRange
+  parts, with the last one varying fastest.  So the i-th word can be computed
+  from i alone, like reading off the digits of a number.
   """
-  out = []  # type: List[List[word_part_t]]
+  def __init__(self, parts):
+    # type: (List[word_part_t]) -> None
+    self.parts = parts
+
+    # Parallel to parts.  Other parts are copied, so they count once.
+    self.counts = []  # type: List[int]
+    self.alts = []  # type: List[List[_Expansion]]
+    self.starts = []  # type: List[List[int]]  # first word of each alt
+    self.ranges = []  # type: List[Optional[_RangeValues]]
+
+    self.num_words = 1
+    for part in parts:
+      count = 1
+      alts = []  # type: List[_Expansion]
+      starts = []  # type: List[int]
+      r = None  # type: Optional[_RangeValues]
+
+      UP_part = part
+      tag = part.tag_()
+      if tag == word_part_e.BracedTuple:
+        part = cast(word_part__BracedTuple, UP_part)
+        # Each alternative can have braces too, e.g. {a,b{1..3}}
+        count = 0
+        for w in part.words:
+          e = _Expansion(w.parts)
+          alts.append(e)
+          starts.append(count)
+          count += e.num_words
+
+      elif tag == word_part_e.BracedRange:
+        part = cast(word_part__BracedRange, UP_part)
+        r = _RangeValues(part)
+        count = r.count
+
+      self.counts.append(count)
+      self.alts.append(alts)
+      self.starts.append(starts)
+      self.ranges.append(r)
+      self.num_words *= count
+
+  def AppendParts(self, i, out):
+    # type: (int, List[word_part_t]) -> None
+    """Append the parts of word i to out."""
+    n = len(self.parts)
+
+    # Which alternative or range value each part contributes
+    digits = [0] * n
+    j = n - 1
+    while j >= 0:
+      count = self.counts[j]
+      digits[j] = i % count
+      i = i / count
+      j -= 1
+
+    for j, part in enumerate(self.parts):
+      d = digits[j]
+      alts = self.alts[j]
+      r = self.ranges[j]
+      if len(alts):
+        k = _FindAlternative(self.starts[j], d)
+        alts[k].AppendParts(d - self.starts[j][k], out)
+      elif r:
+        out.append(Token(Id.Lit_Chars, r.span_id, r.Get(d)))
+      else:
+        out.append(part)
+
+
+def _IsLiteral(parts):
+  # type: (List[word_part_t]) -> bool
+  """Are the parts unquoted chars, possibly in braces, like x{1..3}?"""
+  for part in parts:
+    UP_part = part
+    tag = part.tag_()
+    if tag == word_part_e.Literal:
+      part = cast(Token, UP_part)
+      if part.id != Id.Lit_Chars:
+        return False
+
+    elif tag == word_part_e.BracedTuple:
+      part = cast(word_part__BracedTuple, UP_part)
+      for w in part.words:
+        if not _IsLiteral(w.parts):
+          return False
 
-  prefix = parts[ : first_alt_index]
-  expand_part = parts[first_alt_index]
-
-  UP_part = expand_part
-  with tagswitch(expand_part) as case:
-    if case(word_part_e.BracedTuple):
-      expand_part = cast(word_part__BracedTuple, UP_part)
-      # Call _BraceExpand on each of the inner words too!
-      expanded_alts = []  # type: List[List[word_part_t]]
-      for w in expand_part.words:
-        expanded_alts.extend(_BraceExpand(w.parts))
-
-      for alt_parts in expanded_alts:
-        for suffix in suffixes:
-          out_parts = []  # type: List[word_part_t]
-          out_parts.extend(prefix)
-          out_parts.extend(alt_parts)
-          out_parts.extend(suffix)
-          out.append(out_parts)
-
-    elif case(word_part_e.BracedRange):
-      expand_part = cast(word_part__BracedRange, UP_part)
-      # Not mutually recursive with _BraceExpand
-      strs = _RangeStrings(expand_part)
-      for s in strs:
-        for suffix in suffixes:
-          out_parts_ = []  # type: List[word_part_t]
-          out_parts_.extend(prefix)
-          # Preserve span_id from the original
-          t = Token(Id.Lit_Chars, expand_part.spids[0], s)
-          out_parts_.append(t)
-          out_parts_.extend(suffix)
-          out.append(out_parts_)
+    elif tag == word_part_e.BracedRange:
+      pass
 
     else:
-      raise AssertionError()
+      return False
 
-  return out
+  return True
 
 
-def _BraceExpand(parts):
-  # type: (List[word_part_t]) -> List[List[word_part_t]]
-  """Mutually recursive with _ExpandPart."""
-  num_alts = 0
-  first_alt_index = -1
-  for i, part in enumerate(parts):
-    tag = part.tag_()
-    if tag in (word_part_e.BracedTuple, word_part_e.BracedRange):
-      num_alts += 1
-      if num_alts == 1:
-        first_alt_index = i
-      elif num_alts == 2:
-        break  # don't need to count anymore
-
-  # NOTE: There are TWO recursive calls here, not just one -- one for
-  # nested {}, and one for adjacent {}.  This is hard to do iteratively.
-  if num_alts == 0:
-    return [parts]
-
-  elif num_alts == 1:
-    suffix = parts[first_alt_index+1 : ]
-    return _ExpandPart(parts, first_alt_index, [suffix])
+class BraceExpander(object):
+  """Turns a list of words with braces into compound words, one at a time.
 
-  else:
-    # Now call it on the tail
-    tail_parts = parts[first_alt_index+1 : ]
-    suffixes = _BraceExpand(tail_parts)  # recursive call
-    return _ExpandPart(parts, first_alt_index, suffixes)
+  Unlike BraceExpandWords(), this doesn't create all the words up front, so
+  'for i in {1..1000000}' doesn't need memory for a million words.
+  """
+  def __init__(self, words, max_words=0):
+    # type: (List[word_t], int) -> None
+    """
+    Args:
+      words: words that may be BracedTree instances
+      max_words: the most words a BracedTree may expand to.  0 means no limit.
+    """
+    self.words = words
+    self.max_words = max_words
+
+    self.word_index = 0  # next entry of self.words
+    self.expansion = None  # type: Optional[_Expansion]
+    self.i = 0  # next word of self.expansion
+
+  def IsLiteral(self):
+    # type: () -> bool
+    """Whether the words are only unquoted chars, like {1..10} or x{a,b}.
+
+    Then there's nothing to substitute, split, or glob, and NextString() can
+    be used.
+    """
+    for w in self.words:
+      UP_w = w
+      with tagswitch(w) as case:
+        if case(word_e.BracedTree):
+          w = cast(word__BracedTree, UP_w)
+          if not _IsLiteral(w.parts):
+            return False
+
+        elif case(word_e.Compound):
+          w = cast(compound_word, UP_w)
+          if not _IsLiteral(w.parts):
+            return False
+
+        else:
+          raise AssertionError(w.tag_())
+
+    return True
+
+  def Next(self):
+    # type: () -> Optional[compound_word]
+    """Return the next word, or None if there are no more."""
+    while True:
+      if self.expansion:
+        if self.i < self.expansion.num_words:
+          parts = []  # type: List[word_part_t]
+          self.expansion.AppendParts(self.i, parts)
+          self.i += 1
+          return compound_word(parts)
+        self.expansion = None
+
+      if self.word_index == len(self.words):
+        return None
+      w = self.words[self.word_index]
+      self.word_index += 1
+
+      UP_w = w
+      if w.tag_() != word_e.BracedTree:
+        return cast(compound_word, UP_w)
+
+      w = cast(word__BracedTree, UP_w)
+      self.expansion = _Expansion(w.parts)
+      self.i = 0
+
+      num_words = self.expansion.num_words
+      if self.max_words and num_words > self.max_words:
+        e_die('Brace expansion gives %d words, more than %d '
+              '(--max-brace-words)', num_words, self.max_words,
+              span_id=word_.LeftMostSpanForWord(w))
+
+  def NextString(self):
+    # type: () -> Optional[str]
+    """Like Next(), but return the word's value.  Requires IsLiteral()."""
+    w = self.Next()
+    if w is None:
+      return None
+    tmp = [cast(Token, part).val for part in w.parts]
+    return ''.join(tmp)
 
 
-def BraceExpandWords(words):
-  # type: (List[word_t]) -> List[compound_word]
-  out = []  # type: List[compound_word]
-  for w in words:
-    UP_w = w
-    with tagswitch(w) as case:
-      if case(word_e.BracedTree):
-        w = cast(word__BracedTree, UP_w)
-        parts_list = _BraceExpand(w.parts)
-        tmp = [compound_word(p) for p in parts_list]
-        out.extend(tmp)
-
-      elif case(word_e.Compound):
-        w = cast(compound_word, UP_w)
-        out.append(w)
+def _BraceExpand(parts):
+  # type: (List[word_part_t]) -> List[List[word_part_t]]
+  e = _Expansion(parts)
+  out = []  # type: List[List[word_part_t]]
+  for i in xrange(e.num_words):
+    word_parts = []  # type: List[word_part_t]
+    e.AppendParts(i, word_parts)
+    out.append(word_parts)
+  return out
 
-      else:
-        raise AssertionError(w.tag_())
 
+def BraceExpandWords(words, max_words=0):
+  # type: (List[word_t], int) -> List[compound_word]
+  out = []  # type: List[compound_word]
+  expander = BraceExpander(words, max_words)
+  while True:
+    w = expander.Next()
+    if w is None:
+      break
+    out.append(w)
   return out
@@ -9,6 +9,7 @@ import unittest
 from _devbuild.gen.id_kind_asdl import Id
 from _devbuild.gen.syntax_asdl import word_part_e, compound_word
 from asdl import format as fmt
+from core import error
 from core.util import log
 from core.test_lib import Tok
 from osh import braces  # module under test
@@ -182,6 +183,63 @@ class BracesTest(unittest.TestCase):
       _PrettyPrint(compound_word(parts))
       print('')
 
+  def testBraceExpander(self):
+    def _Words(s):
+      w = _assertReadWord(self, s)
+      return [braces._BraceDetect(w) or w]
+
+    CASES = [
+        ('{1..3}', ['1', '2', '3']),
+        ('{10..1..-3}', ['10', '7', '4', '1']),
+        ('{1..10..4}', ['1', '5', '9']),
+        ('{-1..-7..-3}', ['-1', '-4', '-7']),
+        ('{08..10}', ['08', '09', '10']),
+        ('{e..a..-2}', ['e', 'c', 'a']),
+        ('{a,b}{1..2}', ['a1', 'a2', 'b1', 'b2']),
+        ('x{a,b{1..3},}y', ['xay', 'xb1y', 'xb2y', 'xb3y', 'xy']),
+        ('plain', ['plain']),
+    ]
+    for s, expected in CASES:
+      expander = braces.BraceExpander(_Words(s))
+      self.assertEqual(True, expander.IsLiteral(), s)
+      actual = []
+      while True:
+        w = expander.NextString()
+        if w is None:
+          break
+        actual.append(w)
+      self.assertEqual(expected, actual, s)
+
+    self.assertEqual(False, braces.BraceExpander(_Words('{a,$x}')).IsLiteral())
+    self.assertEqual(False, braces.BraceExpander(_Words('*{1..2}')).IsLiteral())
+
+    # Large ranges aren't expanded up front
+    expander = braces.BraceExpander(_Words('{1..1000000}{1..1000000}'))
+    self.assertEqual('11', expander.NextString())
+    self.assertEqual('12', expander.NextString())
+
+    # Alternatives of different sizes are found with a binary search
+    starts = [0, 1, 4, 5, 9]
+    actual = [braces._FindAlternative(starts, i) for i in xrange(11)]
+    self.assertEqual([0, 1, 1, 1, 2, 3, 3, 3, 3, 4, 4], actual)
+
+    alts = ','.join('a%d' % i for i in xrange(3000))
+    expander = braces.BraceExpander(_Words('{%s}{x,{1..2}}' % alts))
+    actual = []
+    while True:
+      w = expander.NextString()
+      if w is None:
+        break
+      actual.append(w)
+    self.assertEqual(9000, len(actual))
+    self.assertEqual(['a0x', 'a01', 'a02', 'a1x'], actual[:4])
+    self.assertEqual('a2999x', actual[-3])
+
+    expander = braces.BraceExpander(_Words('{1..3}{a,b}'), max_words=5)
+    self.assertRaises(error.FatalRuntime, expander.Next)
+    expander = braces.BraceExpander(_Words('{1..3}{a,b}'), max_words=6)
+    self.assertEqual(6, len(braces.BraceExpandWords(expander.words, 6)))
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -22,7 +22,7 @@ from osh import bool_parse
 from osh import word_parse
 from osh import word_eval
 
-from typing import cast, TYPE_CHECKING
+from typing import cast, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import cmd_value__Argv, value__Str
@@ -31,6 +31,7 @@ if TYPE_CHECKING:
   from core.ui import ErrorFormatter
   from core import optview
   from core import state
+  from osh.bool_stat import StatCache
 
 
 class _StringWordEmitter(word_parse.WordEmitter):
@@ -153,12 +154,14 @@ def _ThreeArgs(w_parser):
 
 
 class Test(object):
-  def __init__(self, need_right_bracket, exec_opts, mem, errfmt):
-    # type: (bool, optview.Exec, state.Mem, ErrorFormatter) -> None
+  def __init__(self, need_right_bracket, exec_opts, mem, errfmt,
+               stat_cache=None):
+    # type: (bool, optview.Exec, state.Mem, ErrorFormatter, Optional[StatCache]) -> None
     self.need_right_bracket = need_right_bracket
     self.exec_opts = exec_opts
     self.mem = mem
     self.errfmt = errfmt
+    self.stat_cache = stat_cache
 
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
@@ -226,7 +229,8 @@ class Test(object):
 
     # mem: Don't need it for BASH_REMATCH?  Or I guess you could support it
     word_ev = _WordEvaluator()
-    bool_ev = sh_expr_eval.BoolEvaluator(self.mem, self.exec_opts, None, self.errfmt)
+    bool_ev = sh_expr_eval.BoolEvaluator(self.mem, self.exec_opts, None,
+                                         self.errfmt, self.stat_cache)
 
     # We want [ a -eq a ] to always be an error, unlike [[ a -eq a ]].  This is a
     # weird case of [[ being less strict.
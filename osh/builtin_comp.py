@@ -22,7 +22,7 @@ if TYPE_CHECKING:
   from osh.cmd_eval import CommandEvaluator
   from osh.split import SplitContext
   from osh.word_eval import NormalWordEvaluator
-  from core.state import Mem
+  from core.state import Mem, SearchPath
 
 from mycpp import mylib
 if mylib.PYTHON:
@@ -114,18 +114,21 @@ class SpecBuilder(object):
                word_ev,  # type: NormalWordEvaluator
                splitter,  # type: SplitContext
                comp_lookup,  # type: Lookup
+               search_path,  # type: SearchPath
                ):
     # type: (...) -> None
     """
     Args:
       cmd_ev: CommandEvaluator for compgen -F
       parse_ctx, word_ev, splitter: for compgen -W
+      search_path: its PathIndex is used for compgen -A command
     """
     self.cmd_ev = cmd_ev
     self.parse_ctx = parse_ctx
     self.word_ev = word_ev
     self.splitter = splitter
     self.comp_lookup = comp_lookup
+    self.search_path = search_path
 
   def Build(self, argv, arg, base_opts):
     """Given flags to complete/compgen, return a UserSpec."""
@@ -163,7 +166,7 @@ class SpecBuilder(object):
         actions.append(completion.FileSystemAction(exec_only=True))
 
         # Look on the file system.
-        a = completion.ExternalCommandAction(cmd_ev.mem)
+        a = completion.ExternalCommandAction(self.search_path.index)
 
       elif name == 'directory':
         a = completion.FileSystemAction(dirs_only=True)
@@ -18,10 +18,12 @@ from frontend import reader
 from osh.builtin_pure import ResolveNames
 from mycpp import mylib
 
-from typing import Dict, TYPE_CHECKING
+from typing import Dict, Optional, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.runtime_asdl import cmd_value__Argv
   from _devbuild.gen.syntax_asdl import command__ShFunction
+  from core.line_pager import FilePager, FilePagers
+  from core.parse_cache import CachedFile, ParseCache, _Recorder
   from frontend.parse_lib import ParseContext
   from core import optview
   from core import process
@@ -74,8 +76,9 @@ class Eval(object):
 
 class Source(object):
 
-  def __init__(self, parse_ctx, search_path, cmd_ev, fd_state, errfmt):
-    # type: (ParseContext, state.SearchPath, CommandEvaluator, process.FdState, ui.ErrorFormatter) -> None
+  def __init__(self, parse_ctx, search_path, cmd_ev, fd_state, errfmt,
+               parse_cache=None, pagers=None):
+    # type: (ParseContext, state.SearchPath, CommandEvaluator, process.FdState, ui.ErrorFormatter, Optional[ParseCache], Optional[FilePagers]) -> None
     self.parse_ctx = parse_ctx
     self.arena = parse_ctx.arena
 
@@ -86,6 +89,8 @@ class Source(object):
     self.mem = cmd_ev.mem
 
     self.errfmt = errfmt
+    self.parse_cache = parse_cache  # for shopt -s lst_cache
+    self.pagers = pagers  # so the Arena doesn't keep the file's lines
 
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
@@ -101,14 +106,18 @@ class Source(object):
     if resolved is None:
       resolved = path
     try:
-      f = self.fd_state.Open(resolved)  # Shell can't use descriptors 3-9
+      # Shell can't use descriptors 3-9
+      f, fd = self.fd_state.OpenWithFd(resolved)
     except OSError as e:
       self.errfmt.Print('source %r failed: %s', path, pyutil.strerror_OS(e),
                         span_id=cmd_val.arg_spids[1])
       return 1
 
     try:
-      line_reader = reader.FileLineReader(f, self.arena)
+      pager = None  # type: Optional[FilePager]
+      if self.pagers:
+        pager = self.pagers.ForFile(resolved, fd)
+      line_reader = reader.FileLineReader(f, self.arena, pager=pager)
       c_parser = self.parse_ctx.MakeOshParser(line_reader)
 
       # A sourced module CAN have a new arguments array, but it always shares
@@ -120,7 +129,19 @@ class Source(object):
       src = source.SourcedFile(path, call_spid)
       self.arena.PushSource(src)
       try:
-        status = main_loop.Batch(self.cmd_ev, c_parser, self.arena)
+        cached = None  # type: Optional[CachedFile]
+        recorder = None  # type: Optional[_Recorder]
+        if self.parse_cache and self.cmd_ev.exec_opts.lst_cache():
+          cached = self.parse_cache.Load(resolved, fd)
+          if cached is None:
+            recorder = self.parse_cache.MakeRecorder(resolved, fd, src)
+
+        if cached is None:
+          status = main_loop.Batch(self.cmd_ev, c_parser, self.arena,
+                                   recorder=recorder)
+        else:
+          status = main_loop.BatchNodes(self.cmd_ev, c_parser, self.arena,
+                                        cached)
       finally:
         self.arena.PopSource()
         self.mem.PopSource(source_argv)
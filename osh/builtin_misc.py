@@ -10,14 +10,16 @@ builtin_misc.py - Misc builtins.
 """
 from __future__ import print_function
 
+import stat
 import sys
 import termios  # for read -n
 
 from _devbuild.gen.runtime_asdl import (
-    value_e, scope_e, span_e, cmd_value__Argv
+    value_e, scope_e, span_e, cmd_value, cmd_value__Argv
 )
 from asdl import runtime
 from core import error
+from core import pyutil
 from core import state
 from core import ui
 from core.pyerror import e_usage
@@ -25,6 +27,7 @@ from core.util import log
 from core.vm import _Builtin
 from frontend import args
 from frontend import arg_def
+from frontend import match
 from mycpp import mylib
 from pylib import os_path
 
@@ -38,10 +41,12 @@ if mylib.PYTHON:
   except ImportError:
     help_index = None
 
-from typing import Tuple, Any, Optional, IO, TYPE_CHECKING
+from typing import List, Tuple, Any, Optional, IO, TYPE_CHECKING
 if TYPE_CHECKING:
+  from core.executor import ShellExecutor
   from _devbuild.gen.runtime_asdl import value__Str
   from core.pyutil import _FileResourceLoader
+  from core.optview import Exec
   from core.state import Mem, DirStack
   from core.ui import ErrorFormatter
   from osh.cmd_eval import CommandEvaluator
@@ -145,18 +150,113 @@ if mylib.PYTHON:
   READ_SPEC.ShortFlag('-d', args.String)
 
 
-# sys.stdin.readline() in Python has buffering!  TODO: Rewrite this tight loop
-# in C?  Less garbage probably.
+# sys.stdin.readline() in Python has buffering!  It reads past the end of the
+# line, so commands that share stdin wouldn't see the rest of it.
+#
 # NOTE that dash, mksh, and zsh all read a single byte at a time.  It appears
-# to be required by POSIX?  Could try libc getline and make this an option.
+# to be required by POSIX, since the data after the line belongs to the next
+# reader.  But one syscall per byte dominates 'while read line' loops.  So we
+# use two strategies that preserve the POSIX semantics:
+#
+# 1. If stdin is a regular file, read a block and then lseek() back to just
+#    after the delimiter.  Child processes see the correct file offset.  bash
+#    does this too.
+# 2. Otherwise (pipes, terminals), read one byte at a time.
+#
+# 'shopt -s buffered_read' opts into a third strategy for pipes: keep the bytes
+# after the delimiter in _STDIN_BUF for the next 'read' or 'getline' in this
+# process.  This is only safe when nothing else reads the same pipe, e.g.
+# 'seq 100000 | while read x; do echo $x; done'.  Other processes won't see
+# the buffered bytes, and they're discarded when fd 0 is redirected elsewhere.
+
+_READ_BLOCK_SIZE = 4096
+
+# For reading until EOF
+_READ_ALL_BLOCK_SIZE = 65536
+
+_SEEK_CUR = 1  # for posix.lseek()
+
+
+class _StdinBuffer(object):
+  """Bytes read past the delimiter on a pipe, with shopt -s buffered_read."""
+
+  def __init__(self):
+    # type: () -> None
+    self.file_id = None  # type: Optional[Tuple[int, int]]
+    self.buf = ''
+
+  def Take(self, file_id):
+    # type: (Tuple[int, int]) -> str
+    """Return buffered bytes for the file that stdin is now, and clear them."""
+    if file_id == self.file_id:
+      s = self.buf
+    else:
+      s = ''  # fd 0 was redirected, so what we buffered doesn't apply
+    self.file_id = None
+    self.buf = ''
+    return s
+
+  def Save(self, file_id, s):
+    # type: (Tuple[int, int], str) -> None
+    self.file_id = file_id
+    self.buf = s
+
+
+def _FileId(fd):
+  # type: (int) -> Tuple[int, int]
+  st = posix.fstat(fd)
+  return st.st_dev, st.st_ino
+
+
+_STDIN_BUF = _StdinBuffer()
+
+
+def _ReadLineBuffered(delim_char, first_block, file_id, seekable):
+  # type: (Optional[str], str, Tuple[int, int], bool) -> Tuple[str, bool]
+  """Read a line in blocks, then give back the bytes after the delimiter."""
+  chunks = []
+  block = first_block
+  while True:
+    if not block:
+      block = posix.read(0, _READ_BLOCK_SIZE)
+      if not block:
+        return ''.join(chunks), True  # EOF
+
+    i = block.find(delim_char) if delim_char is not None else -1
+    if i == -1:
+      chunks.append(block)
+      block = ''
+      continue
+
+    chunks.append(block[:i])
+    rest = len(block) - i - 1
+    if rest:
+      if seekable:
+        posix.lseek(0, -rest, _SEEK_CUR)
+      else:
+        _STDIN_BUF.Save(file_id, block[i+1:])
+    return ''.join(chunks), False
+
 
-def ReadLineFromStdin(delim_char):
-  # type: (Optional[str]) -> Tuple[str, bool]
+def ReadLineFromStdin(delim_char, buffered=False):
+  # type: (Optional[str], bool) -> Tuple[str, bool]
   """Read a portion of stdin.
   
   If delim_char is set, read until that delimiter, but don't include it.
   If not set, read a line, and include the newline.
+
+  If buffered is set, a pipe may be read past the delimiter.  See the comment
+  above.
   """
+  st = posix.fstat(0)
+  file_id = (st.st_dev, st.st_ino)
+  pending = _STDIN_BUF.Take(file_id) if buffered else ''
+
+  if stat.S_ISREG(st.st_mode):
+    return _ReadLineBuffered(delim_char, '', file_id, True)
+  if buffered:
+    return _ReadLineBuffered(delim_char, pending, file_id, False)
+
   eof = False
   chars = []
   while True:
@@ -173,11 +273,41 @@ def ReadLineFromStdin(delim_char):
   return ''.join(chars), eof
 
 
+def ReadAllFromStdin(buffered=False):
+  # type: (bool) -> str
+  """Read stdin until EOF in big blocks.
+
+  Nothing is left for the next reader, so any fd can be read this way.
+  """
+  chunks = []  # type: List[str]
+  if buffered:
+    pending = _STDIN_BUF.Take(_FileId(0))
+    if pending:
+      chunks.append(pending)
+  while True:
+    chunk = posix.read(0, _READ_ALL_BLOCK_SIZE)
+    if not chunk:
+      break
+    chunks.append(chunk)
+  return ''.join(chunks)
+
+
+def _TakeBufferedStdin(n):
+  # type: (int) -> str
+  """Return up to n bytes that shopt -s buffered_read read ahead."""
+  file_id = _FileId(0)
+  pending = _STDIN_BUF.Take(file_id)
+  if len(pending) > n:
+    _STDIN_BUF.Save(file_id, pending[n:])
+  return pending[:n]
+
+
 class Read(object):
-  def __init__(self, splitter, mem):
-    # type: (SplitContext, Mem) -> None
+  def __init__(self, splitter, mem, exec_opts):
+    # type: (SplitContext, Mem, Exec) -> None
     self.splitter = splitter
     self.mem = mem
+    self.exec_opts = exec_opts
 
   def Run(self, cmd_val):
     # type: (cmd_value__Argv) -> int
@@ -207,7 +337,9 @@ class Read(object):
         finally:
           termios.tcsetattr(stdin, termios.TCSANOW, orig_attrs)
       else:
-        s_len = 0
+        if self.exec_opts.buffered_read():
+          s = _TakeBufferedStdin(arg.n)
+          arg.n -= len(s)
         while arg.n > 0:
           buf = posix.read(stdin, arg.n)
           # EOF
@@ -243,7 +375,8 @@ class Read(object):
     join_next = False
     status = 0
     while True:
-      line, eof = ReadLineFromStdin(delim_char)
+      line, eof = ReadLineFromStdin(delim_char,
+                                    buffered=self.exec_opts.buffered_read())
 
       if eof:
         # status 1 to terminate loop.  (This is true even though we set
@@ -275,6 +408,175 @@ class Read(object):
     return status
 
 
+if mylib.PYTHON:
+  MAPFILE_SPEC = arg_def.FlagSpec('mapfile')
+  MAPFILE_SPEC.ShortFlag('-t')  # remove the trailing delimiter
+  MAPFILE_SPEC.ShortFlag('-d', args.String)
+  MAPFILE_SPEC.ShortFlag('-n', args.Int)  # max number of lines
+  MAPFILE_SPEC.ShortFlag('-s', args.Int)  # number of lines to skip
+  MAPFILE_SPEC.ShortFlag('-O', args.Int)  # origin: index to start at
+  MAPFILE_SPEC.ShortFlag('-u', args.Int)  # fd to read from
+  MAPFILE_SPEC.ShortFlag('-C', args.String)  # callback
+  MAPFILE_SPEC.ShortFlag('-c', args.Int)  # callback quantum
+
+
+# mapfile usually reads until EOF, so it can use big blocks.
+_MAPFILE_BLOCK_SIZE = 65536
+
+
+def _ReadRecords(fd, delim_char, limit):
+  # type: (int, str, int) -> str
+  """Read up to 'limit' records ending with delim_char, or until EOF if limit
+  is 0.
+
+  Like 'read', it doesn't consume input past the last record, unless it can
+  seek back.
+  """
+  chunks = []  # type: List[str]
+
+  if limit == 0:
+    # We consume everything, so it's safe to read big blocks from any fd.
+    while True:
+      chunk = posix.read(fd, _MAPFILE_BLOCK_SIZE)
+      if not chunk:
+        break
+      chunks.append(chunk)
+    return ''.join(chunks)
+
+  if stat.S_ISREG(posix.fstat(fd).st_mode):
+    n = 0
+    while True:
+      chunk = posix.read(fd, _MAPFILE_BLOCK_SIZE)
+      if not chunk:
+        break
+
+      i = -1
+      while n < limit:
+        i = chunk.find(delim_char, i + 1)
+        if i == -1:
+          break
+        n += 1
+
+      if i == -1:
+        chunks.append(chunk)
+      else:  # found the last record
+        chunks.append(chunk[:i+1])
+        rest = len(chunk) - i - 1
+        if rest:
+          posix.lseek(fd, -rest, _SEEK_CUR)
+        break
+    return ''.join(chunks)
+
+  # Pipes: one byte at a time
+  n = 0
+  while n < limit:
+    c = posix.read(fd, 1)
+    if not c:
+      break
+    chunks.append(c)
+    if c == delim_char:
+      n += 1
+  return ''.join(chunks)
+
+
+def _SplitRecords(s, delim_char, strip):
+  # type: (str, str, bool) -> List[str]
+  """Split in one pass, keeping the delimiter unless strip is set."""
+  records = s.split(delim_char)
+  last = records.pop()  # what's after the final delimiter, often ''
+  if not strip:
+    records = [r + delim_char for r in records]
+  if len(last):
+    records.append(last)
+  return records
+
+
+class MapFile(object):
+  """mapfile / readarray: read lines into an array.
+
+  Unlike a 'while read' loop, the input is read in big blocks and split in one
+  pass.  There's no IFS splitting or backslash processing, like 'read -r'.
+
+  NOTE: The -C callback is run as a command with the index and line appended,
+  rather than being evaluated as a string like in bash.  The array is assigned
+  after all lines are read.
+  """
+
+  def __init__(self, mem, shell_ex, errfmt):
+    # type: (Mem, ShellExecutor, ErrorFormatter) -> None
+    self.mem = mem
+    self.shell_ex = shell_ex
+    self.errfmt = errfmt
+
+  def Run(self, cmd_val):
+    # type: (cmd_value__Argv) -> int
+    arg, i = MAPFILE_SPEC.ParseCmdVal(cmd_val)
+
+    names = cmd_val.argv[i:]
+    if len(names) > 1:
+      e_usage('got extra argument', span_id=cmd_val.arg_spids[i+1])
+    if names:
+      var_name = names[0]
+      if not match.IsValidVarName(var_name):
+        e_usage('got invalid variable name %r' % var_name,
+                span_id=cmd_val.arg_spids[i])
+    else:
+      var_name = 'MAPFILE'
+
+    if arg.d is not None:
+      if len(arg.d):
+        delim_char = arg.d[0]
+      else:
+        delim_char = '\0'  # -d '' delimits by NUL, like read
+    else:
+      delim_char = '\n'
+
+    num_lines = arg.n if arg.n is not None else 0  # 0 means all of them
+    num_skip = arg.s if arg.s is not None else 0
+    origin = arg.O if arg.O is not None else 0
+    if num_lines < 0 or num_skip < 0 or origin < 0:
+      e_usage('expected a non-negative count')
+
+    quantum = arg.c if arg.c is not None else 5000
+    if quantum <= 0:
+      e_usage('invalid callback quantum %d' % quantum)
+
+    fd = arg.u if arg.u is not None else 0
+    limit = num_skip + num_lines if num_lines else 0
+    try:
+      s = _ReadRecords(fd, delim_char, limit)
+    except OSError as e:
+      self.errfmt.Print('mapfile: fd %d: %s', fd, pyutil.strerror_OS(e))
+      return 1
+
+    # bash strings can't contain NUL, so -d '' implies -t
+    strip = bool(arg.t) or delim_char == '\0'
+    lines = _SplitRecords(s, delim_char, strip)
+    if num_skip:
+      lines = lines[num_skip:]
+
+    if arg.C is not None:
+      for j in xrange(quantum - 1, len(lines), quantum):
+        argv = [arg.C, str(origin + j), lines[j]]
+        spids = [cmd_val.arg_spids[0]] * len(argv)
+        self.shell_ex.RunSimpleCommand(cmd_value.Argv(argv, spids), True)
+
+    if arg.O is not None:
+      # Without -O, the array is replaced.  With it, existing elements are kept.
+      val = self.mem.GetVar(var_name)
+      if val.tag == value_e.MaybeStrArray:
+        strs = list(val.strs)
+      else:
+        strs = []
+      if len(strs) < origin:
+        strs.extend([None] * (origin - len(strs)))
+      strs[origin:origin + len(lines)] = lines
+      lines = strs
+
+    state.SetArrayDynamic(self.mem, var_name, lines)
+    return 0
+
+
 if mylib.PYTHON:
   CD_SPEC = arg_def.FlagSpec('cd')
   CD_SPEC.ShortFlag('-L')
@@ -5,6 +5,7 @@ builtin_misc_test.py: Tests for builtin_misc.py
 from __future__ import print_function
 
 import cStringIO
+import os
 import unittest
 # We use native/line_input.c, a fork of readline.c, but this is good enough for
 # unit testing
@@ -38,6 +39,78 @@ class BuiltinTest(unittest.TestCase):
 
       print('---')
 
+  def testReadLineFromStdin(self):
+    PATH = '_tmp/builtin_test_read.txt'
+    long_line = 'x' * 5000  # longer than one block
+    with open(PATH, 'w') as f:
+      f.write('one\ntwo\n%s\nlast' % long_line)
+
+    saved = os.dup(0)
+    try:
+      fd = os.open(PATH, os.O_RDONLY)
+      os.dup2(fd, 0)
+      os.close(fd)
+
+      self.assertEqual(('one', False), builtin_misc.ReadLineFromStdin('\n'))
+      # We read a whole block, but seeked back to just after the newline
+      self.assertEqual(4, os.lseek(0, 0, os.SEEK_CUR))
+      self.assertEqual(('two', False), builtin_misc.ReadLineFromStdin('\n'))
+      self.assertEqual((long_line, False),
+                       builtin_misc.ReadLineFromStdin('\n'))
+      self.assertEqual(('last', True), builtin_misc.ReadLineFromStdin('\n'))
+      self.assertEqual(('', True), builtin_misc.ReadLineFromStdin('\n'))
+
+      # Unbuffered pipe: the rest of the data stays in the pipe
+      r, w = os.pipe()
+      os.write(w, 'a\nb\n')
+      os.close(w)
+      os.dup2(r, 0)
+      os.close(r)
+      self.assertEqual(('a', False), builtin_misc.ReadLineFromStdin('\n'))
+      self.assertEqual('b\n', os.read(0, 100))
+
+      # Buffered pipe: read ahead, and the next call uses what's left over
+      r, w = os.pipe()
+      os.write(w, 'a\x00b\x00c')
+      os.close(w)
+      os.dup2(r, 0)
+      os.close(r)
+      for expected in [('a', False), ('b', False), ('c', True)]:
+        self.assertEqual(
+            expected, builtin_misc.ReadLineFromStdin('\0', buffered=True))
+      self.assertEqual('', builtin_misc._STDIN_BUF.buf)
+
+    finally:
+      os.dup2(saved, 0)
+      os.close(saved)
+
+  def testReadAllFromStdin(self):
+    saved = os.dup(0)
+    try:
+      # Buffered pipe: what 'read' read ahead comes first
+      r, w = os.pipe()
+      os.write(w, 'a\nb\nc')
+      os.close(w)
+      os.dup2(r, 0)
+      os.close(r)
+      self.assertEqual(
+          ('a', False), builtin_misc.ReadLineFromStdin('\n', buffered=True))
+      self.assertEqual('b\nc', builtin_misc.ReadAllFromStdin(buffered=True))
+      self.assertEqual('', builtin_misc.ReadAllFromStdin(buffered=True))
+
+    finally:
+      os.dup2(saved, 0)
+      os.close(saved)
+
+  def testSplitRecords(self):
+    f = builtin_misc._SplitRecords
+    self.assertEqual([], f('', '\n', False))
+    self.assertEqual(['a\n', 'b\n'], f('a\nb\n', '\n', False))
+    self.assertEqual(['a', 'b'], f('a\nb\n', '\n', True))
+    # No trailing delimiter
+    self.assertEqual(['a:', 'b'], f('a:b', ':', False))
+    self.assertEqual(['', 'a'], f('\na', '\n', True))
+
   def testPrintHelp(self):
     # Localization: Optionally  use GNU gettext()?  For help only.  Might be
     # useful in parser error messages too.  Good thing both kinds of code are
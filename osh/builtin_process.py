@@ -117,28 +117,17 @@ class Wait(object):
     arg_count = len(cmd_val.argv)
 
     if arg.n:
-      # wait -n returns the exit status of the JOB.
-      # You don't know WHICH process, which is odd.
-
-      # TODO: this should wait for the next JOB, which may be multiple
-      # processes.
-      # Bash has a wait_for_any_job() function, which loops until the jobs
-      # table changes.
-      #
-      # target_count = self.job_state.NumRunning() - 1
-      # while True:
-      #   if not self.waiter.WaitForOne():
-      #     break
-      #
-      #   if self.job_state.NumRunning == target_count:
-      #     break
-      #    
-      #log('wait next')
-
-      if self.waiter.WaitForOne():
-        return self.waiter.last_status
-      else:
-        return 127  # nothing to wait for
+      # wait -n returns the exit status of the next JOB to finish, which may be
+      # a pipeline.  Like bash, report jobs that finished before 'wait -n' was
+      # called first.
+      while True:
+        job = self.job_state.PopDoneJob()
+        if job is not None:
+          return job.status
+        if self.job_state.NumRunning() == 0:
+          return 127  # nothing to wait for
+        if not self.waiter.WaitForOne():
+          return 127
 
     if arg_index == arg_count:  # no arguments
       #log('wait all')
@@ -155,6 +144,7 @@ class Wait(object):
         if self.job_state.NoneAreRunning():
           break
 
+      self.job_state.RemoveDoneJobs()
       log('Waited for %d processes', i)
       return 0
 
@@ -188,6 +178,7 @@ class Wait(object):
 
       # TODO: Does this wait for pipelines?
       job_status = job.JobWait(self.waiter)
+      self.job_state.WhenReported(job)
 
       UP_job_status = job_status
       with tagswitch(job_status) as case:
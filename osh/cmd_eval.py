@@ -533,9 +533,8 @@ class CommandEvaluator(object):
         # - line numbers for every command would be very nice.  But then you have
         # to print the filename too.
 
-        words = braces.BraceExpandWords(node.words)
         # note: we could catch the 'failglob' exception here and return 1.
-        cmd_val = self.word_ev.EvalWordSequence2(words, allow_assign=True)
+        cmd_val = self.word_ev.EvalWordSequence2(node.words, allow_assign=True)
 
         UP_cmd_val = cmd_val
         if UP_cmd_val.tag_() == cmd_value_e.Argv:
@@ -1044,16 +1043,35 @@ class CommandEvaluator(object):
         self.mem.SetCurrentSpanId(node.spids[0])  # for x in $LINENO
 
         iter_name = node.iter_name
+        iter_list = None  # type: List[str]
+        expander = None  # type: braces.BraceExpander
         if node.do_arg_iter:
           iter_list = self.mem.GetArgv()
         else:
-          words = braces.BraceExpandWords(node.iter_words)
-          iter_list = self.word_ev.EvalWordSequence(words)
+          # For words like {1..100000}, make each string as it's needed,
+          # rather than evaluating them all before the first iteration.
+          expander = self.word_ev.BraceExpander(node.iter_words)
+          if not expander.IsLiteral():
+            expander = None
+            iter_list = self.word_ev.EvalWordSequence(node.iter_words)
 
         status = 0  # in case we don't loop
         self.loop_level += 1
+        i = 0
         try:
-          for x in iter_list:
+          while True:
+            if expander:
+              x = expander.NextString()
+              if x is None:
+                break
+              if len(x) == 0:  # elided like an unquoted empty word
+                continue
+            else:
+              if i == len(iter_list):
+                break
+              x = iter_list[i]
+              i += 1
+
             #log('> ForEach setting %r', x)
             state.SetLocalString(self.mem, iter_name, x)
             #log('<')
@@ -10,15 +10,17 @@ from _devbuild.gen.syntax_asdl import (
     glob_part_e, glob_part, glob_part_t,
     glob_part__Literal, glob_part__Operator, glob_part__CharClass,
 )
-from core.pyutil import stderr_line
 from core import util
 from core.util import log
 from frontend import match
 
-from typing import List, Tuple, cast, TYPE_CHECKING
+import posix_ as posix
+
+from typing import List, Tuple, Optional, cast, TYPE_CHECKING
 if TYPE_CHECKING:
   from core import optview
   from frontend.match import SimpleLexer
+  from osh.bool_stat import StatCache
 
 _ = log
 
@@ -353,14 +355,23 @@ def GlobToERE(pat):
 
 
 class Globber(object):
-  def __init__(self, exec_opts):
-    # type: (optview.Exec) -> None
+  """Expands globs by walking directories, rather than calling glob().
+
+  Each path component is matched against a directory listing, the way glob()
+  does it, so the results are the same.  But we can:
+
+  - reuse directory listings with 'shopt -s stat_cache'.  See
+    bool_stat.StatCache.
+  - implement ** with 'shopt -s globstar'.
+  """
+  def __init__(self, exec_opts, stat_cache=None):
+    # type: (optview.Exec, Optional[StatCache]) -> None
     self.exec_opts = exec_opts
+    self.stat_cache = stat_cache
 
     # Other unimplemented bash options:
     #
     # dotglob           dotfiles are matched
-    # globstar          ** for directories
     # globasciiranges   ascii or unicode char classes (unicode by default)
     # nocaseglob
     # extglob          the !() syntax -- only respected for fnmatch(), not glob
@@ -369,6 +380,135 @@ class Globber(object):
     # do.  Could a default GLOBIGNORE to ignore flags on the file system be
     # part of the security solution?  It doesn't seem totally sound.
 
+  def _ReadDir(self, path):
+    # type: (str) -> Optional[Tuple[List[str], List[str]]]
+    """Returns entry names and subdirectory names, or None."""
+    if len(path) == 0:
+      path = '.'
+    if self.stat_cache and self.exec_opts.stat_cache():
+      return self.stat_cache.ReadDir(path)
+    return libc.read_dir(path)
+
+  def _Lexists(self, path):
+    # type: (str) -> bool
+    """Like glob(), check a literal component with lstat().
+
+    Reading the listing of its directory would need read permission, not just
+    search permission, e.g. for /home/*/.profile.
+    """
+    if self.stat_cache and self.exec_opts.stat_cache():
+      return self.stat_cache.Lstat(path) is not None
+    try:
+      posix.lstat(path)
+    except OSError:
+      return False
+    return True
+
+  def _GlobStar(self, prefix, components, i, out):
+    # type: (str, List[str], int, List[str]) -> None
+    """Match ** against zero or more directories.
+
+    Like bash, we don't descend into hidden directories or symlinks.
+    """
+    n = len(components)
+    last = i == n - 1
+    # **/ at the end matches directories, including symlinks to them
+    only_dirs = i == n - 2 and len(components[n - 1]) == 0
+
+    dirs = [prefix]
+    j = 0
+    while j < len(dirs):
+      d = dirs[j]
+      j += 1
+      listing = self._ReadDir(d)
+      if listing is None:
+        continue
+      names, subdirs = listing
+
+      if last or only_dirs:
+        for name in names:
+          if name.startswith('.'):
+            continue
+          path = d + name
+          if last:
+            out.append(path)
+          elif libc.dir_mtime(path) != -1:
+            out.append(path + '/')
+
+      for name in subdirs:
+        if not name.startswith('.'):
+          dirs.append(d + name + '/')
+
+    if last or only_dirs:
+      # src/** and src/**/ include src/ itself
+      if len(prefix):
+        out.append(prefix)
+      return
+
+    for d in dirs:
+      self._Walk(d, components, i + 1, out)
+
+  def _Walk(self, prefix, components, i, out):
+    # type: (str, List[str], int, List[str]) -> None
+    """Append the paths that match components[i:] under prefix.
+
+    Args:
+      prefix: a directory ending with /, or '' for the current directory
+    """
+    comp = components[i]
+    last = i == len(components) - 1
+
+    if last and len(comp) == 0:  # the pattern ended with /
+      if libc.dir_mtime(prefix) != -1:
+        out.append(prefix)
+      return
+
+    if comp == '**' and self.exec_opts.globstar():
+      self._GlobStar(prefix, components, i, out)
+      return
+
+    if not LooksLikeGlob(comp):
+      name = GlobUnescape(comp)
+      if last:
+        if self._Lexists(prefix + name):
+          out.append(prefix + name)
+      else:
+        # If it's not a directory, reading it or checking under it will fail
+        self._Walk(prefix + name + '/', components, i + 1, out)
+      return
+
+    listing = self._ReadDir(prefix)
+    if listing is None:
+      return
+    names, _ = listing
+    for name in libc.glob_filter(comp, names):
+      if last:
+        out.append(prefix + name)
+      else:
+        self._Walk(prefix + name + '/', components, i + 1, out)
+
+  def _Glob(self, pat):
+    # type: (str) -> List[str]
+    """Return the sorted paths that match a pattern."""
+    components = pat.split('/')
+    results = []  # type: List[str]
+    if len(components[0]) == 0:  # absolute path
+      self._Walk('/', components, 1, results)
+    else:
+      self._Walk('', components, 0, results)
+
+    # Like glob(), we sort by bytes, since it runs in the C locale.
+    results.sort()
+    if not self.exec_opts.globstar() or '**' not in components:
+      return results
+
+    # Patterns like **/**/x can find a path twice
+    out = []  # type: List[str]
+    for path in results:
+      if len(out) == 0 or out[-1] != path:
+        out.append(path)
+    return out
+
   def Expand(self, arg, out):
     # type: (str, List[str]) -> int
     """Given a string that could be a glob, append a list of strings to 'out'.
@@ -385,20 +525,15 @@ class Globber(object):
       out.append(arg)
       return 1
 
-    try:
-      results = libc.glob(arg)
-    except RuntimeError as e:
-      # These errors should be rare: I/O error, out of memory, or unknown
-      # There are no syntax errors.  (But see comment about globerr() in
-      # native/libc.c.)
-      # note: MyPy doesn't know RuntimeError has e.message (and e.args)
-      msg = e.message  # type: str
-      stderr_line("Error expanding glob %r: %s", arg, msg)
-      raise
+    results = self._Glob(arg)
     #log('glob %r -> %r', arg, g)
 
     n = len(results)
     if n:  # Something matched
+      if self.exec_opts.dashglob():
+        out.extend(results)
+        return n
+
       for name in results:
         # Omit files starting with - to solve the --.
         # dash_glob turned OFF with shopt -s oil:basic.
@@ -4,9 +4,17 @@ glob_test.py: Tests for glob.py
 """
 from __future__ import print_function
 
+import os
 import re
+import shutil
+import tempfile
 import unittest
 
+import libc
+
+from _devbuild.gen.option_asdl import option_i
+from core import optview
+from core import state
 from frontend import match
 from osh import glob_
 
@@ -159,5 +167,75 @@ class GlobParserTest(unittest.TestCase):
       print('warnings: %s' % warnings)
 
 
+class GlobberTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp()
+    for path in ['a.c', 'd/b.c', 'd/e/c.c', 'd/e/z', '.h/x.c']:
+      path = os.path.join(self.tmp_dir, path)
+      if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+      open(path, 'w').close()
+    os.symlink('d', os.path.join(self.tmp_dir, 'lnk'))
+
+    self.old_dir = os.getcwd()
+    os.chdir(self.tmp_dir)
+
+    self.opt_array = [False] * option_i.ARRAY_SIZE
+    exec_opts = optview.Exec(self.opt_array, state._ErrExit())
+    self.globber = glob_.Globber(exec_opts)
+
+  def tearDown(self):
+    os.chdir(self.old_dir)
+    shutil.rmtree(self.tmp_dir)
+
+  def _Expand(self, pat):
+    out = []
+    self.globber.Expand(pat, out)
+    return out
+
+  def testSameAsGlob(self):
+    PATTERNS = [
+        '*', '*/', '.*', '*/*.c', 'd/*/c*', '[ad]*', '\\*', 'lnk/*', './*/e',
+        '*/b.c', 'd/e/../*.c', 'nomatch*', '**',
+        os.path.join(self.tmp_dir, 'd/*'),
+    ]
+    for pat in PATTERNS:
+      expected = libc.glob(pat) or [glob_.GlobUnescape(pat)]
+      self.assertEqual(expected, self._Expand(pat), pat)
+
+  def testGlobStar(self):
+    self.opt_array[option_i.globstar] = True
+    CASES = [
+        ('**/*.c', ['a.c', 'd/b.c', 'd/e/c.c']),
+        ('**/**/*.c', ['a.c', 'd/b.c', 'd/e/c.c']),
+        ('**/e', ['d/e']),
+        # Symlinks and hidden dirs aren't searched
+        ('**', ['a.c', 'd', 'd/b.c', 'd/e', 'd/e/c.c', 'd/e/z', 'lnk']),
+        ('**/', ['d/', 'd/e/', 'lnk/']),
+        ('d/**', ['d/', 'd/b.c', 'd/e', 'd/e/c.c', 'd/e/z']),
+        ('lnk/**/c.c', ['lnk/e/c.c']),
+        ('a**', ['a.c']),
+    ]
+    for pat, expected in CASES:
+      self.assertEqual(expected, self._Expand(pat), pat)
+
+  def testSearchOnlyDir(self):
+    # A literal component is checked with lstat(), so it only needs search
+    # permission on its directory.
+    os.mkdir('s')
+    open('s/known', 'w').close()
+    os.symlink('nonexistent', 's/dangling')
+    os.chmod('s', 0o111)
+    try:
+      self.assertEqual(['s/dangling'], self._Expand('s/dangling'))
+      self.assertEqual(['s/known'], self._Expand('*/known'))
+      self.assertEqual(['s/known'], libc.glob('*/known'))
+      if os.geteuid() != 0:  # root can read it anyway
+        self.assertEqual(['s/*'], self._Expand('s/*'))
+    finally:
+      os.chmod('s', 0o755)
+
+
 if __name__ == '__main__':
   unittest.main()
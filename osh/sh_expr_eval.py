@@ -52,6 +52,7 @@ if TYPE_CHECKING:
   from core.state import Mem
   from frontend.parse_lib import ParseContext
   from osh import word_eval
+  from osh.bool_stat import StatCache
 
 _ = log
 
@@ -788,10 +789,18 @@ class BoolEvaluator(ArithEvaluator):
   where x='1+2'
   """
 
-  def __init__(self, mem, exec_opts, parse_ctx, errfmt):
-    # type: (Mem, optview.Exec, ParseContext, ErrorFormatter) -> None
+  def __init__(self, mem, exec_opts, parse_ctx, errfmt, stat_cache=None):
+    # type: (Mem, optview.Exec, ParseContext, ErrorFormatter, Optional[StatCache]) -> None
     ArithEvaluator.__init__(self, mem, exec_opts, parse_ctx, errfmt)
     self.always_strict = False
+    self.stat_cache = stat_cache
+
+  def _StatCache(self):
+    # type: () -> Optional[StatCache]
+    """For file tests, when shopt -s stat_cache is on."""
+    if self.stat_cache and self.exec_opts.stat_cache():
+      return self.stat_cache
+    return None
 
   def Init_AlwaysStrict(self):
     # type: () -> None
@@ -864,7 +873,7 @@ class BoolEvaluator(ArithEvaluator):
         arg_type = consts.BoolArgType(op_id)  # could be static in the LST?
 
         if arg_type == bool_arg_type_e.Path:
-          return bool_stat.DoUnaryOp(op_id, s)
+          return bool_stat.DoUnaryOp(op_id, s, self._StatCache())
 
         if arg_type == bool_arg_type_e.Str:
           if op_id == Id.BoolUnary_z:
@@ -920,7 +929,7 @@ class BoolEvaluator(ArithEvaluator):
         arg_type = consts.BoolArgType(op_id)
 
         if arg_type == bool_arg_type_e.Path:
-          return bool_stat.DoBinaryOp(op_id, s1, s2)
+          return bool_stat.DoBinaryOp(op_id, s1, s2, self._StatCache())
 
         if arg_type == bool_arg_type_e.Int:
           # NOTE: We assume they are constants like [[ 3 -eq 3 ]].
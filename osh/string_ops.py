@@ -16,7 +16,7 @@ from osh import glob_
 
 import libc
 
-from typing import List, Tuple, TYPE_CHECKING
+from typing import List, Optional, Tuple, TYPE_CHECKING
 if TYPE_CHECKING:
   from _devbuild.gen.syntax_asdl import suffix_op__Unary, suffix_op__PatSub
 
@@ -155,6 +155,11 @@ def _PreviousUtf8Char(s, i):
   e_strict(INVALID_START)
 
 
+# Indexed by the negated error code from libc.utf8_count() and
+# libc.utf8_advance(), minus one.
+_UTF8_ERRORS = [INCOMPLETE_CHAR, INVALID_CONT, INVALID_START]
+
+
 def CountUtf8Chars(s):
   # type: (str) -> int
   """Returns the number of utf-8 characters in the byte string 's'.
@@ -167,12 +172,10 @@ def CountUtf8Chars(s):
   $ echo $?
   1
   """
-  num_chars = 0
-  num_bytes = len(s)
-  i = 0
-  while i < num_bytes:
-    i = _NextUtf8Char(s, i)
-    num_chars += 1
+  # Validates and counts in one pass, like calling _NextUtf8Char() in a loop.
+  num_chars = libc.utf8_count(s)
+  if num_chars < 0:
+    e_strict(_UTF8_ERRORS[-num_chars - 1])
   return num_chars
 
 
@@ -182,21 +185,73 @@ def AdvanceUtf8Chars(s, num_chars, byte_offset):
   Advance a certain number of UTF-8 chars, beginning with the given byte
   offset.  Returns a byte offset.
 
-  If we got past the end of the string
+  Neither bash or zsh checks out of bounds for slicing, so this stops at the
+  end of the string.
   """
-  num_bytes = len(s)
-  i = byte_offset  # current byte position
+  i = libc.utf8_advance(s, num_chars, byte_offset)
+  if i < 0:
+    e_strict(_UTF8_ERRORS[-i - 1])
+  return i
 
-  for _ in xrange(num_chars):
-    # Neither bash or zsh checks out of bounds for slicing.  Either begin or
-    # length.
-    if i >= num_bytes:
-      return i
-      #raise RuntimeError('Out of bounds')
 
-    i = _NextUtf8Char(s, i)
+# Only strings at least this long are indexed, and one byte offset is saved
+# every _INDEX_STEP chars.
+_INDEX_MIN_BYTES = 256
+_INDEX_STEP = 64
+
+
+class Utf8Index(object):
+  """Maps char offsets to byte offsets in one string.
+
+  Slicing a string with ${s:i:n} has to find the byte offset of char i, which
+  is O(i).  A loop over ${s:i:1} would be O(n^2), so we save byte offsets
+  along the way, and each slice of the same string advances at most
+  _INDEX_STEP chars.
+  """
+
+  def __init__(self, s):
+    # type: (str) -> None
+    self.s = s
+    self.offsets = [0]  # byte offset of char k * _INDEX_STEP
+    self.done = False  # whether offsets covers the whole string
+
+  def ByteOffset(self, num_chars):
+    # type: (int) -> int
+    """Like AdvanceUtf8Chars(self.s, num_chars, 0)."""
+    k = num_chars // _INDEX_STEP
+    # Only the part of the string that's sliced is validated, like
+    # AdvanceUtf8Chars().
+    while k >= len(self.offsets) and not self.done:
+      last = self.offsets[-1]
+      i = AdvanceUtf8Chars(self.s, _INDEX_STEP, last)
+      if i == len(self.s):
+        self.done = True  # we may not have advanced _INDEX_STEP chars
+      else:
+        self.offsets.append(i)
+
+    if k >= len(self.offsets):
+      k = len(self.offsets) - 1
+    return AdvanceUtf8Chars(self.s, num_chars - k * _INDEX_STEP,
+                            self.offsets[k])
 
-  return i
+
+class Utf8IndexCache(object):
+  """Holds the Utf8Index of the last long string that was sliced."""
+
+  def __init__(self):
+    # type: () -> None
+    self.index = None  # type: Optional[Utf8Index]
+
+  def Get(self, s):
+    # type: (str) -> Optional[Utf8Index]
+    """Returns an index for s, or None if it's too short to need one."""
+    if len(s) < _INDEX_MIN_BYTES:
+      return None
+    # Variables hold the same string object until they're assigned, so an
+    # identity check is enough.
+    if self.index is None or self.index.s is not s:
+      self.index = Utf8Index(s)
+    return self.index
 
 
 # Implementation without Python regex:
@@ -284,15 +339,34 @@ def DoUnarySuffixOp(s, op, arg):
     else:  # e.g. ^ ^^ , ,,
       raise AssertionError(op.op_id)
 
-  # For patterns, do fnmatch() in a loop.
+  # For patterns, translate the glob to a regex, and find where to cut the
+  # string in C, without making a substring for each position.  See
+  # func_regex_strip_pos() in native/libc.c.
   #
-  # TODO:
-  # - Another potential fast path:
-  #   v=aabbccdd
-  #   echo ${v#*b}  # strip shortest prefix
-  #
-  # If the whole thing doesn't match '*b*', then no test can succeed.  So we
-  # can fail early.  Conversely echo ${v%%c*} and '*c*'.
+  # Extended globs like @(a|b) and globs with syntax warnings still use
+  # fnmatch(), which the translation doesn't handle the same way.  So do
+  # strings that aren't valid UTF-8, since . in a regex doesn't match an
+  # invalid byte, but * in fnmatch() does.
+  if (op.op_id in (Id.VOp1_Pound, Id.VOp1_DPound, Id.VOp1_Percent,
+                   Id.VOp1_DPercent) and '(' not in arg and
+      libc.utf8_count(s) >= 0):
+    regex, warnings = glob_.GlobToERE(arg)
+    if len(warnings) == 0:
+      from_end = op.op_id in (Id.VOp1_Percent, Id.VOp1_DPercent)
+      longest = op.op_id in (Id.VOp1_DPound, Id.VOp1_DPercent)
+      try:
+        pos = libc.regex_strip_pos(regex, s, from_end, longest)
+      except RuntimeError:  # e.g. [z-a] is invalid in a regex
+        pos = -2
+      if pos == -1:
+        return s
+      if pos >= 0:
+        if from_end:
+          return s[:pos]
+        else:
+          return s[pos:]
+
+  # Otherwise, do fnmatch() in a loop.
   #
   # (Although honestly this whole construct is nuts and should be deprecated.)
 
@@ -359,18 +433,11 @@ def _AllMatchPositions(s, regex):
   """Returns a list of all (start, end) match positions of the regex against s.
 
   (If there are no matches, it returns the empty list.)
+
+  The regex is compiled once and the loop over matches happens in C, so this
+  is linear in len(s) rather than compiling the regex once per match.
   """
-  matches = []  # type: List[Tuple[int, int]]
-  pos = 0
-  n = len(s)
-  while pos < n:  # needed to prevent infinite loop in (.*) case
-    m = libc.regex_first_group_match(regex, s, pos)
-    if m is None:
-      break
-    matches.append(m)
-    start, end = m
-    pos = end  # advance position
-  return matches
+  return libc.regex_all_group_matches(regex, s)
 
 
 def _PatSubAll(s, regex, replace_str):
@@ -390,9 +457,8 @@ class GlobReplacer(object):
   def __init__(self, regex, replace_str, slash_spid):
     # type: (str, str, int) -> None
 
-    # TODO: It would be nice to cache the compilation of the regex here,
-    # instead of just the string.  That would require more sophisticated use of
-    # the Python/C API in libc.c, which we might want to avoid.
+    # NOTE: The compiled regex is cached by pattern in native/libc.c, so we
+    # only store the string here.
     self.regex = regex
     self.replace_str = replace_str
     self.slash_spid = slash_spid
@@ -410,7 +476,7 @@ class GlobReplacer(object):
       try:
         return _PatSubAll(s, regex, self.replace_str)  # loop over matches
       except RuntimeError as e:
-        # libc.regex_first_group_match raises RuntimeError.
+        # libc.regex_all_group_matches raises RuntimeError.
         # note: MyPy doesn't know RuntimeError has e.message (and e.args)
         msg = e.message  # type: str
         e_die('Error matching regex %r: %s', regex, msg,
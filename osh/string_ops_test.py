@@ -51,6 +51,48 @@ class LibStrTest(unittest.TestCase):
           break
       self.assertEqual(expected_indexes, actual_indexes)
 
+  def testCountAndAdvanceUtf8Chars(self):
+    # Same strings as above.  Errors match calling _NextUtf8Char() in a loop.
+    CASES = [
+        (4, '\x24\xC2\xA2\xE0\xA4\xB9\xF0\x90\x8D\x88'),
+        ('Invalid UTF-8 continuation byte', '\x24\xC2\xA2\xE0\xE0\xA4'),
+        ('Invalid start of UTF-8 character', '\x24\xC2\xA2\xE0\xA4\xA4\xB9'),
+        ('Invalid start of UTF-8 character', '\x24\xC2\xA2\xFF'),
+        ('Incomplete UTF-8 character', '\x24\xF0\x90\x8D'),
+        (0, ''),
+    ]
+    for expected, input_str in CASES:
+      try:
+        actual = string_ops.CountUtf8Chars(input_str)
+      except error.Strict as e:
+        actual = e.msg
+      self.assertEqual(expected, actual, input_str)
+
+    s = '\x24\xC2\xA2\xE0\xA4\xB9\xF0\x90\x8D\x88'
+    self.assertEqual(3, string_ops.AdvanceUtf8Chars(s, 2, 0))
+    self.assertEqual(6, string_ops.AdvanceUtf8Chars(s, 1, 3))
+    self.assertEqual(10, string_ops.AdvanceUtf8Chars(s, 100, 0))
+    self.assertEqual(1, string_ops.AdvanceUtf8Chars('$\xff', 1, 0))
+    self.assertRaises(error.Strict, string_ops.AdvanceUtf8Chars, '$\xff', 2, 0)
+
+  def testUtf8Index(self):
+    s = ''.join('%d\xce\xbc' % i for i in xrange(300))
+    cache = string_ops.Utf8IndexCache()
+    self.assertEqual(None, cache.Get(s[:10]))
+
+    index = cache.Get(s)
+    self.assertEqual(index, cache.Get(s))  # cached
+    n = string_ops.CountUtf8Chars(s)
+    for i in [0, 1, 63, 64, 65, 500, n - 1, n, n + 1, 5000, 64, 0]:
+      self.assertEqual(string_ops.AdvanceUtf8Chars(s, i, 0),
+                       index.ByteOffset(i), i)
+
+    # Like AdvanceUtf8Chars(), only the chars before the offset are validated
+    s = 'x' * 300 + '\xff'
+    index = cache.Get(s)
+    self.assertEqual(300, index.ByteOffset(300))
+    self.assertRaises(error.Strict, index.ByteOffset, 301)
+
   def test_PreviousUtf8Char(self):
     # The error messages could probably be improved for more consistency
     # with NextUtf8Char, at the expense of more complexity.
@@ -11,7 +11,7 @@ from _devbuild.gen.syntax_asdl import (
     word_part__AssocArrayLiteral,
     word_part__EscapedLiteral,
     word_part__TildeSub,
-    word_part__ArithSub, word_part__ExtGlob,
+    word_part__ArithSub, word_part__ExtGlob, word_part__BracedRange,
     word_part__Splice, word_part__FuncCall, word_part__ExprSub,
 
     word_e, word_t, word__BracedTree, word__String,
@@ -193,6 +193,10 @@ def LeftMostSpanForPart(part):
     elif case(word_part_e.BracedTuple):
       return runtime.NO_SPID
 
+    elif case(word_part_e.BracedRange):
+      part = cast(word_part__BracedRange, UP_part)
+      return part.spids[0]
+
     elif case(word_part_e.Splice):
       part = cast(word_part__Splice, UP_part)
       return part.name.span_id
@@ -394,6 +398,44 @@ def TildeDetectAll(words):
   return out
 
 
+def _PartHasNoSideEffects(part):
+  # type: (word_part_t) -> bool
+  UP_part = part
+  with tagswitch(part) as case:
+    if case(word_part_e.Literal, word_part_e.EscapedLiteral,
+            word_part_e.SingleQuoted, word_part_e.SimpleVarSub,
+            word_part_e.TildeSub):
+      return True
+
+    elif case(word_part_e.BracedVarSub):
+      # ${x:=default}, ${a[i++]}, etc. could assign
+      part = cast(braced_var_sub, UP_part)
+      return (part.prefix_op is None and part.bracket_op is None and
+              part.suffix_op is None)
+
+    elif case(word_part_e.DoubleQuoted):
+      part = cast(double_quoted, UP_part)
+      for p in part.parts:
+        if not _PartHasNoSideEffects(p):
+          return False
+      return True
+
+    else:
+      return False
+
+
+def HasNoSideEffects(w):
+  # type: (compound_word) -> bool
+  """Can the word be evaluated in the parent instead of a subshell?
+
+  Used for $(< file).  Evaluating it may still fail, e.g. with set -u.
+  """
+  for part in w.parts:
+    if not _PartHasNoSideEffects(part):
+      return False
+  return True
+
+
 def HasArrayPart(w):
   # type: (compound_word) -> bool
   """Used in cmd_parse."""
@@ -51,6 +51,7 @@ if TYPE_CHECKING:
   from core import optview
   from core.ui import ErrorFormatter
   from core.vm import _Executor
+  from osh.bool_stat import StatCache
   from osh.split import SplitContext
   from core.state import Mem
   from osh import prompt
@@ -225,6 +226,7 @@ def _PerformSlice(val,  # type: value_t
                   has_length,  # type: bool
                   part,  # type: braced_var_sub
                   arg0_val, # type: value__Str
+                  utf8_cache,  # type: string_ops.Utf8IndexCache
                   ):
   # type: (...) -> value_t
   UP_val = val
@@ -243,7 +245,12 @@ def _PerformSlice(val,  # type: value_t
             "The start index of a string slice can't be negative: %d",
             begin, part=part)
 
-      byte_begin = string_ops.AdvanceUtf8Chars(s, begin, 0)
+      # Long strings are indexed, so looping over ${s:i:1} isn't O(n^2).
+      index = utf8_cache.Get(s)
+      if index:
+        byte_begin = index.ByteOffset(begin)
+      else:
+        byte_begin = string_ops.AdvanceUtf8Chars(s, begin, 0)
 
       if has_length:
         if length < 0:
@@ -253,7 +260,10 @@ def _PerformSlice(val,  # type: value_t
               "The length of a string slice can't be negative: %d",
               length, part=part)
 
-        byte_end = string_ops.AdvanceUtf8Chars(s, length, byte_begin)
+        if index:
+          byte_end = index.ByteOffset(begin + length)
+        else:
+          byte_end = string_ops.AdvanceUtf8Chars(s, length, byte_begin)
       else:
         byte_end = len(s)
 
@@ -343,8 +353,15 @@ class AbstractWordEvaluator(StringWordEvaluator):
     EvalWordSequence
     EvalWordSequence2
   """
-  def __init__(self, mem, exec_opts, splitter, errfmt):
-    # type: (Mem, optview.Exec, SplitContext, ErrorFormatter) -> None
+  def __init__(self,
+               mem,  # type: Mem
+               exec_opts,  # type: optview.Exec
+               splitter,  # type: SplitContext
+               errfmt,  # type: ErrorFormatter
+               max_brace_words=0,  # type: int
+               stat_cache=None,  # type: Optional[StatCache]
+               ):
+    # type: (...) -> None
     self.arith_ev = None  # type: sh_expr_eval.ArithEvaluator
     self.expr_ev = None  # type: expr_eval.OilEvaluator
     self.prompt_ev = None  # type: prompt.Evaluator
@@ -354,7 +371,12 @@ class AbstractWordEvaluator(StringWordEvaluator):
     self.splitter = splitter
     self.errfmt = errfmt
 
-    self.globber = glob_.Globber(exec_opts)
+    self.globber = glob_.Globber(exec_opts, stat_cache=stat_cache)
+    self.utf8_cache = string_ops.Utf8IndexCache()
+
+    # osh --max-brace-words: the most words one brace expansion may give.  0
+    # means no limit.
+    self.max_brace_words = max_brace_words
 
   def CheckCircularDeps(self):
     # type: () -> None
@@ -1144,7 +1166,8 @@ class AbstractWordEvaluator(StringWordEvaluator):
             arg0_val = None  # type: value__Str
             if var_name is None: # $* or $@
               arg0_val = self.mem.GetArg0()
-            val = _PerformSlice(val, begin, length, has_length, part, arg0_val)
+            val = _PerformSlice(val, begin, length, has_length, part, arg0_val,
+                                self.utf8_cache)
           except error.Strict as e:
             if self.exec_opts.strict_word_eval():
               raise
@@ -1538,9 +1561,7 @@ class AbstractWordEvaluator(StringWordEvaluator):
       # don't look like assignments.
       if tag == word_part_e.ShArrayLiteral:
         part0 = cast(sh_array_literal, UP_part0)
-        array_words = part0.words
-        words = braces.BraceExpandWords(array_words)
-        strs = self.EvalWordSequence(words)
+        strs = self.EvalWordSequence(part0.words)
         #log('ARRAY LITERAL EVALUATED TO -> %s', strs)
         return value.MaybeStrArray(strs)
 
@@ -1728,26 +1749,39 @@ class AbstractWordEvaluator(StringWordEvaluator):
 
     return cmd_value.Assign(builtin_id, flags, flag_spids, assign_args)
 
+  def BraceExpander(self, words):
+    # type: (List[word_t]) -> braces.BraceExpander
+    return braces.BraceExpander(words, self.max_brace_words)
+
   def StaticEvalWordSequence2(self, words, allow_assign):
-    # type: (List[compound_word], bool) -> cmd_value_t
+    # type: (List[word_t], bool) -> cmd_value_t
     """Static word evaluation for Oil."""
     #log('W %s', words)
     strs = []  # type: List[str]
     spids = []  # type: List[int]
 
-    n = 0
-    for i, w in enumerate(words):
+    expander = self.BraceExpander(words)
+    i = 0
+    while True:
+      w = expander.Next()
+      if w is None:
+        break
+      first = i == 0
+      i += 1
+
       word_spid = word_.LeftMostSpanForWord(w)
 
       # No globbing in the first arg!  That seems like a feature, not a bug.
-      if i == 0:
+      if first:
         strs0 = self._EvalWordToArgv(w)  # respects strict-array
         if len(strs0) == 1:
           arg0 = strs0[0]
           builtin_id = consts.LookupAssignBuiltin(arg0)
           if builtin_id != consts.NO_INDEX:
             # Same logic as legacy word eval, with no splitting
-            return self._EvalAssignBuiltin(builtin_id, arg0, words)
+            return self._EvalAssignBuiltin(
+                builtin_id, arg0,
+                braces.BraceExpandWords(words, self.max_brace_words))
 
         strs.extend(strs0)
         for _ in strs0:
@@ -1790,13 +1824,13 @@ class AbstractWordEvaluator(StringWordEvaluator):
     return cmd_value.Argv(strs, spids, None)
 
   def EvalWordSequence2(self, words, allow_assign=False):
-    # type: (List[compound_word], bool) -> cmd_value_t
+    # type: (List[word_t], bool) -> cmd_value_t
     """Turns a list of Words into a list of strings.
 
     Unlike the EvalWord*() methods, it does globbing.
 
     Args:
-      words: list of Word instances
+      words: list of Word instances, which may need brace expansion
 
     Returns:
       argv: list of string arguments, or None if there was an eval error
@@ -1805,7 +1839,7 @@ class AbstractWordEvaluator(StringWordEvaluator):
       return self.StaticEvalWordSequence2(words, allow_assign)
 
     # Parse time:
-    # 1. brace expansion.  TODO: Do at parse time.
+    # 1. brace detection.  Expansion is done lazily here, one word at a time.
     # 2. Tilde detection.  DONE at parse time.  Only if Id.Lit_Tilde is the
     # first WordPart.
     #
@@ -1821,7 +1855,15 @@ class AbstractWordEvaluator(StringWordEvaluator):
     spids = []  # type: List[int]
 
     n = 0
-    for i, w in enumerate(words):
+    expander = self.BraceExpander(words)
+    i = 0
+    while True:
+      w = expander.Next()
+      if w is None:
+        break
+      first = i == 0
+      i += 1
+
       part_vals = []  # type: List[part_value_t]
       self._EvalWordToParts(w, False, part_vals)  # not double quoted
 
@@ -1835,7 +1877,7 @@ class AbstractWordEvaluator(StringWordEvaluator):
       # But we don't want to evaluate the first word twice in the case of:
       #   $(some-command) --flag
 
-      if allow_assign and i == 0 and len(part_vals) == 1:
+      if allow_assign and first and len(part_vals) == 1:
         val0 = part_vals[0]
         UP_val0 = val0
         if val0.tag_() == part_value_e.String:
@@ -1843,7 +1885,9 @@ class AbstractWordEvaluator(StringWordEvaluator):
           if not val0.quoted:
             builtin_id = consts.LookupAssignBuiltin(val0.s)
             if builtin_id != consts.NO_INDEX:
-              return self._EvalAssignBuiltin(builtin_id, val0.s, words)
+              return self._EvalAssignBuiltin(
+                  builtin_id, val0.s,
+                  braces.BraceExpandWords(words, self.max_brace_words))
 
       if 0:
         log('')
@@ -1875,7 +1919,7 @@ class AbstractWordEvaluator(StringWordEvaluator):
     return cmd_value.Argv(strs, spids, None)
 
   def EvalWordSequence(self, words):
-    # type: (List[compound_word]) -> List[str]
+    # type: (List[word_t]) -> List[str]
     """For arrays and for loops.  They don't allow assignment builtins."""
     UP_cmd_val = self.EvalWordSequence2(words)
 
@@ -1900,9 +1944,18 @@ def _SplitAssignArg(arg, w):
 
 class NormalWordEvaluator(AbstractWordEvaluator):
 
-  def __init__(self, mem, exec_opts, splitter, errfmt):
-    # type: (Mem, optview.Exec, SplitContext, ErrorFormatter) -> None
-    AbstractWordEvaluator.__init__(self, mem, exec_opts, splitter, errfmt)
+  def __init__(self,
+               mem,  # type: Mem
+               exec_opts,  # type: optview.Exec
+               splitter,  # type: SplitContext
+               errfmt,  # type: ErrorFormatter
+               max_brace_words=0,  # type: int
+               stat_cache=None,  # type: Optional[StatCache]
+               ):
+    # type: (...) -> None
+    AbstractWordEvaluator.__init__(self, mem, exec_opts, splitter, errfmt,
+                                   max_brace_words=max_brace_words,
+                                   stat_cache=stat_cache)
     self.shell_ex = None  # type: _Executor
 
   def CheckCircularDeps(self):
@@ -96,6 +96,21 @@ class WordTest(unittest.TestCase):
     #w = assertReadWord(self, 'a[x]=(1 2 3)')
     #w = assertReadWord(self, 'a[x]+=(1 2 3)')
 
+  def testHasNoSideEffects(self):
+    CASES = [
+        ('foo.txt', True),
+        ("'foo'\\$x", True),
+        ('"$dir/${name}.txt"', True),
+        ('~/foo', True),
+        ('${x:=foo}', False),
+        ('"${a[i++]}"', False),
+        ('$(echo foo)', False),
+        ('$((i++))', False),
+    ]
+    for word_str, expected in CASES:
+      w = word_parse_test._assertReadWord(self, word_str)
+      self.assertEqual(expected, word_.HasNoSideEffects(w), word_str)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -29,6 +29,17 @@ if TYPE_CHECKING:
   dfa_t = Tuple[states_t, first_t]
 
 
+# Actions in Grammar.actions.  The low 2 bits are the kind of action, and the
+# rest are its arguments.  See make_actions() in pgen.py.
+ACTION_ERROR = 0  # no transition on this label
+ACTION_SHIFT = 1  # state << 2 | ACTION_SHIFT
+ACTION_PUSH = 2  # nonterminal << 16 | state << 2 | ACTION_PUSH
+ACTION_POP = 3  # leave an accepting state and try again in the caller
+
+ACTION_KIND_MASK = 0x3
+ACTION_STATE_MASK = 0x3fff  # after shifting right by 2
+
+
 class Grammar(object):
     """Pgen parsing tables conversion class.
 
@@ -78,6 +89,17 @@ class Grammar(object):
                      Oil patch: this became List[int] where int is the
                      token/symbol number.
 
+    actions       -- Oil patch: a dict mapping symbol numbers to dense
+                     action tables.  actions[symbol][state][ilabel] is
+                     the ACTION_* to take on that label, so the parser
+                     does one lookup per token instead of scanning
+                     arcs and first sets.
+
+    accept_only   -- Oil patch: a dict mapping symbol numbers to a list
+                     of booleans, one per state.  True means the only
+                     arc is the final (0, j) arc, so the parser pops
+                     immediately.
+
     start         -- the number of the grammar's start symbol.
 
     keywords      -- a dict mapping keyword strings to arc labels.
@@ -105,6 +127,8 @@ class Grammar(object):
         self.keywords = {}  # type: Dict[str, int]
         self.tokens = {}  # type: Dict[int, int]
         self.symbol2label = {}  # type: Dict[str, int]
+        self.actions = {}  # type: Dict[int, List[List[int]]]
+        self.accept_only = {}  # type: Dict[int, List[bool]]
         self.start = 256
 
     if mylib.PYTHON:
@@ -139,6 +163,8 @@ class Grammar(object):
             self.keywords,
             tokens,
             self.symbol2label,
+            self.actions,
+            self.accept_only,
             self.start,
           )  # tuple
           marshal.dump(payload, f)  # version 2 is latest
@@ -173,7 +199,7 @@ namespace grammar_nt {
 }  // namespace grammar_nt
 """)
 
-      MARSHAL_HEADER = 'PGEN2\n'  # arbitrary header
+      MARSHAL_HEADER = 'PGEN2.1\n'  # arbitrary header, changed with the tables
 
       def loads(self, s):
           # type: (str) -> None
@@ -195,6 +221,8 @@ namespace grammar_nt {
             self.keywords,
             self.tokens,
             self.symbol2label,
+            self.actions,
+            self.accept_only,
             self.start,
           ) = payload
           #self.report()
@@ -209,6 +237,7 @@ namespace grammar_nt {
           log("number2symbol: %d entries", len(self.number2symbol))
           log("states: %d entries", len(self.states))
           log("dfas: %d entries", len(self.dfas))
+          log("actions: %d entries", len(self.actions))
           return
           from pprint import pprint
           print("labels")
@@ -13,11 +13,14 @@ from core.util import log
 _ = log
 
 from typing import TYPE_CHECKING, Optional, Any, List
+from pgen2.grammar import (
+    ACTION_SHIFT, ACTION_PUSH, ACTION_POP, ACTION_KIND_MASK, ACTION_STATE_MASK
+)
 from pgen2.pnode import PNode
 
 if TYPE_CHECKING:
   from _devbuild.gen.syntax_asdl import Token
-  from pgen2.grammar import Grammar, dfa_t
+  from pgen2.grammar import Grammar
 
 
 class ParseError(Exception):
@@ -35,9 +38,10 @@ class ParseError(Exception):
 
 
 class _StackItem(object):
-  def __init__(self, dfa, state, node):
-    # type: (dfa_t, int, PNode) -> None
-    self.dfa = dfa
+  def __init__(self, actions, accept_only, state, node):
+    # type: (List[List[int]], List[bool], int, PNode) -> None
+    self.actions = actions
+    self.accept_only = accept_only
     self.state = state
     self.node = node
 
@@ -107,8 +111,9 @@ class Parser(object):
         state determined by the (implicit or explicit) start symbol.
         """
         newnode = PNode(start, None, [])
-        # Each stack entry is a tuple: (dfa, state, node).
-        self.stack = [_StackItem(self.grammar.dfas[start], 0, newnode)]
+        # Each stack entry is a (actions, accept_only, state, node) record.
+        self.stack = [_StackItem(self.grammar.actions[start],
+                                 self.grammar.accept_only[start], 0, newnode)]
         self.rootnode = None  # type: Optional[PNode]
 
     def addtoken(self, typ, opaque, ilabel):
@@ -116,70 +121,51 @@ class Parser(object):
         """Add a token; return True iff this is the end of the program."""
         # Loop until the token is shifted; may raise exceptions
 
-        # Andy NOTE: This is not linear time, i.e. a constant amount of work
-        # for each token?  Is it O(n^2) as the ANTLR paper says?
-        # Do the "accelerators" in pgen.c have anything to do with it?
+        # Oil patch: Instead of scanning the arcs of the current state and the
+        # first sets of nonterminals, look up the action in the dense tables
+        # emitted by pgen.  Each loop iteration is constant time.
 
         while True:
             top = self.stack[-1]
-            states, _ = top.dfa
-            state = top.state
-
-            arcs = states[state]
-
-            # Look for a state with this label
-            found = False
-            for ilab, newstate in arcs:
-                t = self.grammar.labels[ilab]
-                if ilabel == ilab:
-                    # Look it up in the list of labels
-                    assert t < 256, t
-                    # Shift a token; we're done with it
-                    self.shift(typ, opaque, newstate)
-                    # Pop while we are in an accept-only state
-                    state = newstate
-                     
-                    # TODO: Does this condition translate?
-                    while states[state] == [(0, state)]:
-                        self.pop()
-                        if len(self.stack) == 0:
-                            # Done parsing!
-                            return True
-                        top = self.stack[-1]
-                        states, _ = top.dfa
-                        state = top.state
-
-                    # Done with this token
-                    return False
-                elif t >= 256:
-                    # See if it's a symbol and if we're in its first set
-                    itsdfa = self.grammar.dfas[t]
-                    _, itsfirst = itsdfa
-                    if ilabel in itsfirst:
-                        # Push a symbol
-                        self.push(t, opaque, self.grammar.dfas[t], newstate)
-                        found = True
-                        break # To continue the outer while loop
-
-            if not found:
-                # Note: this condition was rewritten for mycpp tarnslation.
-                # if (0, state) in arcs:
-                #   ...
-                # else:
-                #   ...
-                found2 = False
-                for left, right in arcs:
-                    if left == 0 and right == state:
-                        # An accepting state, pop it and try something else
-                        self.pop()
-                        if len(self.stack) == 0:
-                            # Done parsing, but another token is input
-                            raise ParseError("too much input", typ, opaque)
-                        found2 = True
-
-                if not found2:
-                    # No success finding a transition
-                    raise ParseError("bad input", typ, opaque)
+            action = top.actions[top.state][ilabel]
+            kind = action & ACTION_KIND_MASK
+
+            if kind == ACTION_SHIFT:
+                # Shift a token; we're done with it
+                newstate = action >> 2
+                self.shift(typ, opaque, newstate)
+
+                # Pop while we are in an accept-only state
+                accept_only = top.accept_only
+                state = newstate
+                while accept_only[state]:
+                    self.pop()
+                    if len(self.stack) == 0:
+                        # Done parsing!
+                        return True
+                    top = self.stack[-1]
+                    accept_only = top.accept_only
+                    state = top.state
+
+                # Done with this token
+                return False
+
+            elif kind == ACTION_PUSH:
+                # Push a symbol, and continue the loop
+                t = action >> 16
+                newstate = (action >> 2) & ACTION_STATE_MASK
+                self.push(t, opaque, newstate)
+
+            elif kind == ACTION_POP:
+                # An accepting state, pop it and try something else
+                self.pop()
+                if len(self.stack) == 0:
+                    # Done parsing, but another token is input
+                    raise ParseError("too much input", typ, opaque)
+
+            else:
+                # No success finding a transition
+                raise ParseError("bad input", typ, opaque)
 
     def shift(self, typ, opaque, newstate):
         # type: (int, Token, int) -> None
@@ -190,13 +176,14 @@ class Parser(object):
             top.node.children.append(newnode)
         self.stack[-1].state = newstate
 
-    def push(self, typ, opaque, newdfa, newstate):
-        # type: (int, Token, dfa_t, int) -> None
+    def push(self, typ, opaque, newstate):
+        # type: (int, Token, int) -> None
         """Push a nonterminal.  (Internal)"""
         top = self.stack[-1]
         newnode = PNode(typ, opaque, [])
         self.stack[-1].state = newstate
-        self.stack.append(_StackItem(newdfa, 0, newnode))
+        self.stack.append(_StackItem(self.grammar.actions[typ],
+                                     self.grammar.accept_only[typ], 0, newnode))
 
     def pop(self):
         # type: () -> None
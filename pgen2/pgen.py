@@ -384,6 +384,43 @@ def make_first(tok_def, rawfirst, gr):
     return first
 
 
+def make_actions(gr):
+    """Fill in gr.actions and gr.accept_only from the DFAs and first sets.
+
+    Each state gets a row indexed by ilabel, so Parser.addtoken() doesn't
+    have to scan arcs.  As in the scan, an earlier arc wins.
+    """
+    num_labels = len(gr.labels)
+    for symbol, (states, _) in gr.dfas.items():
+        rows = []
+        accept_only = []
+        for state, arcs in enumerate(states):
+            isfinal = (0, state) in arcs
+            default = grammar.ACTION_POP if isfinal else grammar.ACTION_ERROR
+            row = [default] * num_labels
+            assigned = set()
+            for ilab, newstate in arcs:
+                if ilab == 0:
+                    continue
+                assert newstate <= grammar.ACTION_STATE_MASK, newstate
+                t = gr.labels[ilab]
+                if t < 256:
+                    targets = [ilab]
+                    action = newstate << 2 | grammar.ACTION_SHIFT
+                else:
+                    _, itsfirst = gr.dfas[t]
+                    targets = sorted(itsfirst)
+                    action = t << 16 | newstate << 2 | grammar.ACTION_PUSH
+                for ilabel in targets:
+                    if ilabel not in assigned:
+                        row[ilabel] = action
+                        assigned.add(ilabel)
+            rows.append(row)
+            accept_only.append(arcs == [(0, state)])
+        gr.actions[symbol] = rows
+        gr.accept_only[symbol] = accept_only
+
+
 def MakeGrammar(f, tok_def=None):
   """Construct a Grammar object from a file."""
 
@@ -425,4 +462,5 @@ def MakeGrammar(f, tok_def=None):
       gr.dfas[gr.symbol2number[name]] = (states, fi)
 
   gr.start = gr.symbol2number[startsymbol]
+  make_actions(gr)
   return gr
@@ -110,6 +110,31 @@ echo "status=$?"
 ## N-I dash stdout-json: "status=2\nstatus=2\n"
 ## N-I mksh stdout-json: "status=1\nstatus=1\n"
 
+#### wait -n reports jobs that already finished
+{ exit 4; } &
+{ sleep 0.1; exit 5; } &
+sleep 0.2
+wait -n
+echo "status=$?"
+wait -n
+echo "status=$?"
+wait -n
+echo "status=$?"
+## stdout-json: "status=4\nstatus=5\nstatus=127\n"
+## N-I dash stdout-json: "status=2\nstatus=2\nstatus=2\n"
+## N-I mksh stdout-json: "status=1\nstatus=1\nstatus=1\n"
+
+#### wait -n waits for a whole pipeline
+{ sleep 0.1; exit 6; } | { sleep 0.2; exit 7; } &
+{ sleep 0.05; exit 8; } &
+wait -n
+echo "status=$?"
+wait -n
+echo "status=$?"
+## stdout-json: "status=8\nstatus=7\n"
+## N-I dash stdout-json: "status=2\nstatus=2\n"
+## N-I mksh stdout-json: "status=1\nstatus=1\n"
+
 #### Async for loop
 for i in 1 2 3; do
   echo $i
@@ -1,7 +1,6 @@
 #!/bin/bash
 #
 # echo, read, mapfile
-# TODO mapfile options: -c, -C, -u, etc.
 
 #### echo dashes
 echo -
@@ -675,3 +674,70 @@ n=3
 [a7]
 ## END
 ## N-I dash/mksh/zsh/ash stdout-json: ""
+
+#### mapfile -n on a regular file leaves the rest for the next reader
+type mapfile >/dev/null 2>&1 || exit 0
+printf '%s\n' a{0..5} > $TMP/mapfile-n.txt
+{
+  mapfile -n 2 -t arr
+  read -r next
+  mapfile -t rest
+} < $TMP/mapfile-n.txt
+echo "${arr[@]} / $next / ${rest[@]}"
+## STDOUT:
+a0 a1 / a2 / a3 a4 a5
+## END
+## N-I dash/mksh/zsh/ash stdout-json: ""
+
+#### mapfile -n on a pipe leaves the rest for the next reader
+type mapfile >/dev/null 2>&1 || exit 0
+printf '%s\n' a{0..5} | {
+  mapfile -n 2 -t arr
+  read -r next
+  echo "${arr[@]} / $next"
+  cat
+}
+## STDOUT:
+a0 a1 / a2
+a3
+a4
+a5
+## END
+## N-I dash/mksh/zsh/ash stdout-json: ""
+
+#### mapfile -u fd
+type mapfile >/dev/null 2>&1 || exit 0
+printf '%s\n' a b c > $TMP/mapfile-u.txt
+mapfile -u 3 -t arr 3< $TMP/mapfile-u.txt
+echo "n=${#arr[@]}" "${arr[@]}"
+## STDOUT:
+n=3 a b c
+## END
+## N-I dash/mksh/zsh/ash stdout-json: ""
+
+#### mapfile -C callback -c quantum
+type mapfile >/dev/null 2>&1 || exit 0
+f() { echo "callback $1 $2"; }
+seq 7 | {
+  mapfile -t -C f -c 3 arr
+  echo "n=${#arr[@]}"
+}
+## STDOUT:
+callback 2 3
+callback 5 6
+n=7
+## END
+## N-I dash/mksh/zsh/ash stdout-json: ""
+
+#### mapfile with no trailing delimiter
+type mapfile >/dev/null 2>&1 || exit 0
+printf 'a\nb' | {
+  mapfile arr
+  printf '[%s]\n' "${arr[@]}"
+}
+## STDOUT:
+[a
+]
+[b]
+## END
+## N-I dash/mksh/zsh/ash stdout-json: ""
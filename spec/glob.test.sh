@@ -315,3 +315,30 @@ other
 other
 ## END
 
+
+#### shopt -s globstar
+mkdir -p $TMP/globstar/d/e $TMP/globstar/.h
+cd $TMP/globstar
+touch a.c d/b.c d/e/c.c d/e/z .h/x.c
+
+shopt -s globstar
+echo **/*.c
+echo **/
+echo d/**
+echo **/e
+shopt -u globstar
+echo **/*.c
+## STDOUT:
+a.c d/b.c d/e/c.c
+d/ d/e/
+d/ d/b.c d/e d/e/c.c d/e/z
+d/e
+d/b.c
+## END
+## N-I dash/mksh/ash STDOUT:
+d/b.c
+d/
+d/b.c d/e
+d/e
+d/b.c
+## END
@@ -90,3 +90,36 @@ repr y
 pipeline status = 1
 ## END
 
+
+#### json read -lines reads one record per call
+cat > $TMP/lines.txt <<'JSON'
+{"age": 1}
+
+[2, 3]
+"four"
+JSON
+while json read -lines :rec; do
+  json write -pretty=0 :rec
+done < $TMP/lines.txt
+echo status=$?
+## STDOUT:
+{"age":1}
+[2,3]
+"four"
+status=0
+## END
+
+#### json read -lines leaves the rest of the input
+printf '{"a": 1}\n{"b": 2}\n' > $TMP/two.txt
+{ json read -lines :x; cat; } < $TMP/two.txt
+json write -pretty=0 :x
+## STDOUT:
+{"b": 2}
+{"a":1}
+## END
+
+#### json read -lines with invalid JSON
+printf '{"a": 1}\n{\n' | while json read -lines :x; do echo ok; done
+## STDOUT:
+ok
+## END
@@ -78,3 +78,50 @@ index groups 0
 index ZZZ 1
 ## END
 
+
+#### --max-capture
+$SH --max-capture 10 -c 'x=$(echo 123456789); echo "[$x]"'
+echo status=$?
+$SH --max-capture 10 -c 'x=$(echo 1234567890); echo "[$x]"'
+echo status=$?
+## STDOUT:
+[123456789]
+status=0
+status=1
+## END
+
+#### stat_cache isn't used while the other side of a pipeline runs
+shopt -s stat_cache
+cd $TMP
+rm -f stat-cache-f
+{ sleep 0.3; touch stat-cache-f; echo go; } | {
+  [[ -f stat-cache-f ]] || echo absent
+  read line
+  [[ -f stat-cache-f ]] && echo present
+}
+## STDOUT:
+absent
+present
+## END
+
+#### --jobs limits the number of background jobs that run at once
+rm -f $TMP/jobs.log
+$SH --jobs 2 -c '
+log=$1
+for i in 1 2 3 4 5 6; do
+  { echo start >> $log; sleep 0.1; echo end >> $log; } &
+done
+wait
+jobs
+' dummy $TMP/jobs.log
+# The most jobs that were running at the same time
+awk '/start/ { n++; if (n > max) max = n } /end/ { n-- } END { print "max=" max }' \
+  $TMP/jobs.log
+grep -c start $TMP/jobs.log
+## STDOUT:
+Jobs:
+
+Processes:
+max=2
+6
+## END
@@ -460,6 +460,13 @@ FOO
 ## END
 ## N-I dash/ash/yash stdout-json: "\n"
 
+#### $(< file) with nonexistent file
+foo=$(< $TMP/nonexistent)
+echo status=$? "[$foo]"
+## stdout: status=1 []
+## OK dash stdout: status=2 []
+## N-I ash/yash stdout: status=0 []
+
 #### $(< file) with more statements
 
 # note that it doesn't do this without a command sub!
@@ -299,6 +299,23 @@ argv.py "${x%%}"
 ['\xce\xbcabc\xce\xbc']
 ## END
 
+#### strip with invalid utf-8
+s=$(printf '11*\377b/')
+argv.py "${s%%*}"
+s=$(printf '\377ab')
+argv.py "${s%b}"
+argv.py "${s#*a}"
+## STDOUT:
+['']
+['\xffa']
+['b']
+## END
+## OK osh status: 1
+## OK osh STDOUT:
+['']
+['\xffa']
+## END
+
 #### Strip Right Brace (#702)
 var='$foo'
 echo 1 "${var#$foo}"
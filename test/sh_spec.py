@@ -51,6 +51,7 @@ world
 import collections
 import cgi
 import cStringIO
+import itertools
 import json
 import optparse
 import os
@@ -60,6 +61,7 @@ import shutil
 import subprocess
 import sys
 import time
+from multiprocessing.pool import ThreadPool
 
 from doctools import html_head
 
@@ -541,6 +543,69 @@ class Stats(object):
 
 PIPE = subprocess.PIPE
 
+
+class _Task(object):
+  """One test case to run in one shell."""
+
+  def __init__(self, case_num, sh_label, argv, env, tmp_dir, code,
+               timeout_file):
+    self.case_num = case_num
+    self.sh_label = sh_label
+    self.argv = argv
+    self.env = env
+    self.tmp_dir = tmp_dir
+    self.code = code
+    self.timeout_file = timeout_file
+
+  def __repr__(self):
+    return '<_Task %d %s>' % (self.case_num, self.sh_label)
+
+
+def _RunTask(task, opts):
+  """Run a shell on the code of a case.  May be called from a worker thread.
+
+  Returns:
+    The task, and a dict with the stdout, stderr, and status.
+  """
+  if opts.trace:
+    log('\t%s', ' '.join(task.argv))
+
+  if opts.jobs > 1:  # A fresh dir per task; see RunCases()
+    if os.path.exists(task.tmp_dir):
+      shutil.rmtree(task.tmp_dir)
+    os.mkdir(task.tmp_dir)
+  elif opts.rm_tmp:  # Remove BEFORE the test case runs.
+    shutil.rmtree(task.tmp_dir)
+    os.mkdir(task.tmp_dir)
+
+  cwd = task.tmp_dir if opts.cd_tmp else None
+
+  try:
+    # With threads, close_fds keeps another task's pipes from leaking into
+    # this child, which would delay EOF on them.
+    p = subprocess.Popen(task.argv, env=task.env, cwd=cwd,
+                         stdin=PIPE, stdout=PIPE, stderr=PIPE,
+                         close_fds=opts.jobs > 1)
+  except OSError as e:
+    print('Error running %r: %s' % (task.argv, e), file=sys.stderr)
+    # sys.exit() in a worker thread would only end the thread
+    os._exit(1)
+
+  # communicate() avoids a deadlock when the child fills the stderr pipe
+  # while we're blocked reading stdout.
+  stdout, stderr = p.communicate(task.code)
+
+  actual = {}
+  actual['stdout'] = stdout
+  actual['stderr'] = stderr
+  actual['status'] = p.returncode
+
+  if opts.jobs > 1 and os.path.exists(task.tmp_dir):
+    shutil.rmtree(task.tmp_dir, ignore_errors=True)
+
+  return task, actual
+
+
 def RunCases(cases, case_predicate, shells, env, out, opts):
   """
   Run a list of test 'cases' for all 'shells' and write output to 'out'.
@@ -581,15 +646,10 @@ def RunCases(cases, case_predicate, shells, env, out, opts):
   except OSError:
     pass
 
-  # Now run each case, and print a table.
+  # First make a task for each (case, shell) pair that should run.
+  run_cases = []  # (i, case)
+  tasks = []
   for i, case in enumerate(cases):
-    line_num = case['line_num']
-    desc = case['desc']
-    code = case['code']
-
-    if opts.trace:
-      log('case %d: %s', i, desc)
-
     if not case_predicate(i, case):
       stats.Inc('num_skipped')
       continue
@@ -600,9 +660,7 @@ def RunCases(cases, case_predicate, shells, env, out, opts):
       print()
       continue
 
-    stats.Inc('num_cases_run')
-
-    result_row = []
+    run_cases.append((i, case))
 
     for shell_index, (sh_label, sh_path) in enumerate(shells):
       timeout_file = os.path.join(timeout_dir, '%s-%d' % (sh_label, i))
@@ -635,40 +693,50 @@ def RunCases(cases, case_predicate, shells, env, out, opts):
       if opts.posix and sh_label != 'dash':
         argv.extend(['-o', 'posix'])
 
-      if opts.trace:
-        log('\t%s', ' '.join(argv))
-
-      if opts.rm_tmp:  # Remove BEFORE the test case runs.
-        shutil.rmtree(env['TMP'])
-        os.mkdir(env['TMP'])
-
-      cwd = env['TMP'] if opts.cd_tmp else None
-
       case_env = sh_env[shell_index]
       if opts.pyann_out_dir:
         case_env = dict(case_env)
         case_env['PYANN_OUT'] = os.path.join(
             opts.pyann_out_dir, '%d.json' % i)
 
-      try:
-        p = subprocess.Popen(argv, env=case_env, cwd=cwd,
-                             stdin=PIPE, stdout=PIPE, stderr=PIPE)
-      except OSError as e:
-        print('Error running %r: %s' % (sh_path, e), file=sys.stderr)
-        sys.exit(1)
+      if opts.jobs > 1:
+        # Concurrent cases can't share $TMP, so each one gets a fresh dir.
+        tmp_dir = os.path.join(env['TMP'], 'job-%s-%d' % (sh_label, i))
+        case_env = dict(case_env)
+        case_env['TMP'] = tmp_dir
+      else:
+        tmp_dir = env.get('TMP')
+
+      tasks.append(_Task(i, sh_label, argv, case_env, tmp_dir,
+                         case['code'], timeout_file))
+
+  # Run them, serially or in a pool.  Either way, results come back in order,
+  # so the output is deterministic.
+  run_task = lambda task: _RunTask(task, opts)
+  if opts.jobs > 1:
+    pool = ThreadPool(opts.jobs)  # the work is done by child processes
+    results = pool.imap(run_task, tasks)
+  else:
+    pool = None
+    results = itertools.imap(run_task, tasks)
+
+  # Now check each result, and print a table.
+  for i, case in run_cases:
+    line_num = case['line_num']
+    desc = case['desc']
+
+    if opts.trace:
+      log('case %d: %s', i, desc)
 
-      p.stdin.write(code)
-      p.stdin.close()
+    stats.Inc('num_cases_run')
 
-      actual = {}
-      actual['stdout'] = p.stdout.read()
-      actual['stderr'] = p.stderr.read()
-      p.stdout.close()
-      p.stderr.close()
+    result_row = []
 
-      actual['status'] = p.wait()
+    for shell_index, (sh_label, sh_path) in enumerate(shells):
+      task, actual = next(results)
+      assert task.case_num == i and task.sh_label == sh_label, task
 
-      if opts.timeout_bin and os.path.exists(timeout_file):
+      if opts.timeout_bin and os.path.exists(task.timeout_file):
         cell_result = Result.TIMEOUT
       elif not opts.timeout_bin and actual['status'] == 124:
         cell_result = Result.TIMEOUT
@@ -708,6 +776,10 @@ def RunCases(cases, case_predicate, shells, env, out, opts):
 
     out.WriteRow(i, line_num, result_row, desc)
 
+  if pool:
+    pool.close()
+    pool.join()
+
   return stats
 
 
@@ -1260,6 +1332,11 @@ def Options():
       '--rm-tmp', dest='rm_tmp', default=False, action='store_true',
       help='clear the tmp dir after running each test case')
 
+  p.add_option(
+      '-j', '--jobs', dest='jobs', type='int', default=1,
+      help='Run this many cases at once.  Each case then gets its own $TMP '
+           'dir, which is removed afterward.')
+
   p.add_option(
       '--pyann-out-dir', dest='pyann_out_dir', default=None,
       help='Run OSH with PYANN_OUT=$dir/$case_num.json')
@@ -4,7 +4,10 @@ sh_spec_test.py: Tests for sh_spec.py
 """
 
 import cStringIO
+import os
 import pprint
+import shutil
+import tempfile
 import unittest
 
 from sh_spec import *  # module under test
@@ -129,6 +132,26 @@ class ShSpecTest(unittest.TestCase):
     RunCases([self.CASE1], lambda i, case: True, shells, env, out, opts)
     print(repr(out.f.getvalue()))
 
+  def testRunCasesJobs(self):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+      o = Options()
+      opts, _ = o.parse_args(['--jobs', '4'])
+
+      shells = [('bash', '/bin/bash'), ('sh', '/bin/sh')]
+      env = {'TMP': tmp_dir}
+      out_f = cStringIO.StringIO()
+      out = AnsiOutput(out_f, False)
+      cases = [self.CASE1, self.CASE2, self.CASE1]
+      stats = RunCases(cases, lambda i, case: True, shells, env, out, opts)
+      print(repr(out.f.getvalue()))
+
+      self.assertEqual(3, stats.Get('num_cases_run'))
+      # Each job's $TMP dir is removed when it's done.
+      self.assertEqual([], os.listdir(tmp_dir))
+    finally:
+      shutil.rmtree(tmp_dir)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -20,8 +20,10 @@ sh-spec() {
   # - Prepend spec/bin on the front of the $PATH.  We can't isolate $PATH
   #   because we might be running in Nix, etc.
   # - LOCALE_ARCHIVE is allowed to leak for Nix.
+  # - SPEC_JOBS=N runs N cases of the file at once.
 
   PYTHONPATH=. test/sh_spec.py \
+      --jobs "${SPEC_JOBS:-1}" \
       --tmp-env $tmp_env \
       --path-env "$this_dir/../spec/bin:$PATH" \
       --env-pair "LOCALE_ARCHIVE=${LOCALE_ARCHIVE:-}" \